@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class Reachout2MeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ReachOut2Me'
+
+    def ready(self):
+        # connect the receivers that invalidate the cached post and comment payloads
+        from . import signals  # noqa: F401
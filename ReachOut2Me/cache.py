@@ -0,0 +1,198 @@
+import math
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# how long a serialized payload is fresh when nothing invalidates it first
+PAYLOAD_CACHE_SECONDS = getattr(settings, 'PAYLOAD_CACHE_SECONDS', 300)
+# how long an expired payload is still kept to be served while one request rebuilds it
+PAYLOAD_STALE_SECONDS = getattr(settings, 'PAYLOAD_STALE_SECONDS', 60)
+# how eagerly payloads are rebuilt before they expire; 0 turns early refresh off
+EARLY_REFRESH_BETA = getattr(settings, 'CACHE_EARLY_REFRESH_BETA', 1.0)
+# how long a request waits for another request rebuilding the same key before building it itself
+SINGLE_FLIGHT_WAIT_SECONDS = getattr(settings, 'SINGLE_FLIGHT_WAIT_SECONDS', 5)
+
+# counts of each outcome per kind of payload, for this worker process
+OUTCOMES = ('hits', 'misses', 'stale', 'coalesced', 'early_refreshes')
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+# the rebuilds running in this process, by cache key
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def record(kind, outcome):
+    with _metrics_lock:
+        counts = _metrics.setdefault(kind, dict.fromkeys(OUTCOMES, 0))
+        counts[outcome] += 1
+
+
+def cache_stats():
+    """
+    Return the outcome counts of every kind of cached payload since this process started.
+    Only misses and early refreshes ran the builder; every other outcome was served from the cache.
+    """
+    with _metrics_lock:
+        stats = {}
+        for kind, counts in _metrics.items():
+            built = counts['misses'] + counts['early_refreshes']
+            served = counts['hits'] + counts['stale'] + counts['coalesced']
+            stats[kind] = dict(counts, hit_ratio=served / ((served + built) or 1))
+        return stats
+
+
+def version_key(scope):
+    return f'payload:{scope}:version'
+
+
+def payload_key(scope, *parts):
+    """
+    Build the cache key of a payload in `scope`, e.g. `post:12` or `post:12:comments`.
+    The key embeds the current version of the scope, so invalidating a scope only has to
+    replace its version to make every page and variant of it unreachable at once.
+    """
+    version = cache.get_or_set(version_key(scope), time.time_ns, timeout=None)
+    return ':'.join(['payload', scope, str(version), *map(str, parts)])
+
+
+def invalidate(scope):
+    # a fresh version is never equal to an earlier one, even if the old version key was evicted
+    cache.set(version_key(scope), time.time_ns(), timeout=None)
+
+
+# Inside a transaction the cached payloads are invalidated right away and again once it commits:
+# a read racing the transaction can only cache the old rows, and the second invalidation drops them
+# as soon as the new rows and the counter updates made with them are visible.
+
+def invalidate_on_commit(*scopes):
+    def invalidate_scopes():
+        for scope in scopes:
+            invalidate(scope)
+
+    if transaction.get_connection().in_atomic_block:
+        invalidate_scopes()
+    transaction.on_commit(invalidate_scopes)
+
+
+class _Flight:
+    # one rebuild of a key, which the other requests of this process wait on
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.failed = False
+
+
+def needs_refresh(entry, now, beta=EARLY_REFRESH_BETA):
+    """
+    Decide whether a cached entry should be rebuilt, using probabilistic early expiration (XFetch):
+    the closer the entry is to expiring and the longer it took to build, the likelier a request
+    rebuilds it early, so hot keys are refreshed by one request before they expire for all of them.
+    """
+    if now >= entry['expires']:
+        return True
+    if beta <= 0:
+        return False
+    # log(random) is negative, so this moves `now` forward by a random multiple of the build time
+    return now - entry['delta'] * beta * math.log(1.0 - random.random()) >= entry['expires']
+
+
+def get_or_build(kind, key, builder, timeout=PAYLOAD_CACHE_SECONDS):
+    """
+    Return the payload cached under `key`, building and caching it with `builder` when it is
+    missing, expired or picked for early refresh.
+
+    Rebuilds are single-flight: one request per key runs `builder` while the others serve
+    the stale payload if there is one, or wait for the rebuild to finish if there is not.
+    Requests of this process wait on the running rebuild, and other processes are held back
+    by a lock in the cache.
+    """
+    entry = cache.get(key)
+    now = time.time()
+    if entry is not None and not needs_refresh(entry, now):
+        record(kind, 'hits')
+        return entry['value']
+
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        # another request of this process is rebuilding the key
+        if entry is not None:
+            record(kind, 'stale')
+            return entry['value']
+        if flight.done.wait(SINGLE_FLIGHT_WAIT_SECONDS) and not flight.failed:
+            record(kind, 'coalesced')
+            return flight.value
+        # the rebuild failed or is too slow, so this request builds the payload itself
+        record(kind, 'misses')
+        return builder()
+
+    lock_key = f'{key}:lock'
+    locked = False
+    try:
+        locked = cache.add(lock_key, 1, timeout=SINGLE_FLIGHT_WAIT_SECONDS)
+        if not locked:
+            # another process is rebuilding the key
+            value = wait_for_other_process(kind, key, entry)
+            if value is not None:
+                flight.value = value
+                return value
+        record(kind, 'misses' if entry is None or now >= entry['expires'] else 'early_refreshes')
+        started = time.time()
+        value = builder()
+        finished = time.time()
+        cache.set(
+            key,
+            {'value': value, 'delta': finished - started, 'expires': finished + timeout},
+            timeout + PAYLOAD_STALE_SECONDS,
+        )
+        flight.value = value
+        return value
+    except BaseException:
+        flight.failed = True
+        raise
+    finally:
+        if locked:
+            cache.delete(lock_key)
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.done.set()
+
+
+def wait_for_other_process(kind, key, entry):
+    # serve the stale payload if there is one, else poll until the other process has stored the new one
+    if entry is not None:
+        record(kind, 'stale')
+        return entry['value']
+    deadline = time.monotonic() + SINGLE_FLIGHT_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            record(kind, 'coalesced')
+            return entry['value']
+    return None
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def comments_scope(post_id):
+    return f'post:{post_id}:comments'
+
+
+def profile_scope(username):
+    return f'profile:{username}'
+
+
+def following_scope(user_id):
+    return f'following:{user_id}'
@@ -0,0 +1,202 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest
+
+from .models import Post, Comment, CommentReply, LikeCounterShard, UserProfile
+
+# every denormalized counter: the model holding it, the counter column and the relation it counts
+COUNTERS = [
+    (Post, 'like_count', 'likes'),
+    (Post, 'comment_count', 'comment'),
+    (Comment, 'like_count', 'likes'),
+    (Comment, 'reply_count', 'commentreplies'),
+    (CommentReply, 'like_count', 'likes'),
+    (UserProfile, 'follower_count', 'user__follower_relationships'),
+    (UserProfile, 'following_count', 'user__following_relationships'),
+]
+
+# the models whose like counter can switch to sharded mode, and their name in LikeCounterShard
+SHARDED_MODELS = {Post: 'post', Comment: 'comment'}
+SHARDED_TARGETS = {target_type: model for model, target_type in SHARDED_MODELS.items()}
+# the number of shards a hot object's likes are spread over
+LIKE_COUNTER_SHARDS = getattr(settings, 'LIKE_COUNTER_SHARDS', 8)
+# the number of likes per minute above which an object switches to sharded mode
+LIKE_SHARDING_THRESHOLD = getattr(settings, 'LIKE_SHARDING_THRESHOLD', 60)
+# how long a sharded total is served from the cache before the shards are summed again
+LIKE_SHARD_READ_CACHE_SECONDS = getattr(settings, 'LIKE_SHARD_READ_CACHE_SECONDS', 2)
+
+
+def increment(model, pk, field, delta=1):
+    """
+    Atomically add `delta` to a counter column with a single UPDATE.
+    The row is never loaded or saved, so concurrent writers do not overwrite each other
+    and `auto_now` fields such as `updated_at` are left alone. Counters never go below zero.
+    """
+    return model.objects.filter(pk=pk).update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def decrement(model, pk, field, delta=1):
+    return increment(model, pk, field, -delta)
+
+
+def reconcile(model, field, relation, batch_size=1000):
+    """
+    Recount one counter from its relation, walking the table in primary key batches,
+    and rewrite the rows that drifted. Return the number of rows repaired.
+    """
+    repaired = 0
+    last_pk = 0
+    while True:
+        rows = list(
+            model.objects.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .annotate(actual=Count(relation, distinct=True))
+            .values_list('pk', field, 'actual')[:batch_size]
+        )
+        if not rows:
+            return repaired
+        for pk, stored, actual in rows:
+            if stored != actual:
+                model.objects.filter(pk=pk).update(**{field: actual})
+                repaired += 1
+        last_pk = rows[-1][0]
+
+
+def rate_key(target_type, target_id):
+    # counts the likes of an object during the current minute
+    return f'likes:rate:{target_type}:{target_id}:{int(time.time() // 60)}'
+
+
+def total_key(target_type, target_id):
+    # caches the sum of an object's shards for a short time
+    return f'likes:total:{target_type}:{target_id}'
+
+
+def is_hot(target_type, target_id):
+    """
+    Record one like in the object's per-minute rate and report whether it crossed the threshold.
+    """
+    key = rate_key(target_type, target_id)
+    cache.add(key, 0, timeout=120)
+    try:
+        rate = cache.incr(key)
+    except ValueError:
+        # the key expired between add and incr
+        return False
+    return rate > LIKE_SHARDING_THRESHOLD
+
+
+def add_to_shard(target_type, target_id, delta, shards=None):
+    """
+    Add `delta` to one randomly chosen shard of the object, creating the shard rows on first use.
+    Concurrent likes land on different rows, so they do not queue on a single row lock.
+
+    The object's `likes_sharded` flag is set whenever a shard row is created, in the same
+    transaction, so readers know to add the shards as long as any exist. Existing shard rows
+    only exist while the flag is set, so the common case never touches the object's row.
+    """
+    shard = random.randrange(shards or LIKE_COUNTER_SHARDS)
+    rows = LikeCounterShard.objects.filter(target_type=target_type, target_id=target_id, shard=shard)
+    with transaction.atomic():
+        if rows.update(count=F('count') + delta):
+            return
+        LikeCounterShard.objects.bulk_create(
+            [LikeCounterShard(target_type=target_type, target_id=target_id, shard=shard)],
+            ignore_conflicts=True,
+        )
+        rows.update(count=F('count') + delta)
+        SHARDED_TARGETS[target_type].objects.filter(pk=target_id).update(likes_sharded=True)
+
+
+def add_likes(obj, delta):
+    """
+    Add `delta` to the like counter of a post, comment or comment reply.
+    Posts and comments liked faster than LIKE_SHARDING_THRESHOLD per minute switch to sharded mode:
+    their likes go to LikeCounterShard rows until `flush_like_shards` folds them into like_count.
+    """
+    target_type = SHARDED_MODELS.get(type(obj))
+    if target_type is None:
+        return increment(type(obj), obj.pk, 'like_count', delta)
+    if obj.likes_sharded or is_hot(target_type, obj.pk):
+        add_to_shard(target_type, obj.pk, delta)
+        obj.likes_sharded = True
+        # keep the briefly cached total in step with the write when it is present
+        try:
+            cache.incr(total_key(target_type, obj.pk), delta)
+        except ValueError:
+            pass
+        return 1
+    return increment(type(obj), obj.pk, 'like_count', delta)
+
+
+def prefetch_like_totals(objects):
+    """
+    Sum the shards of every sharded object of `objects` with one query per model, so `like_total`
+    does not read the shards of each hot object of a page on its own. Return `objects`.
+    """
+    sharded = {}
+    for obj in objects:
+        target_type = SHARDED_MODELS.get(type(obj))
+        if target_type is not None and obj.likes_sharded:
+            sharded.setdefault(target_type, []).append(obj)
+    for target_type, targets in sharded.items():
+        totals = dict(
+            LikeCounterShard.objects.filter(target_type=target_type, target_id__in=[obj.pk for obj in targets])
+            .order_by().values('target_id').annotate(total=Sum('count')).values_list('target_id', 'total')
+        )
+        for obj in targets:
+            obj._pending_likes = totals.get(obj.pk) or 0
+    return objects
+
+
+def like_total(obj):
+    """
+    Return the number of likes of an object, including the likes still waiting in its shards.
+    The shards are only read for objects whose row has the `likes_sharded` flag set, and their
+    sum is cached briefly, unless `prefetch_like_totals` already read it.
+    """
+    target_type = SHARDED_MODELS.get(type(obj))
+    if target_type is None or not obj.likes_sharded:
+        return obj.like_count
+    pending = getattr(obj, '_pending_likes', None)
+    if pending is not None:
+        return max(obj.like_count + pending, 0)
+    key = total_key(target_type, obj.pk)
+    pending = cache.get(key)
+    if pending is None:
+        pending = LikeCounterShard.objects.filter(
+            target_type=target_type, target_id=obj.pk
+        ).aggregate(total=Sum('count'))['total'] or 0
+        cache.set(key, pending, timeout=LIKE_SHARD_READ_CACHE_SECONDS)
+    return max(obj.like_count + pending, 0)
+
+
+def flush_like_shards():
+    """
+    Fold the counts waiting in the shards into the like_count columns and delete the shard rows.
+    Each object is flushed in its own transaction with its row and its shard rows locked, so likes
+    arriving during the flush wait for it instead of being lost, and a like creating a new shard
+    meanwhile sets the `likes_sharded` flag again once the flush has cleared it.
+    Return the number of objects flushed.
+    """
+    targets = LikeCounterShard.objects.values_list('target_type', 'target_id').distinct()
+    flushed = 0
+    for target_type, target_id in list(targets):
+        model = SHARDED_TARGETS[target_type]
+        with transaction.atomic():
+            list(model.objects.select_for_update().filter(pk=target_id).values_list('pk', flat=True))
+            shards = LikeCounterShard.objects.select_for_update().filter(target_type=target_type, target_id=target_id)
+            pending = sum(shard.count for shard in shards)
+            shards.delete()
+            model.objects.filter(pk=target_id).update(
+                like_count=Greatest(F('like_count') + pending, 0),
+                likes_sharded=False,
+            )
+        cache.delete(total_key(target_type, target_id))
+        flushed += 1
+    return flushed
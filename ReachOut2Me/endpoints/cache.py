@@ -0,0 +1,20 @@
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework import status
+from drf_spectacular.utils import extend_schema, OpenApiTypes
+
+from .. import cache
+
+
+@extend_schema(
+    description='Return the hit and miss counts of the cached post and comment payloads '
+                'served by this worker process since it started.',
+    request=None,
+    responses={200: OpenApiTypes.OBJECT},
+    tags=['Admin']
+)
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_stats(request):
+    return Response(cache.cache_stats(), status=status.HTTP_200_OK)
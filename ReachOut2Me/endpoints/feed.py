@@ -0,0 +1,35 @@
+from rest_framework import generics
+from drf_spectacular.utils import extend_schema
+
+from ..models import FeedItem
+from ..serializers import PostSerializer
+from ..viewer_state import viewer_state_context
+
+
+@extend_schema(
+        tags=['Post']
+    )
+class FeedView(generics.ListAPIView):
+    """
+    The home timeline of the authenticated user: the posts of the accounts they follow, newest first.
+    Posts are pushed into the `FeedItem` table when they are created, so reading the timeline
+    is a single range scan over the owner's rows no matter how many accounts they follow.
+    """
+    serializer_class = PostSerializer
+    # the feed is paginated over the copied post creation time, which the owner timeline index covers
+    ordering = ('-created_at', '-id')
+
+    def get_queryset(self):
+        return (
+            FeedItem.objects.filter(owner=self.request.user)
+            .select_related('post', 'post__user')
+        )
+
+    def list(self, request, *args, **kwargs):
+        items = self.paginate_queryset(self.get_queryset())
+        posts = [item.post for item in items]
+        # the viewer's like and follow flags are added to each post when asked with `?viewer_state=1`
+        context = self.get_serializer_context()
+        context.update(viewer_state_context(request, posts=posts))
+        serializer = self.get_serializer(posts, many=True, context=context)
+        return self.get_paginated_response(serializer.data)
@@ -2,9 +2,13 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
 
-from ..models import UserProfile, User, Follow, Notification
-from ..serializers import FollowUserSerializer, ResponseSerializer, FollowerSerializer, UserSerializer
+from ..models import User, Follow, FollowSuggestion, Notification
+from ..serializers import FollowUserSerializer, ResponseSerializer, FollowerSerializer, FollowingSerializer, FollowSuggestionSerializer, BulkFollowSerializer, BulkFollowResponseSerializer
+from ..feed import backfill_feed, backfill_feed_from, prune_feed
+from ..follows import follow, follow_many, unfollow
+from ..pagination import KeysetPagination
 from drf_spectacular.utils import extend_schema
 
 
@@ -34,28 +38,11 @@ def follow_user(request, user_id):
     if current_user == user_to_follow:
         return Response({"error": "You can't follow yourself"}, status=status.HTTP_400_BAD_REQUEST)
 
-    try:
-        # Try to retrieve the user profile for the current user
-        current_user_profile = UserProfile.objects.get(user=current_user)
-    except UserProfile.DoesNotExist:
-        # If the profile does not exist, create a new one
-        current_user_profile = UserProfile.objects.create(user=current_user)
-
-    # Check if the user to follow is already in the current user's following list
-    if user_to_follow in current_user_profile.following.all():
+    # Add the follow edge and count it on both profiles, unless the current user already follows the user
+    if not follow(current_user.id, user_to_follow.id):
         return Response({"error": "You are already following this user"}, status=status.HTTP_400_BAD_REQUEST)
-
-    # Create an instance of the FollowUserSerializer with the input data
-    serializer = FollowUserSerializer(data={'user_id': user_id})
-
-    # Validate the serializer input
-    if not serializer.is_valid():
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
-    # Add the user to follow to the current user's following list
-    current_user_profile.following.add(user_to_follow)
-    # Save the user profile
-    current_user_profile.save()
+    # Copy the recent posts of the followed user into the current user's feed
+    backfill_feed(current_user.id, user_to_follow.id)
     # Create the notification object
     notification = Notification(
         recipient=user_to_follow,  # User who will receive the notification
@@ -70,6 +57,58 @@ def follow_user(request, user_id):
 
 
 
+@extend_schema(
+    tags=['followers'],
+    request=BulkFollowSerializer,
+    responses={
+        status.HTTP_200_OK: BulkFollowResponseSerializer,
+        status.HTTP_400_BAD_REQUEST: ResponseSerializer,
+    }
+)
+@api_view(['POST'])
+def bulk_follow_users(request):
+    # Validate the list of user ids to follow
+    serializer = BulkFollowSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    user_ids = list(dict.fromkeys(serializer.validated_data['user_ids']))
+
+    # Retrieve the current user from the request object
+    current_user = request.user
+    # Check if the current user is among the users to follow
+    if current_user.id in user_ids:
+        return Response({"error": "You can't follow yourself"}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Look up all the users to follow with a single IN query, skipping the ids matching no user
+    existing = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+    found = [user_id for user_id in user_ids if user_id in existing]
+
+    with transaction.atomic():
+        # Add the follow edges that do not exist yet and count them on every profile
+        followed = follow_many(current_user.id, found)
+        # Copy the recent posts of the followed users into the current user's feed
+        backfill_feed_from(current_user.id, followed)
+        # Create the notifications of the followed users in one INSERT
+        actor_content_type = ContentType.objects.get_for_model(current_user)
+        Notification.objects.bulk_create([
+            Notification(
+                recipient_id=user_id,  # User who will receive the notification
+                actor_object_id=current_user.id,  # ID of the user who performed the action (following)
+                actor_content_type=actor_content_type,  # Content type of the actor object (user)
+                verb='started following you',  # Notification message
+            )
+            for user_id in followed
+        ])
+
+    # Return which users were followed, which were already followed and which do not exist
+    newly_followed = set(followed)
+    return Response({
+        "followed": followed,
+        "already_following": [user_id for user_id in found if user_id not in newly_followed],
+        "not_found": [user_id for user_id in user_ids if user_id not in existing],
+    }, status=status.HTTP_200_OK)
+
+
 @extend_schema(
     tags=['followers'],
     request=None,
@@ -92,18 +131,12 @@ def unfollow_user(request, user_id):
         # If so, return a 400 error response
         return Response({"error": "You can't unfollow yourself"}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Retrieve the user profile for the current user
-    current_user_profile, created = UserProfile.objects.get_or_create(user=current_user)
-
-    # Check if the user to unfollow is in the current user's following list
-    if user_to_unfollow not in current_user_profile.following.all():
+    # Remove the follow edge and uncount it on both profiles, unless the current user did not follow the user
+    if not unfollow(current_user.id, user_to_unfollow.id):
         # If not, return a 400 error response
         return Response({"error": "You are not following this user"}, status=status.HTTP_400_BAD_REQUEST)
-
-    # Remove the user to unfollow from the current user's following list
-    current_user_profile.following.remove(user_to_unfollow)
-    # Save the user profile
-    current_user_profile.save()
+    # Remove the unfollowed user's posts from the current user's feed
+    prune_feed(current_user.id, user_to_unfollow.id)
 
     # Return a success response
     return Response({"success": "User unfollowed successfully"}, status=status.HTTP_200_OK)
@@ -124,18 +157,22 @@ def followers_list(request, user_id):
         return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
 
     # Retrieve all followers for the user
-    followers = Follow.objects.filter(following=user)
+    followers = Follow.objects.filter(following=user).select_related('follower')
+
+    # Keep one page of followers, most recent first, starting after the requested cursor
+    paginator = KeysetPagination(ordering=('-created_at', '-id'))
+    page = paginator.paginate_queryset(followers, request)
 
     # Serialize the followers data
-    serializer = FollowerSerializer(followers, many=True)
+    serializer = FollowerSerializer(page, many=True)
 
-    # Return the serialized data as a JSON response
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    # Return the serialized data and the link to the next page
+    return paginator.get_paginated_response(serializer.data)
 
 @extend_schema(
     tags=['followers'],
     request=None,
-    responses={200: UserSerializer}
+    responses={200: FollowingSerializer}
 
 )
 @api_view(['GET'])
@@ -147,14 +184,41 @@ def following_list(request, user_id):
         # If the user is not found, return a 404 error response
         return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    # Retrieve all the users that the given user is following
-    following = UserProfile.objects.filter(following=user).values_list('user', flat=True)
-    # Retrieve the user objects for the users that the given user is following
-    following_users = User.objects.filter(id__in=following)
+    # Retrieve the follow edges from the given user to the users it follows
+    following = Follow.objects.filter(follower=user).select_related('following')
+
+    # Keep one page of followed users, most recent first, starting after the requested cursor
+    paginator = KeysetPagination(ordering=('-created_at', '-id'))
+    page = paginator.paginate_queryset(following, request)
+
+    # Serialize the list of followed users
+    serializer = FollowingSerializer(page, many=True)
+
+    # Return the serialized list of following users and the link to the next page
+    return paginator.get_paginated_response(serializer.data)
+
+
+@extend_schema(
+    tags=['followers'],
+    request=None,
+    responses={200: FollowSuggestionSerializer(many=True)}
+)
+@api_view(['GET'])
+def follow_suggestions(request):
+    # Retrieve the suggestions stored for the user by the compute_suggestions job, best first,
+    # leaving out the users followed since the job ran
+    suggestions = (
+        FollowSuggestion.objects.filter(user=request.user)
+        .exclude(suggested__follower_relationships__follower=request.user)
+        .select_related('suggested')
+    )
 
-    # Serialize the list of following users
-    serializer = UserSerializer(following_users, many=True)
+    # Keep one page of suggestions, read in rank order from the (user, rank) index
+    paginator = KeysetPagination(ordering=('rank',))
+    page = paginator.paginate_queryset(suggestions, request)
 
-    # Return the serialized list of following users as a JSON response
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    # Serialize the suggested users
+    serializer = FollowSuggestionSerializer(page, many=True)
 
+    # Return the serialized data and the link to the next page
+    return paginator.get_paginated_response(serializer.data)
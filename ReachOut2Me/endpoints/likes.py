@@ -0,0 +1,60 @@
+from django.shortcuts import get_object_or_404
+from rest_framework import generics
+from drf_spectacular.utils import extend_schema
+
+from ..models import Post, PostLike, Comment, CommentLike, CommentReply, CommentReplyLike
+from ..serializers import LikerSerializer
+
+
+class LikerListView(generics.ListAPIView):
+    """
+    Base view listing the users who liked an object, one cursor page at a time.
+    Subclasses set the liked model, the like table and the URL keyword holding the object id.
+    """
+    serializer_class = LikerSerializer
+    # the model that was liked
+    parent_model = None
+    # the table holding one row per like and the name of its foreign key to the liked object
+    like_model = None
+    parent_field = None
+    # the URL keyword holding the id of the liked object
+    lookup_url_kwarg = None
+    # the likers are listed newest first, walking the (object, created_at, id) index of the like table
+    ordering = ('-created_at', '-id')
+
+    def get_queryset(self):
+        parent = get_object_or_404(self.parent_model, pk=self.kwargs[self.lookup_url_kwarg])
+        return (
+            self.like_model.objects.filter(**{self.parent_field: parent})
+            .select_related('user', 'user__userprofile')
+        )
+
+
+@extend_schema(
+        tags=['Post']
+    )
+class PostLikersView(LikerListView):
+    parent_model = Post
+    like_model = PostLike
+    parent_field = 'post'
+    lookup_url_kwarg = 'pk'
+
+
+@extend_schema(
+        tags=['Comment']
+    )
+class CommentLikersView(LikerListView):
+    parent_model = Comment
+    like_model = CommentLike
+    parent_field = 'comment'
+    lookup_url_kwarg = 'comment_id'
+
+
+@extend_schema(
+        tags=['Comment']
+    )
+class CommentReplyLikersView(LikerListView):
+    parent_model = CommentReply
+    like_model = CommentReplyLike
+    parent_field = 'comment_reply'
+    lookup_url_kwarg = 'comment_reply_id'
@@ -0,0 +1,151 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from ..storage import is_content_addressed
+
+# content-addressed files never change under their name, so they can be cached for a year without revalidation
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# the other files are cached for a while and then revalidated with their ETag
+DEFAULT_CACHE_CONTROL = 'public, max-age=3600'
+# a single range of bytes, such as `bytes=0-499`, `bytes=500-` or `bytes=-500`
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileRange:
+    """
+    A file that ends `length` bytes after `start`. It keeps the file descriptor so a WSGI
+    server with `wsgi.file_wrapper` can still hand the range to sendfile, which sends the
+    Content-Length bytes from the current position.
+    """
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.name = file.name
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    Return the `(start, end)` bytes, end included, asked for by a Range header, None when the
+    whole file should be sent, or False when the range is outside of the file.
+    Several ranges in one header are answered with the whole file, as the RFC allows.
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # the last N bytes
+        if int(last) == 0:
+            return False
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def range_applies(request, etag, mtime):
+    # a range asked with If-Range only applies while the file is still the version the client has
+    validator = request.headers.get('If-Range')
+    if validator is None:
+        return True
+    if validator.startswith('"') or validator.startswith('W/'):
+        return validator == etag
+    return parse_http_date_safe(validator) == int(mtime)
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve an uploaded file or one of its variants from MEDIA_ROOT.
+
+    Every file has an ETag and a Last-Modified date, so revalidations are answered with 304.
+    Single byte ranges are answered with 206, and files are sent through FileResponse, which
+    WSGI servers stream with sendfile. Content-addressed files, and the variants rendered from
+    them, are sent with immutable cache headers so browsers and CDNs never ask for them again.
+
+    With the `MEDIA_SERVE_MODE` setting set to `x-accel-redirect` or `x-sendfile`, only the
+    headers are answered here and the front proxy sends the file, ranges included.
+    """
+    # the hidden directories hold unfinished uploads and quarantined files, which are never served
+    if any(part.startswith('.') for part in path.split('/')):
+        raise Http404
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(fullpath)
+    except (SuspiciousFileOperation, FileNotFoundError, NotADirectoryError):
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    cache_control = IMMUTABLE_CACHE_CONTROL if is_content_addressed(path) else DEFAULT_CACHE_CONTROL
+    # If-None-Match and If-Modified-Since are answered with 304, failed preconditions with 412
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        response = send_file(request, path, fullpath, stat, etag)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def send_file(request, path, fullpath, stat, etag):
+    content_type = mimetypes.guess_type(fullpath)[0] or 'application/octet-stream'
+    mode = getattr(settings, 'MEDIA_SERVE_MODE', 'django')
+    if mode == 'x-accel-redirect':
+        # nginx serves the file from the internal location mapped to MEDIA_ROOT; it decodes the
+        # uri, so names with spaces or non-ASCII characters are percent-encoded
+        response = HttpResponse(content_type=content_type)
+        prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(path)
+        return response
+    if mode == 'x-sendfile':
+        # Apache mod_xsendfile and lighttpd serve the file from its absolute path
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = fullpath
+        return response
+
+    size = stat.st_size
+    byte_range = None
+    if 'Range' in request.headers and range_applies(request, etag, stat.st_mtime):
+        byte_range = parse_range(request.headers['Range'], size)
+    if byte_range is False:
+        response = HttpResponse(status=416, content_type=content_type)
+        response['Content-Range'] = f'bytes */{size}'
+    elif byte_range is None:
+        response = FileResponse(open(fullpath, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = FileResponse(FileRange(open(fullpath, 'rb'), start, end - start + 1), content_type=content_type, status=206)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework import status
 from ..models import Message,Notification
 from ..serializers import MessageSerializer
+from ..pagination import KeysetPagination
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth import get_user_model
 from drf_spectacular.utils import extend_schema
@@ -26,7 +27,7 @@ def send_message(request):
     """
     Endpoint for sending a message.
     """
-    serializer = MessageSerializer(data=request.data)
+    serializer = MessageSerializer(data=request.data, context={'request': request})
     if serializer.is_valid():
         message = serializer.save(sender=request.user)
         # Create notification for recipient
@@ -54,13 +55,17 @@ def message_list(request):
     user = request.user
 
     # Get all messages sent and received by the user
-    messages = Message.objects.filter(sender=user) | Message.objects.filter(recipient=user)
+    messages = (Message.objects.filter(sender=user) | Message.objects.filter(recipient=user)).select_related('sender')
+
+    # Keep one page of messages, newest first, starting after the requested cursor
+    paginator = KeysetPagination(ordering=('-created_at', '-id'))
+    page = paginator.paginate_queryset(messages, request)
 
     # Serialize the messages
-    serializer = MessageSerializer(messages, many=True)
+    serializer = MessageSerializer(page, many=True)
 
-    # Return the serialized messages as a JSON response
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    # Return the serialized messages and the link to the next page
+    return paginator.get_paginated_response(serializer.data)
 
 
 """
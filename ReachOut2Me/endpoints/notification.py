@@ -6,6 +6,7 @@ from drf_spectacular.utils import extend_schema
 from rest_framework.decorators import api_view
 from ..models import Notification
 from ..serializers import NotificationSerializer
+from ..pagination import KeysetPagination
 
 
 @extend_schema(
@@ -20,10 +21,14 @@ from ..serializers import NotificationSerializer
 @login_required
 
 def list_notifications(request):
-    notifications = Notification.objects.filter(recipient=request.user).order_by('-timestamp')
-    Notification.objects.filter(recipient=request.user, read=False).update(read=True)
-    serializer = NotificationSerializer(notifications, many=True)
-    return JsonResponse(serializer.data, safe=False)
+    notifications = Notification.objects.filter(recipient=request.user).select_related('actor_content_type')
+    paginator = KeysetPagination(ordering=('-timestamp', '-id'))
+    page = paginator.paginate_queryset(notifications, request)
+    serializer = NotificationSerializer(page, many=True)
+    data = serializer.data
+    # only the notifications the user has actually been shown are marked as read
+    Notification.objects.filter(id__in=[notification.id for notification in page], read=False).update(read=True)
+    return paginator.get_paginated_response(data)
 
 
 @extend_schema(
@@ -1,11 +1,19 @@
 from rest_framework import generics, status
-from ..models import Post, Comment, CommentReply, CommentReplyLike, Notification
+from ..models import Post, PostLike, Comment, CommentLike, CommentReply, CommentReplyLike, Notification
 from rest_framework.response import Response
 from ..serializers import PostSerializer, CommentSerializer, CommentReplySerializer, CommentReplyLikeSerializer
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
 from drf_spectacular.utils import extend_schema
 from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from ..feed import fan_out_post
+from ..tags import index_post
+from ..pagination import KeysetPagination
+from ..counters import increment, decrement
+from ..likes import add_like, remove_like
+from ..viewer_state import viewer_state_context, viewer_state_requested
+from ..cache import get_or_build, payload_key, post_scope, comments_scope
 
 @extend_schema(
         tags=['Post']
@@ -14,18 +22,32 @@ class PostListCreateView(generics.ListCreateAPIView):
     """
     The `queryset` attribute defines the list of posts to be displayed,
     while the `serializer_class` attribute determines how the data is serialized and deserialized.
+    The list is paginated with a keyset cursor over `ordering`, newest posts first.
     """
-    queryset = Post.objects.all()
+    queryset = Post.objects.select_related('user')
     serializer_class = PostSerializer
+    ordering = ('-created_at', '-id')
 
     """    
     The `perform_create` method is used to save the post object with the authenticated user as the author. 
     This ensures that the author of the post is properly associated with it in the database.
+    The new post is then pushed into the feed of every follower of the author,
+    and its hashtags and mentions are indexed.
     """
 
     
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        post = serializer.save(user=self.request.user)
+        fan_out_post(post)
+        index_post(post)
+
+    # the list adds the viewer's like and follow flags to each post when asked with `?viewer_state=1`
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        context = self.get_serializer_context()
+        context.update(viewer_state_context(request, posts=page))
+        serializer = self.get_serializer(page, many=True, context=context)
+        return self.get_paginated_response(serializer.data)
 
 
 # The PostDetailView class is a generic view that retrieves, updates, or deletes a Post instance
@@ -38,6 +60,18 @@ class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
     # Set the serializer_class attribute to PostSerializer
     serializer_class = PostSerializer
 
+    # the serialized post is read through the cache, which the post, comment and like signals invalidate
+    def retrieve(self, request, *args, **kwargs):
+        # the host is part of the key because image urls are absolute
+        key = payload_key(post_scope(kwargs['pk']), request.get_host())
+        data = get_or_build('post', key, lambda: self.get_serializer(self.get_object()).data)
+        return Response(data)
+
+    # Define the perform_update method to re-index the hashtags and mentions of an edited Post instance
+    def perform_update(self, serializer):
+        post = serializer.save()
+        index_post(post)
+
     # Define the perform_destroy method to delete a Post instance
    
     def perform_destroy(self, instance):
@@ -48,21 +82,24 @@ class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
         # Retrieve the Post instance using the pk value from the URL
         post = Post.objects.get(id=kwargs['pk'])
         # Instantiate a PostSerializer with the Post instance and request data
-        serializer = PostSerializer(post, data=request.data)
+        serializer = PostSerializer(post, data=request.data, context={'request': request})
         # Validate the serializer data
         if serializer.is_valid():
             # Check if the user is the author of the post
-            if request.user == post.author:
-                # Save the updated Post instance
-                serializer.save()
+            if request.user == post.user:
+                # Save the updated Post instance and re-index its hashtags and mentions
+                self.perform_update(serializer)
                 # Return the updated Post instance with a 200 OK status code
                 return Response(serializer.data, status=status.HTTP_200_OK)
             else:
                 # Return an error message if the user is not the author with a 403 Forbidden status code
                 return Response({'error': 'You are not the author of this post.'}, status=status.HTTP_403_FORBIDDEN)
+        # Return the validation errors with a 400 Bad Request status code
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 # The PostLikeView class is a custom view to like or unlike a Post instance
+# PUT likes the post and DELETE unlikes it; both are idempotent and never load the list of likers
 @extend_schema(
         tags=['Post']
     )
@@ -72,39 +109,47 @@ class PostLikeView(generics.GenericAPIView):
     # Set the serializer_class attribute to PostSerializer
     serializer_class = PostSerializer
 
-    
+    # the post method toggles the like of the user on the post
     def post(self, request, pk):
         # the get_object method is used to retrieve the post object using the pk from the url
-        # the pk is passed to the get_object method as an argument
         post = self.get_object()
-        # the request.user attribute is used to retrieve the user object from the request
-        user = request.user
-        # if the user object is in the post.likes.all() queryset, the user has already liked the post
-        if user in post.likes.all():
-            # the remove method is used to remove the user object from the post.likes.all() queryset
-            post.likes.remove(user)
-            # the message variable is used to send a message to the user
-            message = 'Unliked post successfully'
-        # if the user object is not in the post.likes.all() queryset, the user has not liked the post
-        else:
-            # the add method is used to add the user object to the post.likes.all() queryset
-            post.likes.add(user)
-            # the message variable is used to send a message to the user
-            message = 'Liked post successfully'
-
-            # Create notification for post creator
-            recipient = post.user
-            actor = user
-            notification_type = 'post_like'
-            Notification.objects.create(
-                recipient=recipient,
-                actor_content_type=ContentType.objects.get_for_model(actor),
-                actor_object_id=actor.id,
-                verb=notification_type,
-                actor_object=post
-            )
-        # the save method is used to save the changes to the post object
-        post.save()
+        # the like is inserted, and if it already existed it is removed instead
+        if self.like(post, request.user):
+            return self.respond(post, 'Liked post successfully')
+        remove_like(PostLike, 'post', post, request.user)
+        return self.respond(post, 'Unliked post successfully')
+
+    # the put method likes the post, doing nothing if the user already likes it
+    def put(self, request, pk):
+        post = self.get_object()
+        if self.like(post, request.user):
+            return self.respond(post, 'Liked post successfully')
+        return self.respond(post, 'You already like this post')
+
+    # the delete method unlikes the post, doing nothing if the user does not like it
+    def delete(self, request, pk):
+        post = self.get_object()
+        if remove_like(PostLike, 'post', post, request.user):
+            return self.respond(post, 'Unliked post successfully')
+        return self.respond(post, 'You do not like this post')
+
+    def like(self, post, user):
+        # the like row is inserted and the like counter incremented; False means it already existed
+        if not add_like(PostLike, 'post', post, user):
+            return False
+        # Create notification for post creator
+        Notification.objects.create(
+            recipient=post.user,
+            actor_content_type=ContentType.objects.get_for_model(user),
+            actor_object_id=user.id,
+            verb='post_like',
+            actor_object=post
+        )
+        return True
+
+    def respond(self, post, message):
+        # the counter is read back so the response shows the current number of likes
+        post.refresh_from_db(fields=['like_count'])
         # the get_serializer method is used to serialize the post object
         serializer = self.get_serializer(post)
         # the Response method is used to send a response to the user
@@ -136,7 +181,11 @@ class CreateGetComment(APIView):
         # the is_valid method is used to validate the serializer data
         # if the data is valid, the save method is used to save the comment object
         if serializer.is_valid():
-            serializer.save(post=post)
+            # the comment and its counter are written together so the cache is invalidated once both are visible
+            with transaction.atomic():
+                serializer.save(post=post)
+                # the comment counter of the post is incremented in the database
+                increment(Post, post.pk, 'comment_count')
 
                 # create a notification object for the post owner
             recipient = post.user
@@ -161,13 +210,36 @@ class CreateGetComment(APIView):
         except Post.DoesNotExist:
             return Response({'error': 'Post not found.'}, status=status.HTTP_404_NOT_FOUND)
 
-        # the filter method is used to retrieve all comments for the post object
-        comments = Comment.objects.filter(post=post)
+        # the paginator returns one page of comments, newest first, starting after the requested cursor
+        paginator = KeysetPagination(ordering=('-created_at', '-id'))
+        # the viewer's like and follow flags differ per user, so those pages are never cached
+        if viewer_state_requested(request):
+            comments = Comment.objects.filter(post=post).select_related('user')
+            page = paginator.paginate_queryset(comments, request, view=self)
+            serializer = self.serializer_class(page, many=True, context=viewer_state_context(request, comments=page))
+            return paginator.get_paginated_response(serializer.data)
+
+        # every page is cached under the current version of the post's comment listing
+        key = payload_key(
+            comments_scope(post.pk),
+            request.get_host(),
+            request.query_params.get(paginator.cursor_query_param, ''),
+            paginator.get_page_size(request),
+        )
+        page = get_or_build('comments', key, lambda: self.build_page(request, post, paginator))
+        # the next link is rebuilt from the cached position so it always points at this request's url
+        paginator.request = request
+        paginator.next_position = page['next_position']
+        return paginator.get_paginated_response(page['results'])
+
+    def build_page(self, request, post, paginator):
+        # the filter method is used to retrieve the comments for the post object
+        comments = Comment.objects.filter(post=post).select_related('user')
+        page = paginator.paginate_queryset(comments, request, view=self)
         # the serializer_class attribute is used to instantiate a CommentSerializer object
         # the many argument is set to True to serialize multiple objects
-        serializer = self.serializer_class(comments, many=True)
-        # the Response method is used to send a response to the user
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        serializer = self.serializer_class(page, many=True, context={'request': request})
+        return {'results': serializer.data, 'next_position': paginator.next_position}
     
 
 # view to update and delete comments
@@ -215,8 +287,10 @@ class UpdateDeleteComment(APIView):
         except Comment.DoesNotExist:
             return Response({'error': 'Comment not found.'}, status=status.HTTP_404_NOT_FOUND)
 
-        # delete the comment object
-        comment.delete()
+        # delete the comment object and decrement the comment counter of the post in one transaction
+        with transaction.atomic():
+            comment.delete()
+            decrement(Post, post.pk, 'comment_count')
         return Response({'message': 'Comment deleted successfully.'}, status=status.HTTP_204_NO_CONTENT)
 
 
@@ -242,7 +316,10 @@ class ListCreateCommentReply(APIView):
         serializer = self.serializer_class(data=request.data, context={'request': request})
         # if the data is valid, the save method is used to save the comment reply object
         if serializer.is_valid():
-            serializer.save(comment=comment, user=request.user)
+            with transaction.atomic():
+                serializer.save(comment=comment, user=request.user)
+                # the reply counter of the comment is incremented in the database
+                increment(Comment, comment.pk, 'reply_count')
 
             # create a notification object for the recipient
             recipient = comment.user
@@ -269,13 +346,17 @@ class ListCreateCommentReply(APIView):
         except Comment.DoesNotExist:
             return Response({'error': 'Comment not found.'}, status=status.HTTP_404_NOT_FOUND)
 
-        # the filter method is used to retrieve all comment replies for the comment object
+        # the filter method is used to retrieve the comment replies for the comment object
         replies = CommentReply.objects.filter(comment=comment)
+        # the paginator returns one page of replies, newest first, starting after the requested cursor
+        paginator = KeysetPagination(ordering=('-created_at', '-id'))
+        page = paginator.paginate_queryset(replies, request, view=self)
         # the serializer_class attribute is used to instantiate a CommentReplySerializer object
         # the many argument is set to True to serialize multiple objects
-        serializer = self.serializer_class(replies, many=True)
-        # the Response method is used to send a response to the user
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # the context holds the viewer's like and follow flags when asked with `?viewer_state=1`
+        serializer = self.serializer_class(page, many=True, context=viewer_state_context(request, replies=page))
+        # the paginated response holds the replies and the link to the next page
+        return paginator.get_paginated_response(serializer.data)
 
 
 # view to update and delete comment replies
@@ -330,7 +411,10 @@ class UpdateDeleteCommentReply(APIView):
             return Response({'error': 'Comment reply not found.'}, status=status.HTTP_404_NOT_FOUND)
 
         # the delete method is used to delete the comment reply object
-        reply.delete()
+        with transaction.atomic():
+            reply.delete()
+            # the reply counter of the comment is decremented in the database
+            decrement(Comment, comment.pk, 'reply_count')
         # the Response method is used to send a response to the user
         return Response({'message': 'Comment reply deleted successfully.'}, status=status.HTTP_204_NO_CONTENT)
 
@@ -348,42 +432,18 @@ class CommentReplyLikeView(APIView):
             # If the comment reply does not exist, return a 404 error
             return Response({"message": "Comment reply not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        # Create a new comment reply like object for the current user and the given comment reply
-        comment_reply_like, created = CommentReplyLike.objects.get_or_create(
-            comment_reply=comment_reply, user=request.user)
-        
-        # Serialize and return the comment reply like object
-        serializer = CommentReplyLikeSerializer(comment_reply_like)
-
-        # Get the recipient user
-        recipient = comment_reply.user
-
-        # Get the actor user
-        actor = request.user
-
-        # Create the notification object
-        notification = Notification(
-            recipient=recipient,
-            actor_object_id=actor.id,
-            actor_content_type=ContentType.objects.get_for_model(actor),
-            verb='liked your comment reply',
-            actor_object=comment_reply,
-        )
+        # Insert the like for the current user and the given comment reply
+        comment_reply_like = self.like(comment_reply, request.user)
 
-        # Save the notification object to the database
-        notification.save()
-
-
-        # If the comment reply like object was not created (meaning the user has already liked the comment reply), return a 400 error
-        if not created:
+        # If the like already existed (meaning the user has already liked the comment reply), return a 400 error
+        if comment_reply_like is None:
             return Response({"message": "You have already liked this comment reply."}, status=status.HTTP_400_BAD_REQUEST)
 
         # Serialize and return the comment reply like object
         serializer = CommentReplyLikeSerializer(comment_reply_like)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
-    
 
-    def delete(self, request, comment_reply_id):
+    def put(self, request, comment_reply_id):
         # Get the comment reply object by its ID
         try:
             comment_reply = CommentReply.objects.get(pk=comment_reply_id)
@@ -391,53 +451,80 @@ class CommentReplyLikeView(APIView):
             # If the comment reply does not exist, return a 404 error
             return Response({"message": "Comment reply not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        # Get the comment reply like object for the current user and the given comment reply
-        comment_reply_like = CommentReplyLike.objects.filter(
-            comment_reply=comment_reply, user=request.user)
+        # Insert the like, doing nothing if the user already likes the comment reply
+        if self.like(comment_reply, request.user) is None:
+            return Response({"message": "You already like this comment reply."}, status=status.HTTP_200_OK)
+        return Response({"message": "You have liked this comment reply."}, status=status.HTTP_201_CREATED)
 
-        # If the comment reply like object does not exist (meaning the user has not liked the comment reply), return a 400 error
-        if not comment_reply_like.exists():
-            return Response({"message": "You have not liked this comment reply."}, status=status.HTTP_400_BAD_REQUEST)
+    def delete(self, request, comment_reply_id):
+        # Get the comment reply object by its ID
+        try:
+            comment_reply = CommentReply.objects.get(pk=comment_reply_id)
+        except CommentReply.DoesNotExist:
+            # If the comment reply does not exist, return a 404 error
+            return Response({"message": "Comment reply not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        # Delete the comment reply like object
-        comment_reply_like.delete()
+        # Delete the like and decrement the like counter, doing nothing if the user does not like the comment reply
+        if not remove_like(CommentReplyLike, 'comment_reply', comment_reply, request.user):
+            return Response({"message": "You have not liked this comment reply."}, status=status.HTTP_200_OK)
 
         # Return a success message
         return Response({"message": "You have unliked this comment reply."}, status=status.HTTP_200_OK)
 
+    def like(self, comment_reply, user):
+        # Insert the like row and increment the like counter; None means the like already existed
+        comment_reply_like = add_like(CommentReplyLike, 'comment_reply', comment_reply, user)
+        if comment_reply_like is not None:
+            # Create the notification object for the author of the comment reply
+            Notification.objects.create(
+                recipient=comment_reply.user,
+                actor_object_id=user.id,
+                actor_content_type=ContentType.objects.get_for_model(user),
+                verb='liked your comment reply',
+                actor_object=comment_reply,
+            )
+        return comment_reply_like
+
     
 @extend_schema(
         tags=['Comment'],
         request=None,
         responses={200: CommentSerializer}
     )
-class CommentLike(APIView):
+class CommentLikeView(APIView):
+    # the post and put methods like the comment, doing nothing if the user already likes it
     def post(self, request, comment_id):
         # query the Comment model to retrieve a comment object using the comment_id argument
         comment = get_object_or_404(Comment, id=comment_id)
-        # add the user to the likes field of the comment object
-        comment.likes.add(request.user)
-        # Create the notification object
-        recipient = comment.user
-        actor = request.user
-        verb = 'liked your comment'
-        actor_content_type = ContentType.objects.get_for_model(actor)
-        Notification.objects.create(
-            recipient=recipient,
-            actor_object_id=actor.id,
-            actor_content_type=actor_content_type,
-            verb=verb,
-            actor_object=comment,
-        )
-        # serialize the comment object and return the serialized data
+        # insert the like row and increment the like counter; None means the like already existed
+        if add_like(CommentLike, 'comment', comment, request.user) is not None:
+            # Create the notification object
+            recipient = comment.user
+            actor = request.user
+            verb = 'liked your comment'
+            actor_content_type = ContentType.objects.get_for_model(actor)
+            Notification.objects.create(
+                recipient=recipient,
+                actor_object_id=actor.id,
+                actor_content_type=actor_content_type,
+                verb=verb,
+                actor_object=comment,
+            )
+        # serialize the comment object with its current like counter and return the serialized data
+        comment.refresh_from_db(fields=['like_count'])
         serializer = CommentSerializer(comment)
         return Response(serializer.data, status=status.HTTP_200_OK)
-    
+
+    def put(self, request, comment_id):
+        return self.post(request, comment_id)
+
+    # the delete method unlikes the comment, doing nothing if the user does not like it
     def delete(self, request, comment_id):
         # query the Comment model to retrieve a comment object using the comment_id argument
         comment = get_object_or_404(Comment, id=comment_id)
-        # remove the user from the likes field of the comment object
-        comment.likes.remove(request.user)
-        # serialize the comment object and return the serialized data
+        # delete the like row and decrement the like counter if there was one
+        remove_like(CommentLike, 'comment', comment, request.user)
+        # serialize the comment object with its current like counter and return the serialized data
+        comment.refresh_from_db(fields=['like_count'])
         serializer = CommentSerializer(comment)
-        return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response(serializer.data, status=status.HTTP_200_OK)
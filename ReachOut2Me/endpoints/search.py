@@ -0,0 +1,61 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+
+from ..serializers import PostSerializer
+from ..pagination import KeysetPagination
+from ..search import search_supported, search_posts, matching_posts
+from ..viewer_state import viewer_state_context
+
+
+@extend_schema(
+        parameters=[OpenApiParameter('q', str, description='The words the posts must contain', required=True)],
+        responses={200: PostSerializer(many=True)},
+        tags=['Post']
+    )
+class SearchPostsView(APIView):
+    """
+    The posts containing every word of `q`, best match first.
+    Matches come from the full-text index of the post content (FTS5 on SQLite, a GIN index on
+    PostgreSQL), and pages are cut with a cursor over the (score, id) of the last match.
+    """
+    serializer_class = PostSerializer
+
+    def get(self, request):
+        # the search text is required
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'A search text must be given with `q`.'}, status=status.HTTP_400_BAD_REQUEST)
+        # the other databases have no full-text index to search
+        if not search_supported():
+            return Response({'error': 'Search is not available.'}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+        paginator = KeysetPagination()
+        page_size = paginator.get_page_size(request)
+        # the cursor holds the score and id of the last match of the previous page
+        position = paginator.decode_position(request, 2)
+        if position is not None:
+            position = self.parse_position(position, paginator)
+
+        # fetch one extra match to find out whether there is a next page
+        rows = search_posts(query, position=position, limit=page_size + 1)
+        paginator.request = request
+        paginator.next_position = None
+        if len(rows) > page_size:
+            post_id, score = rows[page_size - 1]
+            paginator.next_position = [score, post_id]
+        posts = matching_posts(rows[:page_size])
+
+        # the viewer's like and follow flags are added to each post when asked with `?viewer_state=1`
+        context = {'request': request}
+        context.update(viewer_state_context(request, posts=posts))
+        serializer = self.serializer_class(posts, many=True, context=context)
+        return paginator.get_paginated_response(serializer.data)
+
+    def parse_position(self, position, paginator):
+        score, post_id = position
+        if not isinstance(score, (int, float)) or not isinstance(post_id, int):
+            raise NotFound(paginator.invalid_cursor_message)
+        return float(score), post_id
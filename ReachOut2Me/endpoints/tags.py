@@ -0,0 +1,34 @@
+from rest_framework import generics
+from drf_spectacular.utils import extend_schema
+
+from ..models import Hashtag, PostHashtag
+from ..serializers import PostSerializer
+from ..tags import normalize_tag
+from ..viewer_state import viewer_state_context
+
+
+@extend_schema(
+        tags=['Post']
+    )
+class TagPostsView(generics.ListAPIView):
+    """
+    The posts using a hashtag, newest first.
+    The tag is matched case-insensitively, with or without its leading `#`, and the posts
+    are read from the (tag, created_at) index of the post hashtag table.
+    """
+    serializer_class = PostSerializer
+    # the posts of a tag are paginated over the copied post creation time
+    ordering = ('-created_at', '-id')
+
+    def get_queryset(self):
+        hashtag_id = Hashtag.objects.filter(name=normalize_tag(self.kwargs['tag'])).values_list('id', flat=True).first()
+        return PostHashtag.objects.filter(hashtag_id=hashtag_id).select_related('post', 'post__user')
+
+    def list(self, request, *args, **kwargs):
+        items = self.paginate_queryset(self.get_queryset())
+        posts = [item.post for item in items]
+        # the viewer's like and follow flags are added to each post when asked with `?viewer_state=1`
+        context = self.get_serializer_context()
+        context.update(viewer_state_context(request, posts=posts))
+        serializer = self.get_serializer(posts, many=True, context=context)
+        return self.get_paginated_response(serializer.data)
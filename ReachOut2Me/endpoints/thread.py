@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.db.models import Prefetch
+from django.urls import reverse
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.utils.urls import replace_query_param
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+
+from ..counters import prefetch_like_totals
+from ..models import Post, Comment, CommentReply
+from ..serializers import ThreadCommentSerializer
+from ..pagination import KeysetPagination
+
+# default and maximum number of replies shown under each comment of a thread
+THREAD_REPLIES = getattr(settings, 'THREAD_REPLIES', 3)
+THREAD_MAX_REPLIES = getattr(settings, 'THREAD_MAX_REPLIES', 20)
+
+
+@extend_schema(
+        parameters=[OpenApiParameter('replies', int, description='Number of replies shown under each comment')],
+        responses={200: ThreadCommentSerializer(many=True)},
+        tags=['Comment']
+    )
+class PostThreadView(APIView):
+    """
+    The discussion of a post: one page of comments, each with its author, like count and first replies.
+    The page is built with a fixed number of queries however many comments and replies there are:
+    one for the post, one for the comments and their authors, one for the replies of every
+    comment on the page, sliced per comment in the database, and one for the pending likes
+    of the hot comments when there are any.
+    """
+    # the comments and the replies are both listed newest first
+    ordering = ('-created_at', '-id')
+
+    def get(self, request, post_id):
+        # the post has to exist for its thread to be shown
+        if not Post.objects.filter(id=post_id).exists():
+            return Response({'error': 'Post not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        # the number of replies shown under each comment, kept within the allowed bounds
+        try:
+            limit = int(request.query_params.get('replies', THREAD_REPLIES))
+        except ValueError:
+            return Response({'error': 'replies must be a number.'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, THREAD_MAX_REPLIES))
+
+        # one more reply than shown is prefetched to know whether a comment has more replies
+        replies = CommentReply.objects.select_related('user', 'user__userprofile').order_by(*self.ordering)
+        comments = (
+            Comment.objects.filter(post_id=post_id)
+            .select_related('user', 'user__userprofile')
+            .prefetch_related(Prefetch('commentreplies', queryset=replies[:limit + 1], to_attr='first_replies'))
+        )
+        paginator = KeysetPagination(ordering=self.ordering)
+        page = paginator.paginate_queryset(comments, request, view=self)
+        # the likes waiting in the shards of the hot comments are summed together
+        prefetch_like_totals(page)
+
+        def replies_next_link(comment, last_reply):
+            # the link to the replies of the comment that follow the last reply shown
+            url = request.build_absolute_uri(reverse('create_get_comment_reply', kwargs={'comment_id': comment.id}))
+            position = [paginator.get_value(last_reply, name.lstrip('-')) for name in self.ordering]
+            return replace_query_param(url, paginator.cursor_query_param, paginator.encode_cursor(position))
+
+        context = {'request': request, 'replies_per_comment': limit, 'replies_next_link': replies_next_link}
+        serializer = ThreadCommentSerializer(page, many=True, context=context)
+        return paginator.get_paginated_response(serializer.data)
@@ -0,0 +1,32 @@
+from rest_framework import generics
+from drf_spectacular.utils import extend_schema
+
+from ..models import TrendingPost
+from ..serializers import PostSerializer
+from ..viewer_state import viewer_state_context
+
+
+@extend_schema(
+        tags=['Post']
+    )
+class TrendingPostsView(generics.ListAPIView):
+    """
+    The posts with the most recent like, comment and reply activity, most trending first.
+    The ranking is precomputed by the `compute_trending` command, so a page is a range scan
+    over the rank index however much activity there was.
+    """
+    serializer_class = PostSerializer
+    # the ranking is paginated over the unique rank
+    ordering = ('rank',)
+
+    def get_queryset(self):
+        return TrendingPost.objects.select_related('post', 'post__user')
+
+    def list(self, request, *args, **kwargs):
+        items = self.paginate_queryset(self.get_queryset())
+        posts = [item.post for item in items]
+        # the viewer's like and follow flags are added to each post when asked with `?viewer_state=1`
+        context = self.get_serializer_context()
+        context.update(viewer_state_context(request, posts=posts))
+        serializer = self.get_serializer(posts, many=True, context=context)
+        return self.get_paginated_response(serializer.data)
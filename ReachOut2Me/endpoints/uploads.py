@@ -0,0 +1,132 @@
+from django.shortcuts import get_object_or_404
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+
+from ..models import ChunkedUpload
+from ..serializers import ChunkedUploadSerializer
+from ..uploads import (
+    CHUNKED_UPLOAD_MAX_BYTES, CHUNKED_UPLOAD_MAX_CHUNK_BYTES, start_upload, write_chunk, append_chunk,
+    complete_upload, discard_upload,
+)
+
+
+@extend_schema(
+        request=ChunkedUploadSerializer,
+        responses={201: ChunkedUploadSerializer},
+        tags=['Uploads']
+    )
+class ChunkedUploadView(APIView):
+    """
+    Start a resumable upload of an image by giving its file name and total size.
+    The bytes are then sent in chunks with PUT, the upload is finished with POST to
+    `complete/`, and its id is given as `upload_id` when creating a post, comment or
+    message or when changing the avatar.
+    """
+    def post(self, request):
+        serializer = ChunkedUploadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        # the announced size is checked up front, so no byte of a file too large is ever stored
+        size = serializer.validated_data['size']
+        if not 0 < size <= CHUNKED_UPLOAD_MAX_BYTES:
+            return Response(
+                {'error': f'The size must be between 1 and {CHUNKED_UPLOAD_MAX_BYTES} bytes.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        upload = start_upload(request.user, serializer.validated_data['filename'], size)
+        return Response(ChunkedUploadSerializer(upload).data, status=status.HTTP_201_CREATED)
+
+
+@extend_schema(
+        responses={200: ChunkedUploadSerializer},
+        tags=['Uploads']
+    )
+class ChunkedUploadDetailView(APIView):
+    """
+    The progress of an upload, which a client resumes from after losing its connection.
+    """
+    def get_upload(self, request, upload_id):
+        # uploads are only visible to the user who started them
+        return get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+
+    def get(self, request, upload_id):
+        upload = self.get_upload(request, upload_id)
+        return Response(ChunkedUploadSerializer(upload).data, headers={'Upload-Offset': str(upload.offset)})
+
+    @extend_schema(
+            parameters=[OpenApiParameter(
+                'Upload-Offset', int, OpenApiParameter.HEADER, required=True,
+                description='The offset the chunk starts at, which must be the offset of the upload',
+            )],
+            request={'application/octet-stream': {'type': 'string', 'format': 'binary'}},
+            responses={200: ChunkedUploadSerializer},
+        )
+    def put(self, request, upload_id):
+        """
+        Append the raw request body to the upload. The body is streamed to disk a small
+        buffer at a time; it is never parsed nor held in memory.
+        """
+        upload = self.get_upload(request, upload_id)
+        if upload.completed_at is not None:
+            return Response({'error': 'The upload is already complete.'}, status=status.HTTP_409_CONFLICT)
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.headers['Content-Length'])
+        except (KeyError, ValueError):
+            return Response(
+                {'error': 'The Upload-Offset and Content-Length headers are required.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        # a chunk must start where the previous one ended; the client asks with GET after a failure
+        if offset != upload.offset:
+            return Response(
+                {'error': 'The chunk does not start at the offset of the upload.', 'offset': upload.offset},
+                status=status.HTTP_409_CONFLICT,
+            )
+        if length > CHUNKED_UPLOAD_MAX_CHUNK_BYTES:
+            return Response(
+                {'error': f'A chunk can hold at most {CHUNKED_UPLOAD_MAX_CHUNK_BYTES} bytes.'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+        if offset + length > upload.size:
+            return Response({'error': 'The chunk goes past the size of the upload.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        chunk_path, written = write_chunk(upload, request.stream, length)
+        if not append_chunk(upload, chunk_path, written):
+            upload.refresh_from_db()
+            return Response(
+                {'error': 'Another chunk was written at this offset.', 'offset': upload.offset},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return Response(ChunkedUploadSerializer(upload).data, headers={'Upload-Offset': str(upload.offset)})
+
+    def delete(self, request, upload_id):
+        # abandon the upload and delete what was received
+        discard_upload(self.get_upload(request, upload_id))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@extend_schema(
+        request=None,
+        responses={200: ChunkedUploadSerializer},
+        tags=['Uploads']
+    )
+class CompleteChunkedUploadView(APIView):
+    """
+    Finish an upload once all of its bytes were received, after checking they make an image.
+    """
+    def post(self, request, upload_id):
+        upload = get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+        if upload.offset != upload.size:
+            return Response(
+                {'error': 'Some bytes of the upload were not received yet.', 'offset': upload.offset},
+                status=status.HTTP_409_CONFLICT,
+            )
+        if upload.completed_at is None:
+            try:
+                complete_upload(upload)
+            except ValueError:
+                return Response({'error': 'The upload is not a valid image.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(ChunkedUploadSerializer(upload).data)
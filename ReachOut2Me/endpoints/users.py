@@ -7,6 +7,8 @@ from rest_framework import status
 from ..serializers import UserProfileSerializer, \
     UploadAvatarSerializer, UserProfile_Serializer, UserSerializer
 from ..utils import validate_country
+from ..pagination import KeysetPagination
+from ..cache import get_or_build, payload_key, profile_scope
 from drf_spectacular.utils import extend_schema
 
 
@@ -23,12 +25,15 @@ class GetAllUsers(APIView):
     # get method to get all users
     def get(self, request):
         # query the UserProfile table in the database to get all users
-        users = UserProfile.objects.all()
-        # serialize the data passing in the users object as the data
+        users = UserProfile.objects.select_related('user')
+        # keep one page of users, walking the primary key index from the requested cursor
+        paginator = KeysetPagination(ordering=('id',))
+        page = paginator.paginate_queryset(users, request, view=self)
+        # serialize the data passing in the page of users as the data
         # many=True because we are serializing a list of objects
-        serializer = UserProfile_Serializer(users, many=True)
-        # return the serialized data with a status code of 200
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        serializer = UserProfile_Serializer(page, many=True)
+        # return the serialized data with the link to the next page
+        return paginator.get_paginated_response(serializer.data)
 
 
 # view to get a single user
@@ -138,7 +143,7 @@ class UploadAvatarView(APIView):
         # query the database to get the user avatar
         user_avatar = UserProfile.objects.filter(user=user_profile).first()
         # serialize the data passing in the user_avatar object as the data to be serialized and the request.data
-        serializer = UploadAvatarSerializer(user_avatar, data=request.data)
+        serializer = UploadAvatarSerializer(user_avatar, data=request.data, context={'request': request})
         # if the serializer is valid, save the data and return a success message with a status code of 200
         if serializer.is_valid():
             serializer.save()
@@ -156,18 +161,26 @@ class UploadAvatarView(APIView):
     )
 class SearchUserView(APIView):
     def get(self, request, username):
-        # query the database and get the user by username
-        user = User.objects.filter(username=username).first()
+        # the serialized profile is read through the cache, and only one request rebuilds it when it expires
+        key = payload_key(profile_scope(username), request.get_host())
+        data = get_or_build('profile', key, lambda: self.build_profile(username))
         # if user is not found, return a 404 error
-        if not user:
+        if data is None:
             return Response(
                 {'error': 'User with that username not found.',
                  'message': 'Please check the username and try again.'
                  },
                 status=status.HTTP_404_NOT_FOUND)
+        # return the serialized data with a status code of 200
+        return Response(data, status=status.HTTP_200_OK)
+
+    def build_profile(self, username):
+        # query the database and get the user by username
+        user = User.objects.filter(username=username).first()
+        if not user:
+            return None
         # if the user is found, query the UserProfile table in the database to get the user profile
         exact_user = UserProfile.objects.filter(user=user).first()
         # serializer
         serializer = UserProfile_Serializer(exact_user)
-        # return the serialized data with a status code of 200
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return serializer.data
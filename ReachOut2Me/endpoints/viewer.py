@@ -0,0 +1,76 @@
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+from rest_framework import status
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+
+from ..serializers import ViewerStateSerializer, RelationshipSerializer
+from ..viewer_state import MAX_IDS, liked_post_ids, liked_comment_ids, liked_reply_ids, followed_user_ids, relationships as user_relationships
+
+
+def parse_ids(value):
+    # turn a comma separated list of ids into a list of integers
+    if not value:
+        return []
+    return [int(item) for item in value.split(',') if item.strip()]
+
+
+@extend_schema(
+    description='Return which of the given posts, comments and replies the authenticated user liked '
+                'and which of the given users they follow, with one query per relation.',
+    parameters=[
+        OpenApiParameter('posts', str, description='Comma separated post ids'),
+        OpenApiParameter('comments', str, description='Comma separated comment ids'),
+        OpenApiParameter('replies', str, description='Comma separated comment reply ids'),
+        OpenApiParameter('users', str, description='Comma separated user ids'),
+    ],
+    request=None,
+    responses={200: ViewerStateSerializer},
+    tags=['Users']
+)
+@api_view(['GET'])
+def viewer_state(request):
+    try:
+        # Read the lists of ids to look up from the query string
+        ids = {name: parse_ids(request.query_params.get(name)) for name in ('posts', 'comments', 'replies', 'users')}
+    except ValueError:
+        return Response({"error": "Ids must be comma separated numbers"}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Refuse lists that are too long to answer with a single query
+    if any(len(values) > MAX_IDS for values in ids.values()):
+        return Response({"error": f"At most {MAX_IDS} ids can be given per list"}, status=status.HTTP_400_BAD_REQUEST)
+
+    user = request.user
+    data = {
+        'liked_posts': sorted(liked_post_ids(user, ids['posts'])) if ids['posts'] else [],
+        'liked_comments': sorted(liked_comment_ids(user, ids['comments'])) if ids['comments'] else [],
+        'liked_replies': sorted(liked_reply_ids(user, ids['replies'])) if ids['replies'] else [],
+        'following': sorted(followed_user_ids(user, ids['users'])) if ids['users'] else [],
+    }
+    return Response(data, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    description='Return whether the authenticated user follows each of the given users, whether they follow '
+                'the authenticated user back, and whether both are true, with one query per direction.',
+    parameters=[
+        OpenApiParameter('ids', str, description='Comma separated user ids'),
+    ],
+    request=None,
+    responses={200: RelationshipSerializer(many=True)},
+    tags=['Users']
+)
+@api_view(['GET'])
+def relationships(request):
+    try:
+        # Read the users to look up from the query string, once each and in the given order
+        ids = list(dict.fromkeys(parse_ids(request.query_params.get('ids'))))
+    except ValueError:
+        return Response({"error": "Ids must be comma separated numbers"}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Refuse lists that are too long to answer with a single query per direction
+    if len(ids) > MAX_IDS:
+        return Response({"error": f"At most {MAX_IDS} ids can be given"}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Users that do not exist come back with every flag false
+    data = user_relationships(request.user, ids) if ids else []
+    return Response(RelationshipSerializer(data, many=True).data, status=status.HTTP_200_OK)
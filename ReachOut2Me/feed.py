@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .follows import follower_ids
+from .models import FeedItem, Post
+
+# number of feed rows written per INSERT when fanning a post out
+FANOUT_BATCH_SIZE = getattr(settings, 'FEED_FANOUT_BATCH_SIZE', 1000)
+# number of recent posts copied into a feed when the owner follows someone new
+FOLLOW_BACKFILL_SIZE = getattr(settings, 'FEED_FOLLOW_BACKFILL_SIZE', 100)
+
+
+def fan_out_post(post):
+    """
+    Push a newly created post into the feed of every follower of its author.
+    Followers are streamed and written in batches so memory stays flat for large audiences.
+    """
+    batch = []
+    for owner_id in follower_ids(post.user_id).iterator(chunk_size=FANOUT_BATCH_SIZE):
+        batch.append(FeedItem(owner_id=owner_id, post=post, author_id=post.user_id, created_at=post.created_at))
+        if len(batch) >= FANOUT_BATCH_SIZE:
+            FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def backfill_feed(owner_id, author_id):
+    """
+    Copy the most recent posts of a newly followed user into the follower's feed.
+    """
+    backfill_feed_from(owner_id, [author_id])
+
+
+def backfill_feed_from(owner_id, author_ids):
+    """
+    Copy the most recent posts of each of several newly followed users into the follower's feed,
+    picking the latest posts of every author in one query with a window function.
+    """
+    posts = (
+        Post.objects.filter(user_id__in=author_ids)
+        .annotate(position=Window(RowNumber(), partition_by=F('user_id'), order_by=[F('created_at').desc(), F('id').desc()]))
+        .filter(position__lte=FOLLOW_BACKFILL_SIZE)
+        .values_list('id', 'user_id', 'created_at')
+    )
+    FeedItem.objects.bulk_create(
+        [
+            FeedItem(owner_id=owner_id, post_id=post_id, author_id=author_id, created_at=created_at)
+            for post_id, author_id, created_at in posts
+        ],
+        batch_size=FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def prune_feed(owner_id, author_id):
+    """
+    Remove the posts of an unfollowed user from the follower's feed.
+    """
+    FeedItem.objects.filter(owner_id=owner_id, author_id=author_id).delete()
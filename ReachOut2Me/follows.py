@@ -0,0 +1,115 @@
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+
+from .cache import invalidate_on_commit, profile_scope, following_scope
+from .models import Follow, FollowEvent, User, UserProfile
+
+# the number of follow events written per INSERT
+EVENT_BATCH_SIZE = 1000
+# the largest number of users that can be followed in one bulk request
+BULK_FOLLOW_MAX = 100
+
+
+def adjust_counts(follower_id, following_id, delta):
+    # one UPDATE per side, so concurrent follows of the same user do not overwrite each other
+    UserProfile.objects.filter(user_id=follower_id).update(following_count=Greatest(F('following_count') + delta, 0))
+    UserProfile.objects.filter(user_id=following_id).update(follower_count=Greatest(F('follower_count') + delta, 0))
+
+
+def lock_follower(follower_id):
+    # the follows of one user are serialized on their profile row, so a follow never reads the edges
+    # another transaction is about to insert; SQLite already allows one writer at a time
+    list(UserProfile.objects.select_for_update().filter(user_id=follower_id).values_list('pk', flat=True))
+
+
+def follow(follower_id, following_id):
+    """
+    Record that a user follows another and count it on both profiles.
+    Return False when the user already followed the other one.
+    """
+    with transaction.atomic():
+        lock_follower(follower_id)
+        _, created = Follow.objects.get_or_create(follower_id=follower_id, following_id=following_id)
+        if created:
+            adjust_counts(follower_id, following_id, 1)
+            FollowEvent.objects.create(follower_id=follower_id, following_id=following_id, followed=True)
+    return created
+
+
+def follow_many(follower_id, following_ids):
+    """
+    Record that a user follows every one of `following_ids` and count the new follows,
+    with a fixed number of queries however many users are followed.
+    Return the ids of the users that were not followed yet, in the given order.
+    """
+    with transaction.atomic():
+        # the edges are read under the lock, so every id found missing is inserted by this transaction
+        lock_follower(follower_id)
+        already = set(
+            Follow.objects.filter(follower_id=follower_id, following_id__in=following_ids)
+            .values_list('following_id', flat=True)
+        )
+        new_ids = [following_id for following_id in dict.fromkeys(following_ids) if following_id not in already]
+        if not new_ids:
+            return []
+        # conflicts are left to the unique constraint for follows written outside of this module
+        Follow.objects.bulk_create(
+            [Follow(follower_id=follower_id, following_id=following_id) for following_id in new_ids],
+            ignore_conflicts=True,
+        )
+        UserProfile.objects.filter(user_id=follower_id).update(following_count=F('following_count') + len(new_ids))
+        UserProfile.objects.filter(user_id__in=new_ids).update(follower_count=F('follower_count') + 1)
+        FollowEvent.objects.bulk_create(
+            [FollowEvent(follower_id=follower_id, following_id=following_id, followed=True) for following_id in new_ids],
+            batch_size=EVENT_BATCH_SIZE,
+        )
+        # bulk_create sends no post_save, so the cached profiles and following set are dropped here
+        usernames = User.objects.filter(pk__in=[follower_id, *new_ids]).values_list('username', flat=True)
+        invalidate_on_commit(following_scope(follower_id), *[profile_scope(username) for username in usernames])
+    return new_ids
+
+
+def unfollow(follower_id, following_id):
+    """
+    Remove the follow of a user by another and uncount it on both profiles.
+    Return False when the user did not follow the other one.
+    """
+    with transaction.atomic():
+        lock_follower(follower_id)
+        deleted, _ = Follow.objects.filter(follower_id=follower_id, following_id=following_id).delete()
+        if deleted:
+            adjust_counts(follower_id, following_id, -1)
+            FollowEvent.objects.create(follower_id=follower_id, following_id=following_id, followed=False)
+    return bool(deleted)
+
+
+def follower_ids(user_id):
+    """
+    Return the ids of the users following the given user, read from the (following, follower) index.
+    """
+    return Follow.objects.filter(following_id=user_id).values_list('follower_id', flat=True)
+
+
+def forget_follows_of(user_id):
+    """
+    Lower the counts of everyone a user follows or is followed by, and log the unfollows,
+    before the user's follows are removed by the cascade of its deletion, which does not go
+    through `unfollow`.
+    """
+    edges = Follow.objects.filter(Q(follower_id=user_id) | Q(following_id=user_id)).values_list('follower_id', 'following_id')
+    # the edges are streamed, since a popular user can have many followers
+    batch = []
+    for follower_id, following_id in edges.iterator(chunk_size=EVENT_BATCH_SIZE):
+        batch.append(FollowEvent(follower_id=follower_id, following_id=following_id, followed=False))
+        if len(batch) >= EVENT_BATCH_SIZE:
+            FollowEvent.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        FollowEvent.objects.bulk_create(batch)
+    UserProfile.objects.filter(
+        user_id__in=Follow.objects.filter(follower_id=user_id).values('following_id'),
+    ).update(follower_count=Greatest(F('follower_count') - 1, 0))
+    UserProfile.objects.filter(
+        user_id__in=Follow.objects.filter(following_id=user_id).values('follower_id'),
+    ).update(following_count=Greatest(F('following_count') - 1, 0))
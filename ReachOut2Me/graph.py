@@ -0,0 +1,432 @@
+import itertools
+import json
+import os
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Follow, FollowEvent
+
+# the directory holding the memory-mapped snapshot shared by the workers, or None to build it in each process
+FOLLOW_GRAPH_SNAPSHOT_DIR = getattr(settings, 'FOLLOW_GRAPH_SNAPSHOT_DIR', None)
+# how often a worker replays the follow events written since its last look, in seconds
+FOLLOW_GRAPH_REFRESH_SECONDS = getattr(settings, 'FOLLOW_GRAPH_REFRESH_SECONDS', 5)
+# the number of replayed edges kept beside the arrays before they are merged into new ones
+FOLLOW_GRAPH_MAX_PENDING = getattr(settings, 'FOLLOW_GRAPH_MAX_PENDING', 100000)
+# how many events before the last one replayed are replayed again on every refresh: event ids are
+# given out when a transaction inserts them, not when it commits, so an event can become visible after
+# events with higher ids; it is only missed if more than this many events are written before it commits
+FOLLOW_GRAPH_REPLAY_LAG = getattr(settings, 'FOLLOW_GRAPH_REPLAY_LAG', 1000)
+# the number of edges read per query when building the graph
+BUILD_CHUNK_SIZE = 100000
+# the number of old follow events deleted per query
+PRUNE_BATCH_SIZE = 10000
+# the name of the symlink pointing at the latest snapshot in the snapshot directory
+CURRENT = 'current'
+
+EMPTY = np.empty(0, dtype=np.int32)
+
+
+class CSR:
+    """
+    A compressed sparse row adjacency: the neighbors of node `n` are
+    `targets[offsets[n]:offsets[n + 1]]`, sorted. Nodes are user ids, so no mapping is kept.
+    """
+    def __init__(self, offsets, targets):
+        self.offsets = offsets
+        self.targets = targets
+
+    @property
+    def size(self):
+        return len(self.offsets) - 1
+
+    @classmethod
+    def from_edges(cls, sources, targets, size):
+        """
+        Build the adjacency of the `(sources[i], targets[i])` edges over `size` nodes.
+        """
+        order = np.lexsort((targets, sources))
+        targets = np.ascontiguousarray(targets[order], dtype=np.int32)
+        counts = np.bincount(sources, minlength=size)
+        offsets = np.zeros(size + 1, dtype=np.int32)
+        np.cumsum(counts, out=offsets[1:])
+        return cls(offsets, targets)
+
+    def row(self, node):
+        if not 0 <= node < self.size:
+            return EMPTY
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def gather(self, nodes):
+        """
+        Return the neighbors of all of `nodes`, with repeats, in one vectorized pass.
+        """
+        nodes = nodes[(nodes >= 0) & (nodes < self.size)]
+        starts = self.offsets[nodes].astype(np.int64)
+        lengths = self.offsets[nodes + 1] - starts
+        total = int(lengths.sum())
+        if not total:
+            return EMPTY
+        # the position of every gathered neighbor: its row start plus its rank within the row
+        shifts = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        return self.targets[shifts + np.arange(total)]
+
+    def edges(self):
+        # the (sources, targets) arrays of every edge
+        return np.repeat(np.arange(self.size, dtype=np.int32), np.diff(self.offsets)), self.targets
+
+
+class Direction:
+    """
+    One direction of the graph: its arrays, plus the edges added and removed since they were built.
+    """
+    def __init__(self, csr):
+        self.csr = csr
+        self.added = {}
+        self.removed = {}
+
+    def neighbors(self, node):
+        row = self.csr.row(node)
+        if node in self.added:
+            row = np.union1d(row, np.fromiter(self.added[node], dtype=np.int32))
+        if node in self.removed:
+            row = np.setdiff1d(row, np.fromiter(self.removed[node], dtype=np.int32), assume_unique=True)
+        return row
+
+    def gather(self, nodes):
+        """
+        Return the neighbors of all of `nodes`, with repeats. Nodes without pending changes are
+        read straight from the arrays; the others are merged with their changes one by one.
+        """
+        if not self.added and not self.removed:
+            return self.csr.gather(nodes)
+        changed = np.fromiter(self.added.keys() | self.removed.keys(), dtype=np.int64)
+        dirty = np.isin(nodes, changed)
+        parts = [self.csr.gather(nodes[~dirty])]
+        parts.extend(self.neighbors(int(node)) for node in nodes[dirty])
+        return np.concatenate(parts)
+
+    def has_edge(self, source, target):
+        row = self.csr.row(source)
+        index = np.searchsorted(row, target)
+        return bool(index < len(row) and row[index] == target)
+
+    def apply(self, source, target, present):
+        # the change is recorded against the arrays, so replaying an event twice changes nothing
+        if present:
+            self.discard(self.removed, source, target)
+            if not self.has_edge(source, target):
+                self.added.setdefault(source, set()).add(target)
+        else:
+            self.discard(self.added, source, target)
+            if self.has_edge(source, target):
+                self.removed.setdefault(source, set()).add(target)
+
+    def discard(self, changes, source, target):
+        if source in changes:
+            changes[source].discard(target)
+            if not changes[source]:
+                del changes[source]
+
+    @property
+    def pending(self):
+        return sum(map(len, self.added.values())) + sum(map(len, self.removed.values()))
+
+    def compacted(self, size):
+        """
+        Return the arrays with the pending changes merged in.
+        """
+        if not size:
+            return CSR(np.zeros(1, dtype=np.int32), EMPTY)
+        sources, targets = self.csr.edges()
+        keys = sources.astype(np.int64) * size + targets
+        removed = [source * size + target for source, nodes in self.removed.items() for target in nodes]
+        added = [source * size + target for source, nodes in self.added.items() for target in nodes]
+        keys = np.union1d(np.setdiff1d(keys, np.array(removed, dtype=np.int64)), np.array(added, dtype=np.int64))
+        return CSR.from_edges((keys // size).astype(np.int32), (keys % size).astype(np.int32), size)
+
+
+class FollowGraph:
+    """
+    An in-memory snapshot of the follow graph, held as two CSR adjacencies of int32 arrays:
+    the users each user follows, and the followers of each user.
+
+    The snapshot is built from the Follow table, or loaded from a memory-mapped copy shared
+    by every worker on the machine, and is brought up to date by replaying the FollowEvent
+    log written by `follows.follow` and `follows.unfollow` since it was taken.
+    """
+    def __init__(self, following, followers, last_event_id=0, built_at=None):
+        self.following_edges = Direction(following)
+        self.follower_edges = Direction(followers)
+        # the id of the last follow event reflected in the graph
+        self.last_event_id = last_event_id
+        self.built_at = built_at or time.time()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_edges(cls, followers, followed, size=None, last_event_id=0):
+        """
+        Build the graph of the `followers[i]` -> `followed[i]` edges, given as int32 arrays.
+        """
+        if size is None:
+            size = int(max(followers.max(initial=-1), followed.max(initial=-1))) + 1
+        return cls(
+            CSR.from_edges(followers, followed, size),
+            CSR.from_edges(followed, followers, size),
+            last_event_id=last_event_id,
+        )
+
+    @classmethod
+    def build(cls):
+        """
+        Read the whole Follow table into a new graph. The last event id is read first, so the events
+        replayed afterwards cover the follows committed while the table was read; under READ COMMITTED
+        the statements do not share one snapshot, but replaying an event twice changes nothing, and
+        events still in flight at the start are replayed within FOLLOW_GRAPH_REPLAY_LAG.
+        """
+        with transaction.atomic():
+            last_event_id = FollowEvent.objects.aggregate(last=Max('id'))['last'] or 0
+            count = Follow.objects.count()
+            followers = np.empty(count, dtype=np.int32)
+            followed = np.empty(count, dtype=np.int32)
+            # the edges are copied into preallocated arrays, so no Python list of the whole graph is made
+            filled = 0
+            edges = Follow.objects.order_by().values_list('follower_id', 'following_id')
+            for follower_id, following_id in edges.iterator(chunk_size=BUILD_CHUNK_SIZE):
+                if filled == count:
+                    break
+                followers[filled] = follower_id
+                followed[filled] = following_id
+                filled += 1
+        return cls.from_edges(followers[:filled], followed[:filled], last_event_id=last_event_id)
+
+    @property
+    def size(self):
+        return self.following_edges.csr.size
+
+    def following(self, user_id):
+        """
+        Return the sorted ids of the users `user_id` follows.
+        """
+        return self.following_edges.neighbors(user_id)
+
+    def followers(self, user_id):
+        """
+        Return the sorted ids of the users following `user_id`.
+        """
+        return self.follower_edges.neighbors(user_id)
+
+    def mutual_follows(self, user_id):
+        """
+        Return the users who follow `user_id` and are followed back.
+        """
+        return np.intersect1d(self.following(user_id), self.followers(user_id), assume_unique=True)
+
+    def common_followers(self, user_id, other_id):
+        """
+        Return the users following both `user_id` and `other_id`.
+        """
+        return np.intersect1d(self.followers(user_id), self.followers(other_id), assume_unique=True)
+
+    def common_following(self, user_id, other_id):
+        """
+        Return the users followed by both `user_id` and `other_id`.
+        """
+        return np.intersect1d(self.following(user_id), self.following(other_id), assume_unique=True)
+
+    def k_hop(self, user_id, k=2, followers=False):
+        """
+        Return the users exactly `k` follows away from `user_id`, that is reached in k steps
+        and no fewer; with k=2, the users followed by the users `user_id` follows, minus the
+        ones it already follows. Each step expands the whole frontier in one vectorized gather.
+        With `followers`, the edges are walked backwards.
+        """
+        edges = self.follower_edges if followers else self.following_edges
+        seen = np.array([user_id], dtype=np.int32)
+        frontier = seen
+        for _ in range(k):
+            frontier = np.setdiff1d(np.unique(edges.gather(frontier)), seen, assume_unique=True)
+            if not len(frontier):
+                break
+            seen = np.union1d(seen, frontier)
+        return frontier
+
+    def apply(self, follower_id, following_id, followed):
+        self.following_edges.apply(follower_id, following_id, followed)
+        self.follower_edges.apply(following_id, follower_id, followed)
+
+    def refresh(self):
+        """
+        Replay the follow events written since the last refresh, and merge them into new arrays
+        once there are more than FOLLOW_GRAPH_MAX_PENDING of them. Return the number of new events.
+
+        The last FOLLOW_GRAPH_REPLAY_LAG events already seen are replayed again, in id order, so
+        an event committed after events with higher ids is still applied. Replaying a contiguous
+        range of ids leaves every edge in the state of its latest event.
+        """
+        with self.lock:
+            events = (
+                FollowEvent.objects.filter(id__gt=self.last_event_id - FOLLOW_GRAPH_REPLAY_LAG)
+                .order_by('id').values_list('id', 'follower_id', 'following_id', 'followed')
+            )
+            replayed = 0
+            last_event_id = self.last_event_id
+            for event_id, follower_id, following_id, followed in events.iterator(chunk_size=BUILD_CHUNK_SIZE):
+                self.apply(follower_id, following_id, followed)
+                if event_id > last_event_id:
+                    replayed += 1
+                self.last_event_id = max(self.last_event_id, event_id)
+            if self.following_edges.pending > FOLLOW_GRAPH_MAX_PENDING:
+                self.compact()
+            return replayed
+
+    def compact(self):
+        ids = [
+            node for changes in (self.following_edges.added, self.follower_edges.added)
+            for source, targets in changes.items() for node in (source, *targets)
+        ]
+        size = max(self.size, max(ids, default=-1) + 1)
+        self.following_edges = Direction(self.following_edges.compacted(size))
+        self.follower_edges = Direction(self.follower_edges.compacted(size))
+
+    def save(self, directory):
+        """
+        Write the arrays as .npy files that `load` can memory-map. Pending changes are merged first.
+        """
+        self.compact()
+        os.makedirs(directory, exist_ok=True)
+        arrays = {
+            'following_offsets': self.following_edges.csr.offsets,
+            'following_targets': self.following_edges.csr.targets,
+            'follower_offsets': self.follower_edges.csr.offsets,
+            'follower_targets': self.follower_edges.csr.targets,
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, f'{name}.npy'), array)
+        with open(os.path.join(directory, 'meta.json'), 'w') as file:
+            json.dump({'last_event_id': self.last_event_id, 'built_at': self.built_at}, file)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """
+        Open a saved graph. With `mmap` the arrays are mapped read-only rather than read, so every
+        process loading the same files shares one copy in the page cache.
+        """
+        mode = 'r' if mmap else None
+
+        def array(name):
+            return np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mode)
+
+        with open(os.path.join(directory, 'meta.json')) as file:
+            meta = json.load(file)
+        return cls(
+            CSR(array('following_offsets'), array('following_targets')),
+            CSR(array('follower_offsets'), array('follower_targets')),
+            last_event_id=meta['last_event_id'],
+            built_at=meta['built_at'],
+        )
+
+
+def write_snapshot(graph, root):
+    """
+    Save `graph` in a new directory of `root` and point the `current` symlink at it, so
+    workers loading the snapshot never see a half-written one. The previous snapshot is kept
+    for the workers that resolved the link just before it moved, and older ones are removed;
+    workers still mapping them keep their files until they let go of them.
+    """
+    name = f'{graph.last_event_id}-{time.time_ns()}'
+    graph.save(os.path.join(root, name))
+    current = os.path.join(root, CURRENT)
+    previous = os.path.basename(os.readlink(current)) if os.path.islink(current) else None
+    link = os.path.join(root, f'{CURRENT}.{os.getpid()}')
+    os.symlink(name, link)
+    os.replace(link, current)
+    for entry in os.scandir(root):
+        if entry.is_dir(follow_symlinks=False) and entry.name not in (name, previous):
+            for file in os.scandir(entry.path):
+                os.remove(file.path)
+            os.rmdir(entry.path)
+    return name
+
+
+def load_snapshot(root):
+    """
+    Load the snapshot `current` points at, or return None when there is none. The link is resolved
+    once and every file is read from that directory, so a snapshot written meanwhile is never mixed
+    in; if the directory was removed before its files were opened, the new link is followed.
+    """
+    for attempt in range(3):
+        current = os.path.join(root, CURRENT)
+        if not os.path.exists(current):
+            return None
+        try:
+            return FollowGraph.load(os.path.realpath(current))
+        except FileNotFoundError:
+            continue
+    return None
+
+
+def load_graph():
+    # the shared snapshot when there is one, the Follow table otherwise
+    graph = load_snapshot(FOLLOW_GRAPH_SNAPSHOT_DIR) if FOLLOW_GRAPH_SNAPSHOT_DIR else None
+    if graph is None:
+        graph = FollowGraph.build()
+    graph.refresh()
+    return graph
+
+
+def prune_follow_events(keep_days, up_to_id=None):
+    """
+    Delete the follow events older than `keep_days` days, and with an id up to `up_to_id` when
+    given, oldest first in batches read along the primary key. Return the number deleted.
+    """
+    cutoff = timezone.now() - timedelta(days=keep_days)
+    events = FollowEvent.objects.all() if up_to_id is None else FollowEvent.objects.filter(id__lte=up_to_id)
+    pruned = 0
+    while True:
+        batch = list(events.order_by('id').values_list('id', 'created_at')[:PRUNE_BATCH_SIZE])
+        # the ids grow with time, so the first event young enough to keep ends the walk
+        old = list(itertools.takewhile(lambda event: event[1] < cutoff, batch))
+        if old:
+            pruned += FollowEvent.objects.filter(id__gte=old[0][0], id__lte=old[-1][0]).delete()[0]
+        if len(old) < PRUNE_BATCH_SIZE:
+            return pruned
+
+
+_graph = None
+_refreshed_at = 0
+_graph_lock = threading.Lock()
+
+
+def get_graph():
+    """
+    Return the follow graph of this process, loading it on first use and replaying the new
+    follow events at most every FOLLOW_GRAPH_REFRESH_SECONDS.
+
+    Without FOLLOW_GRAPH_SNAPSHOT_DIR, the first call of every process reads the whole Follow
+    table while holding the lock, which takes about half a minute with tens of millions of
+    follows; set up the snapshot built by `build_follow_graph` before using the graph at that size.
+    """
+    global _graph, _refreshed_at
+    with _graph_lock:
+        now = time.monotonic()
+        if _graph is None:
+            _graph = load_graph()
+            _refreshed_at = now
+        elif now - _refreshed_at >= FOLLOW_GRAPH_REFRESH_SECONDS:
+            _graph.refresh()
+            _refreshed_at = now
+        return _graph
+
+
+def reset_graph():
+    # drop the graph of this process, which is loaded again on next use
+    global _graph
+    with _graph_lock:
+        _graph = None
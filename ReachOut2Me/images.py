@@ -0,0 +1,266 @@
+import base64
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# the longest side of each variant, in pixels; images are never enlarged
+IMAGE_VARIANTS = getattr(settings, 'IMAGE_VARIANTS', {'thumb': 150, 'medium': 600, 'large': 1200})
+# the side of each square avatar variant, in pixels
+AVATAR_VARIANTS = getattr(settings, 'AVATAR_VARIANTS', {'small': 48, 'medium': 96, 'large': 256})
+# each kind of image: its variants, whether they are cropped square, and how their files are named
+VARIANT_KINDS = {
+    'image': {'variants': IMAGE_VARIANTS, 'square': False, 'filename': '{variant}.{extension}'},
+    'avatar': {'variants': AVATAR_VARIANTS, 'square': True, 'filename': 'avatar-{size}.{extension}'},
+}
+# the formats every variant is encoded to, with their Pillow name and encoder options
+IMAGE_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+# the number of worker processes decoding and encoding images
+IMAGE_PROCESSING_WORKERS = getattr(settings, 'IMAGE_PROCESSING_WORKERS', 2)
+# the longest side of the blurred placeholder embedded in the metadata, in pixels
+PLACEHOLDER_SIZE = 16
+# the models with processed images: their image field, the field holding the variants,
+# the field holding the metadata and the kind of variants
+IMAGE_FIELDS = {
+    'Post': ('image', 'image_variants', 'image_meta', 'image'),
+    'Comment': ('image', 'image_variants', 'image_meta', 'image'),
+    'Message': ('image', 'image_variants', 'image_meta', 'image'),
+    'UserProfile': ('avatar', 'avatar_variants', 'avatar_meta', 'avatar'),
+}
+
+_executor = None
+_writer = None
+_executor_lock = threading.Lock()
+
+
+def variants_dir(name):
+    # post_images/photo.jpg -> post_images/variants/photo.jpg
+    directory, filename = os.path.split(name)
+    return os.path.join(directory, 'variants', filename)
+
+
+def variant_files(kind, output_dir, variant):
+    spec = VARIANT_KINDS[kind]
+    size = spec['variants'][variant]
+    return {
+        extension: os.path.join(output_dir, spec['filename'].format(variant=variant, size=size, extension=extension))
+        for extension in IMAGE_FORMATS
+    }
+
+
+def render_variants(media_root, name, kind='image'):
+    """
+    Decode the image stored under `name` and write its resized variants next to it,
+    in every format, without the metadata of the original. Avatars are cropped to
+    squares around their centre, other images keep their aspect ratio.
+
+    This runs in a worker process and only touches files, so it does not need Django to be set up.
+    Returns the variants as `{'source': name, variant: {format: name, 'width': w, 'height': h}}`.
+    """
+    spec = VARIANT_KINDS[kind]
+    variants = {'source': name}
+    output_dir = variants_dir(name)
+    existing = existing_variants(media_root, output_dir, kind)
+    if existing is not None:
+        # content-addressed files share their variants, which are then only rendered once
+        variants.update(existing)
+        return variants
+    os.makedirs(os.path.join(media_root, output_dir), exist_ok=True)
+    with Image.open(os.path.join(media_root, name)) as original:
+        # apply the camera orientation before the EXIF data is dropped
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'L'):
+            # flatten transparency onto white, since JPEG has no alpha channel
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.convert('RGBA').getchannel('A'))
+            image = background
+        image = image.convert('RGB')
+        for variant, size in sorted(spec['variants'].items(), key=lambda item: -item[1]):
+            if spec['square']:
+                side = min(size, image.width, image.height)
+                resized = ImageOps.fit(image, (side, side), Image.LANCZOS)
+            else:
+                resized = image.copy()
+                resized.thumbnail((size, size), Image.LANCZOS)
+            variants[variant] = {'width': resized.width, 'height': resized.height}
+            for extension, variant_name in variant_files(kind, output_dir, variant).items():
+                image_format, options = IMAGE_FORMATS[extension]
+                # no exif or icc data is passed, so none is written
+                resized.save(os.path.join(media_root, variant_name), image_format, **options)
+                variants[variant][extension] = variant_name
+    return variants
+
+
+def existing_variants(media_root, output_dir, kind='image'):
+    # read the sizes of variants rendered before from their headers, or return None if any is missing
+    variants = {}
+    for variant in VARIANT_KINDS[kind]['variants']:
+        files = variant_files(kind, output_dir, variant)
+        if not all(os.path.exists(os.path.join(media_root, path)) for path in files.values()):
+            return None
+        with Image.open(os.path.join(media_root, files['jpeg'])) as image:
+            variants[variant] = dict(files, width=image.width, height=image.height)
+    return variants
+
+
+def describe_image(media_root, name, variants):
+    """
+    Return the metadata clients need to lay out an image before downloading it: its size once
+    rotated upright, its size in bytes, its dominant color and a tiny blurred placeholder as a
+    data URI. Only the header of the original is read; the colors come from its smallest variant.
+    """
+    path = os.path.join(media_root, name)
+    with Image.open(path) as original:
+        width, height = original.size
+        # orientations 5 to 8 are rotated by a quarter turn
+        if original.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+            width, height = height, width
+    smallest = min(
+        (files for key, files in variants.items() if key != 'source'),
+        key=lambda files: files['width'] * files['height'],
+    )
+    with Image.open(os.path.join(media_root, smallest['jpeg'])) as small:
+        small = small.convert('RGB')
+        # the dominant color is the most used color once the image is reduced to a few colors
+        reduced = small.quantize(colors=8)
+        count, index = max(reduced.getcolors())
+        red, green, blue = reduced.getpalette()[index * 3:index * 3 + 3]
+        placeholder = small.copy()
+        placeholder.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.LANCZOS)
+        data = io.BytesIO()
+        placeholder.save(data, 'WEBP', quality=40)
+    return {
+        'source': name,
+        'width': width,
+        'height': height,
+        'bytes': os.path.getsize(path),
+        'dominant_color': f'#{red:02x}{green:02x}{blue:02x}',
+        'placeholder': 'data:image/webp;base64,' + base64.b64encode(data.getvalue()).decode('ascii'),
+    }
+
+
+def process_file(media_root, name, kind='image'):
+    """
+    Render the variants of an image and describe it; this is the job run by the worker processes.
+    """
+    variants = render_variants(media_root, name, kind)
+    return {'variants': variants, 'meta': describe_image(media_root, name, variants)}
+
+
+def get_executor():
+    """
+    Return the process pool rendering the variants, and the thread storing the results,
+    creating them on first use. Workers are spawned rather than forked so they do not inherit
+    the database connections and threads of the web process.
+    """
+    global _executor, _writer
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=IMAGE_PROCESSING_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+            _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='image-variants')
+        return _executor, _writer
+
+
+def store_result(model, pk, result):
+    """
+    Save the variants and metadata of an image on its object, unless the image was replaced in the meantime.
+    """
+    field, variants_field, meta_field, kind = IMAGE_FIELDS[model.__name__]
+    obj = model.objects.filter(pk=pk).first()
+    if obj is None or getattr(obj, field).name != result['variants']['source']:
+        return
+    setattr(obj, variants_field, result['variants'])
+    setattr(obj, meta_field, result['meta'])
+    obj.save(update_fields=[variants_field, meta_field])
+
+
+def process_image(obj):
+    """
+    Render the variants and compute the metadata of the image of `obj` once the current
+    transaction commits, and store them on it.
+
+    The image is decoded in a worker process, never in the request thread. With the
+    `IMAGE_PROCESSING_EAGER` setting the work is done right away instead, as tests do.
+    """
+    model, pk = type(obj), obj.pk
+    field, variants_field, meta_field, kind = IMAGE_FIELDS[model.__name__]
+    name = getattr(obj, field).name
+    media_root = str(settings.MEDIA_ROOT)
+
+    if getattr(settings, 'IMAGE_PROCESSING_EAGER', False):
+        store_result(model, pk, process_file(media_root, name, kind))
+        return
+
+    def store(future):
+        try:
+            result = future.result()
+        except Exception:
+            logger.exception('Processing the image %s failed', name)
+            return
+        writer.submit(store_in_writer, model, pk, result)
+
+    def submit():
+        executor.submit(process_file, media_root, name, kind).add_done_callback(store)
+
+    executor, writer = get_executor()
+    transaction.on_commit(submit)
+
+
+def store_in_writer(model, pk, result):
+    # the writer thread opens its own database connection, closed after every write
+    try:
+        store_result(model, pk, result)
+    except Exception:
+        logger.exception('Storing the variants of %s failed', result['variants']['source'])
+    finally:
+        connection.close()
+
+
+def image_srcset(obj, request=None, field='image', variants_field='image_variants'):
+    """
+    Map each variant of the image in `field` of `obj` to the URLs of its formats and its size,
+    or return None while the variants are not rendered yet.
+    """
+    from django.core.files.storage import default_storage
+
+    image = getattr(obj, field)
+    variants = getattr(obj, variants_field) or {}
+    if not image or variants.get('source') != image.name:
+        return None
+    srcset = {}
+    for variant, files in variants.items():
+        if variant == 'source':
+            continue
+        srcset[variant] = {}
+        for key, value in files.items():
+            if key in IMAGE_FORMATS:
+                url = default_storage.url(value)
+                value = request.build_absolute_uri(url) if request is not None else url
+            srcset[variant][key] = value
+    return srcset
+
+
+def image_meta(obj, field='image', meta_field='image_meta'):
+    """
+    Return the stored metadata of the image in `field` of `obj`, or None while it is not computed yet.
+    Nothing is read from the image file.
+    """
+    image = getattr(obj, field)
+    meta = getattr(obj, meta_field) or {}
+    if not image or meta.get('source') != image.name:
+        return None
+    return {key: value for key, value in meta.items() if key != 'source'}
@@ -0,0 +1,32 @@
+from django.db import IntegrityError, transaction
+
+from .counters import add_likes
+
+
+def add_like(like_model, parent_field, parent, user):
+    """
+    Record that `user` likes `parent` with a single INSERT into the like table.
+    The unique constraint on the table makes the call idempotent: when the like already
+    exists nothing changes and None is returned, otherwise the new like row is returned.
+    The like counter of the parent is incremented atomically together with the insert,
+    or one of its shards when the parent is hot, and the parent row is never saved.
+    """
+    try:
+        with transaction.atomic():
+            like = like_model.objects.create(**{parent_field: parent, 'user': user})
+            add_likes(parent, 1)
+    except IntegrityError:
+        return None
+    return like
+
+
+def remove_like(like_model, parent_field, parent, user):
+    """
+    Remove the like of `user` on `parent` with a single DELETE and decrement the like counter
+    when a row was actually deleted. Return whether the like existed.
+    """
+    with transaction.atomic():
+        deleted, _ = like_model.objects.filter(**{parent_field: parent, 'user': user}).delete()
+        if deleted:
+            add_likes(parent, -1)
+    return bool(deleted)
@@ -0,0 +1,70 @@
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ...cache import comments_scope, invalidate_on_commit, post_scope, profile_scope
+from ...images import IMAGE_FIELDS, get_executor, process_file
+from ...models import Comment, User
+
+
+class Command(BaseCommand):
+    help = 'Compute the variants and metadata of the existing images that do not have them yet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=100, help='Number of images processed together.')
+
+    def handle(self, *args, **options):
+        executor, writer = get_executor()
+        processed, failed = 0, 0
+        for model_name, (field, variants_field, meta_field, kind) in IMAGE_FIELDS.items():
+            model = apps.get_model('ReachOut2Me', model_name)
+            objects = (
+                model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                .order_by('pk').only('pk', field, variants_field, meta_field)
+            )
+            # the objects are streamed so memory stays flat however many images there are
+            chunk = []
+            for obj in objects.iterator(chunk_size=options['chunk_size']):
+                if getattr(obj, meta_field).get('source') == getattr(obj, field).name:
+                    continue
+                chunk.append(obj)
+                if len(chunk) >= options['chunk_size']:
+                    done, errors = self.process_chunk(executor, model, chunk)
+                    processed, failed, chunk = processed + done, failed + errors, []
+            if chunk:
+                done, errors = self.process_chunk(executor, model, chunk)
+                processed, failed = processed + done, failed + errors
+        self.stdout.write(f'{processed} image(s) processed, {failed} failed')
+
+    def process_chunk(self, executor, model, chunk):
+        field, variants_field, meta_field, kind = IMAGE_FIELDS[model.__name__]
+        media_root = str(settings.MEDIA_ROOT)
+        # the images of a chunk are decoded in parallel by the worker processes
+        futures = [(obj, executor.submit(process_file, media_root, getattr(obj, field).name, kind)) for obj in chunk]
+        updated, failed = [], 0
+        for obj, future in futures:
+            try:
+                result = future.result()
+            except Exception as error:
+                self.stderr.write(f'{model.__name__} {obj.pk}: {error}')
+                failed += 1
+                continue
+            setattr(obj, variants_field, result['variants'])
+            setattr(obj, meta_field, result['meta'])
+            updated.append(obj)
+        model.objects.bulk_update(updated, [variants_field, meta_field])
+        # bulk_update sends no post_save, so the cached payloads showing these images are dropped here
+        invalidate_on_commit(*self.cache_scopes(model.__name__, [obj.pk for obj in updated]))
+        return len(updated), failed
+
+    def cache_scopes(self, model_name, pks):
+        # the cached payloads holding the images of the objects `pks`; messages are not cached
+        if model_name == 'Post':
+            return [post_scope(pk) for pk in pks]
+        if model_name == 'Comment':
+            post_ids = set(Comment.objects.filter(pk__in=pks).values_list('post_id', flat=True))
+            return [comments_scope(post_id) for post_id in post_ids]
+        if model_name == 'UserProfile':
+            usernames = User.objects.filter(userprofile__pk__in=pks).values_list('username', flat=True)
+            return [profile_scope(username) for username in usernames]
+        return []
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from ...models import Post
+from ...tags import index_posts
+
+
+class Command(BaseCommand):
+    help = 'Extract the hashtags and mentions of the existing posts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Number of posts indexed together.')
+        parser.add_argument('--notify', action='store_true',
+                            help='Notify the users mentioned in old posts, which is off by default.')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        posts = Post.objects.order_by('id').only('id', 'content', 'user_id', 'created_at')
+        # the posts are streamed so memory stays flat however many there are
+        chunk, indexed = [], 0
+        for post in posts.iterator(chunk_size=chunk_size):
+            chunk.append(post)
+            if len(chunk) >= chunk_size:
+                index_posts(chunk, notify=options['notify'])
+                indexed += len(chunk)
+                chunk = []
+        if chunk:
+            index_posts(chunk, notify=options['notify'])
+            indexed += len(chunk)
+        self.stdout.write(f'{indexed} post(s) indexed')
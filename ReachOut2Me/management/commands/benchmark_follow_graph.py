@@ -0,0 +1,54 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from ...graph import FollowGraph
+
+
+class Command(BaseCommand):
+    help = ('Measure the build time, memory and query latency of the follow graph snapshot '
+            'on a random graph, 1M users and 50M follows by default. '
+            'Follows are drawn with a skew, so a few users have very many followers as in real graphs.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000000, help='Number of users.')
+        parser.add_argument('--edges', type=int, default=50000000, help='Number of follows drawn, before duplicates are dropped.')
+        parser.add_argument('--queries', type=int, default=10000, help='Number of queries per kind.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        users, edges = options['users'], options['edges']
+        followers = rng.integers(0, users, edges, dtype=np.int32)
+        # the followed users follow a power law, so some rows are very long
+        followed = (np.minimum(rng.pareto(1.2, edges), users - 1) * users / 1000 % users).astype(np.int32)
+        keep = followers != followed
+        keys = np.unique(followers[keep].astype(np.int64) * users + followed[keep])
+        followers, followed = (keys // users).astype(np.int32), (keys % users).astype(np.int32)
+        del keys
+
+        start = time.perf_counter()
+        graph = FollowGraph.from_edges(followers, followed, size=users)
+        built = time.perf_counter() - start
+        arrays = [graph.following_edges.csr, graph.follower_edges.csr]
+        memory = sum(csr.offsets.nbytes + csr.targets.nbytes for csr in arrays)
+        self.stdout.write(f'{users} users, {len(followers)} follows: built in {built:.1f}s, {memory / 2 ** 20:.0f} MiB')
+
+        sample = rng.integers(0, users, (options['queries'], 2))
+        cases = [
+            ('following', lambda a, b: graph.following(a)),
+            ('followers', lambda a, b: graph.followers(a)),
+            ('mutual follows', lambda a, b: graph.mutual_follows(a)),
+            ('common following', lambda a, b: graph.common_following(a, b)),
+            ('2-hop', lambda a, b: graph.k_hop(a, 2)),
+        ]
+        for name, query in cases:
+            sizes = 0
+            start = time.perf_counter()
+            for a, b in sample:
+                sizes += len(query(int(a), int(b)))
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'{name:16} {elapsed / len(sample) * 1e6:10.1f} us/query, {sizes / len(sample):10.1f} users/result'
+            )
@@ -0,0 +1,54 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from ...counters import add_to_shard, increment
+from ...models import Post, LikeCounterShard
+
+
+class Command(BaseCommand):
+    help = ('Measure concurrent like counter writes per second on one hot post, '
+            'with the single like_count row versus K counter shards. '
+            'Run it against the production database engine: SQLite serializes all writes, '
+            'so it cannot show the row lock contention that sharding removes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--likes', type=int, default=2000, help='Number of likes written per run.')
+        parser.add_argument('--threads', type=int, default=8, help='Number of concurrent writers.')
+        parser.add_argument('--shards', type=int, default=8, help='Number of counter shards K.')
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(username=f'benchmark-{uuid.uuid4().hex[:12]}')
+        post = Post.objects.create(user=user, content='like counter benchmark')
+        try:
+            single = self.run(lambda: increment(Post, post.pk, 'like_count'), options['likes'], options['threads'])
+            sharded = self.run(
+                lambda: add_to_shard('post', post.pk, 1, shards=options['shards']),
+                options['likes'], options['threads'],
+            )
+        finally:
+            LikeCounterShard.objects.filter(target_type='post', target_id=post.pk).delete()
+            user.delete()
+
+        self.stdout.write(f"{connection.vendor}, {options['threads']} writers, {options['likes']} likes per run")
+        self.stdout.write(f'1 row:     {single:10.0f} likes/sec')
+        self.stdout.write(f"{options['shards']} shards: {sharded:10.0f} likes/sec ({sharded / single:.2f}x)")
+
+    def run(self, write, likes, threads):
+        def worker(count):
+            try:
+                for _ in range(count):
+                    write()
+            finally:
+                # every thread opens its own connection, which has to be closed by that thread
+                connection.close()
+
+        per_thread = [likes // threads + (1 if i < likes % threads else 0) for i in range(threads)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(worker, per_thread))
+        return likes / (time.perf_counter() - start)
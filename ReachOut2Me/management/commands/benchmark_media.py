@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from django.views import static
+
+from ...endpoints.media import serve_media
+
+
+class Command(BaseCommand):
+    help = ('Measure media requests per second with django.views.static.serve, as media was served before, '
+            'versus serve_media, for full downloads, revalidations and range requests. '
+            'Both run in process, so the sendfile and proxy offloading of serve_media are not part of the numbers.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=1024 * 1024, help='Size of the served file in bytes.')
+        parser.add_argument('--requests', type=int, default=500, help='Number of requests per case.')
+        parser.add_argument('--range-bytes', type=int, default=64 * 1024, help='Size of the requested range.')
+
+    def handle(self, *args, **options):
+        root = tempfile.mkdtemp()
+        path = 'cas/00/00/benchmark.jpg'
+        os.makedirs(os.path.join(root, os.path.dirname(path)))
+        with open(os.path.join(root, path), 'wb') as file:
+            file.write(os.urandom(options['size']))
+        factory = RequestFactory()
+
+        def old(headers):
+            return static.serve(factory.get('/media/' + path, headers=headers), path, document_root=root)
+
+        def new(headers):
+            return serve_media(factory.get('/media/' + path, headers=headers), path)
+
+        try:
+            with override_settings(MEDIA_ROOT=root, MEDIA_SERVE_MODE='django'):
+                etag = new({})['ETag']
+                cases = [
+                    ('full download', {}),
+                    ('revalidation', {'If-None-Match': etag}),
+                    ('range request', {'Range': f"bytes=0-{options['range_bytes'] - 1}"}),
+                ]
+                self.stdout.write(f"{options['size']} byte file, {options['requests']} requests per case")
+                for name, headers in cases:
+                    old_rate, old_bytes = self.run(old, headers, options['requests'])
+                    new_rate, new_bytes = self.run(new, headers, options['requests'])
+                    self.stdout.write(
+                        f'{name:14} static.serve {old_rate:8.0f} req/s {old_bytes:9d} B/req   '
+                        f'serve_media {new_rate:8.0f} req/s {new_bytes:9d} B/req ({new_rate / old_rate:.2f}x)'
+                    )
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+    def run(self, view, headers, requests):
+        sent = 0
+        start = time.perf_counter()
+        for _ in range(requests):
+            response = view(headers)
+            # the body is read the way a WSGI server without sendfile would send it
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+            response.close()
+            sent = len(body)
+        return requests / (time.perf_counter() - start), sent
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ...graph import FollowGraph, prune_follow_events, write_snapshot
+
+
+class Command(BaseCommand):
+    help = ('Build the follow graph snapshot that the workers memory-map, from the Follow table, '
+            'and delete the follow events it makes unnecessary.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=getattr(settings, 'FOLLOW_GRAPH_SNAPSHOT_DIR', None),
+                            help='Directory of the snapshots, FOLLOW_GRAPH_SNAPSHOT_DIR by default.')
+        parser.add_argument('--keep-events-days', type=int, default=7,
+                            help='Days of follow events kept for the workers still replaying an older snapshot.')
+
+    def handle(self, *args, **options):
+        if not options['output']:
+            raise CommandError('Give --output or set FOLLOW_GRAPH_SNAPSHOT_DIR.')
+        graph = FollowGraph.build()
+        graph.refresh()
+        name = write_snapshot(graph, options['output'])
+        # events already in the snapshot are only needed by workers that loaded an older one recently
+        pruned = prune_follow_events(options['keep_events_days'], up_to_id=graph.last_event_id)
+        self.stdout.write(
+            f'{name}: {graph.size} user(s), {len(graph.following_edges.csr.targets)} follow(s), '
+            f'{pruned} old event(s) deleted'
+        )
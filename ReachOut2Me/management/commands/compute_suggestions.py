@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from ... import suggestions
+
+
+class Command(BaseCommand):
+    help = 'Store the top friends-of-friends follow suggestions of every user for the suggestions endpoint.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=suggestions.SUGGESTIONS_TOP_K,
+                            help='Number of suggestions kept per user.')
+        parser.add_argument('--chunk-size', type=int, default=suggestions.SUGGESTIONS_CHUNK_SIZE,
+                            help='Number of users scored per matrix product.')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Number of scoring processes, one per core by default.')
+        parser.add_argument('--half-life-days', type=float, default=suggestions.SUGGESTIONS_HALF_LIFE_DAYS,
+                            help='Age after which a follow counts for half as much towards the recency bonus.')
+        parser.add_argument('--recency-weight', type=float, default=suggestions.SUGGESTIONS_RECENCY_WEIGHT,
+                            help='Bonus of a brand new follow on top of the 1 every follow is worth.')
+
+    def handle(self, *args, **options):
+        users, stored = suggestions.compute_suggestions(
+            top_k=options['top'],
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            half_life_days=options['half_life_days'],
+            recency_weight=options['recency_weight'],
+        )
+        self.stdout.write(f'{stored} suggestion(s) stored for {users} user(s)')
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from ... import trending
+
+
+class Command(BaseCommand):
+    help = 'Rank the posts by time-decayed like, comment and reply activity for the trending endpoint.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=trending.TRENDING_TOP_N,
+                            help='Number of posts kept in the ranking.')
+        parser.add_argument('--window-hours', type=int, default=trending.TRENDING_WINDOW_HOURS,
+                            help='How many hours of activity are scored.')
+        parser.add_argument('--half-life-hours', type=float, default=trending.TRENDING_HALF_LIFE_HOURS,
+                            help='Age after which an interaction counts for half as much.')
+        parser.add_argument('--time-budget', type=float, default=trending.TRENDING_TIME_BUDGET_SECONDS,
+                            help='Seconds the aggregation may take before the oldest hours are skipped.')
+
+    def handle(self, *args, **options):
+        rows, complete = trending.compute_trending(
+            top_n=options['top'],
+            window_hours=options['window_hours'],
+            half_life_hours=options['half_life_hours'],
+            time_budget=options['time_budget'],
+        )
+        self.stdout.write(f'{len(rows)} post(s) ranked')
+        if not complete:
+            self.stdout.write(self.style.WARNING('The time budget ran out before the whole window was scored'))
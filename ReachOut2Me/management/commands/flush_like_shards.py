@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from ...counters import flush_like_shards
+
+
+class Command(BaseCommand):
+    help = ('Fold the likes waiting in the counter shards of hot posts and comments into their like_count. '
+            'Run it every few seconds from a scheduler while sharded counters are in use.')
+
+    def handle(self, *args, **options):
+        flushed = flush_like_shards()
+        self.stdout.write(f'{flushed} object(s) flushed')
@@ -0,0 +1,75 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ...media_gc import QUARANTINE_DIR, orphan_batches, variant_source
+from ...storage import collect_blob, is_content_addressed
+from ...uploads import CHUNKED_UPLOAD_EXPIRY_HOURS, discard_upload, expired_uploads
+
+
+class Command(BaseCommand):
+    help = 'Delete or quarantine the media files no image field refers to any more.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the orphaned files.')
+        parser.add_argument('--quarantine', action='store_true',
+                            help=f'Move the orphaned files under MEDIA_ROOT/{QUARANTINE_DIR}/ instead of deleting them.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of files checked per round of queries.')
+        parser.add_argument('--min-age', type=int, default=3600,
+                            help='Seconds a file must have existed for before it can be collected.')
+        parser.add_argument('--sleep', type=float, default=0,
+                            help='Seconds to pause between batches, to run in the background with little I/O impact.')
+        parser.add_argument('--verbose-files', action='store_true', help='List every orphaned file.')
+        parser.add_argument('--upload-expiry', type=int, default=CHUNKED_UPLOAD_EXPIRY_HOURS,
+                            help='Hours after which a chunked upload that was never attached is deleted.')
+
+    def handle(self, *args, **options):
+        root = str(settings.MEDIA_ROOT)
+        quarantine = os.path.join(root, QUARANTINE_DIR, time.strftime('%Y%m%d-%H%M%S'))
+        files = reclaimed = 0
+
+        target = quarantine if options['quarantine'] else None
+        for batch in orphan_batches(root, batch_size=options['batch_size'], min_age=options['min_age']):
+            for name, size in batch:
+                if not options['dry_run'] and not self.collect_orphan(root, name, size, target):
+                    continue
+                if options['verbose_files']:
+                    self.stdout.write(name)
+                files += 1
+                reclaimed += size
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        action = 'would be reclaimed' if options['dry_run'] else ('quarantined' if options['quarantine'] else 'reclaimed')
+        self.stdout.write(f'{files} orphaned file(s), {reclaimed} byte(s) {action}')
+
+        # abandoned chunked uploads are deleted outright, they were never attached to anything
+        uploads = 0
+        for upload in expired_uploads(options['upload_expiry']).iterator():
+            if not options['dry_run']:
+                discard_upload(upload)
+            uploads += 1
+        self.stdout.write(f'{uploads} expired upload(s) {"would be deleted" if options["dry_run"] else "deleted"}')
+
+    def collect_orphan(self, root, name, size, quarantine):
+        # a content-addressed file is only removed with its blob, under the blob's row lock, so an upload
+        # reusing the content since the scan keeps the file; return whether the file was collected
+        if is_content_addressed(name) and variant_source(name) is None:
+            return collect_blob(name, lambda: self.collect(root, name, quarantine), size=size)
+        self.collect(root, name, quarantine)
+        return True
+
+    def collect(self, root, name, quarantine):
+        path = os.path.join(root, name)
+        try:
+            if quarantine is None:
+                os.remove(path)
+            else:
+                target = os.path.join(quarantine, name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(path, target)
+        except FileNotFoundError:
+            # removed by someone else since the scan
+            pass
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from ...graph import prune_follow_events
+
+
+class Command(BaseCommand):
+    help = ('Delete the follow events older than a few days. Run it daily from a scheduler when the '
+            'follow graph is built in each worker rather than from a snapshot.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-days', type=int, default=7,
+                            help='Days of follow events kept for the workers replaying them.')
+
+    def handle(self, *args, **options):
+        pruned = prune_follow_events(options['keep_days'])
+        self.stdout.write(f'{pruned} old event(s) deleted')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from ...counters import COUNTERS, flush_like_shards, reconcile
+
+
+class Command(BaseCommand):
+    help = 'Recount the denormalized like, comment, reply and follow counters and repair any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of rows recounted per query.')
+
+    def handle(self, *args, **options):
+        # the likes waiting in counter shards are folded in first so they are not counted twice
+        flush_like_shards()
+        for model, field, relation in COUNTERS:
+            repaired = reconcile(model, field, relation, batch_size=options['batch_size'])
+            self.stdout.write(f'{model.__name__}.{field}: {repaired} row(s) repaired')
@@ -0,0 +1,104 @@
+import os
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db import models
+
+# the directory of the media root orphans are moved to with --quarantine
+QUARANTINE_DIR = '.quarantine'
+# the directory of the media root chunked uploads are assembled in, which expire on their own
+UPLOADS_DIR = '.uploads'
+
+
+def media_files(root, skip=(QUARANTINE_DIR, UPLOADS_DIR)):
+    """
+    Yield `(name, size, mtime)` for every file under `root`, with names relative to it.
+    Directories are walked with os.scandir one at a time, so memory follows the depth of
+    the tree rather than the number of files.
+    """
+    stack = ['']
+    while stack:
+        relative = stack.pop()
+        try:
+            entries = os.scandir(os.path.join(root, relative))
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                name = f'{relative}/{entry.name}' if relative else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if name not in skip:
+                        stack.append(name)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    yield name, stat.st_size, stat.st_mtime
+
+
+def file_fields():
+    # every file and image field of every installed model, found once
+    return [
+        (model, field.name)
+        for model in apps.get_models()
+        for field in model._meta.get_fields()
+        if isinstance(field, models.FileField)
+    ]
+
+
+def variant_source(name):
+    # post_images/variants/photo.jpg/thumb.webp -> post_images/photo.jpg
+    parts = name.split('/')
+    if len(parts) >= 3 and parts[-3] == 'variants':
+        return '/'.join(parts[:-3] + [parts[-2]])
+    return None
+
+
+def referenced_names(names, fields):
+    """
+    Return the subset of `names` stored in any file field, with one query per field.
+    Content-addressed files still counted by their blob are kept as well, since an upload
+    reusing them may not be committed yet.
+    """
+    from .models import MediaBlob
+
+    names = list(names)
+    referenced = set()
+    if not names:
+        return referenced
+    referenced.update(MediaBlob.objects.filter(name__in=names, ref_count__gt=0).values_list('name', flat=True))
+    for model, field in fields:
+        referenced.update(
+            model._default_manager.filter(**{f'{field}__in': names}).values_list(field, flat=True).order_by()
+        )
+    return referenced
+
+
+def orphan_batches(root=None, batch_size=1000, min_age=3600, fields=None):
+    """
+    Yield the unreferenced media files in batches of up to `batch_size` `(name, size)` pairs.
+
+    The files are streamed from disk and each batch is diffed against the references in the
+    database with set operations, so only one batch is held in memory. Image variants are
+    kept as long as their source image is referenced. Files younger than `min_age` seconds
+    are skipped, since their upload may not be committed yet.
+    """
+    root = str(root or settings.MEDIA_ROOT)
+    fields = fields or file_fields()
+    newest = time.time() - min_age
+    batch = []
+
+    def orphans(batch):
+        # a variant is looked up through its source image, every other file through its own name
+        lookups = {name: variant_source(name) or name for name, size in batch}
+        referenced = referenced_names(set(lookups.values()), fields)
+        return [(name, size) for name, size in batch if lookups[name] not in referenced]
+
+    for name, size, mtime in media_files(root):
+        if mtime > newest:
+            continue
+        batch.append((name, size))
+        if len(batch) >= batch_size:
+            yield orphans(batch)
+            batch = []
+    if batch:
+        yield orphans(batch)
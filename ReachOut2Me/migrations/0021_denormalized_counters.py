@@ -0,0 +1,63 @@
+# Generated by Django 4.2.1 on 2026-10-18 15:51
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(model, field):
+    # correlated subquery counting the rows of `model` pointing at the outer row through `field`
+    rows = model.objects.filter(**{field: OuterRef('pk')}).order_by().values(field)
+    return Coalesce(Subquery(rows.annotate(total=Count('*')).values('total'), output_field=IntegerField()), 0)
+
+
+def backfill_counters(apps, schema_editor):
+    Post = apps.get_model('ReachOut2Me', 'Post')
+    Comment = apps.get_model('ReachOut2Me', 'Comment')
+    CommentReply = apps.get_model('ReachOut2Me', 'CommentReply')
+    CommentReplyLike = apps.get_model('ReachOut2Me', 'CommentReplyLike')
+    Post.objects.update(
+        like_count=count_of(Post.likes.through, 'post'),
+        comment_count=count_of(Comment, 'post'),
+    )
+    Comment.objects.update(
+        like_count=count_of(Comment.likes.through, 'comment'),
+        reply_count=count_of(CommentReply, 'comment'),
+    )
+    CommentReply.objects.update(like_count=count_of(CommentReplyLike, 'comment_reply'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ReachOut2Me', '0020_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='commentreply',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.1 on 2026-10-18 16:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ReachOut2Me', '0023_likecountershard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingPost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveIntegerField(unique=True)),
+                ('score', models.FloatField()),
+                ('computed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['created_at', 'post'], name='comment_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commentreply',
+            index=models.Index(fields=['created_at', 'comment'], name='reply_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postlike',
+            index=models.Index(fields=['created_at', 'post'], name='postlike_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='trendingpost',
+            name='post',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='trending', to='ReachOut2Me.post'),
+        ),
+    ]
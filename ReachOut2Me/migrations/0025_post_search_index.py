@@ -0,0 +1,23 @@
+from django.db import migrations
+
+from ReachOut2Me.search import install_search_index, drop_search_index
+
+
+def create_index(apps, schema_editor):
+    # an FTS5 table kept in sync by triggers on SQLite, a GIN index on PostgreSQL, nothing elsewhere
+    install_search_index(schema_editor.connection.alias, rebuild=True)
+
+
+def drop_index(apps, schema_editor):
+    drop_search_index(schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ReachOut2Me', '0024_trendingpost'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
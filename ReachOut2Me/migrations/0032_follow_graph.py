@@ -0,0 +1,95 @@
+# Generated by Django 4.2.1 on 2026-10-18 16:41
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+# the number of edges or profiles read and written per query
+BATCH_SIZE = 1000
+
+
+def copy_edges(Follow, edges):
+    # the edges are streamed and inserted in batches; those already in the Follow table are skipped
+    batch = []
+    for follower_id, following_id in edges.iterator(chunk_size=BATCH_SIZE):
+        if follower_id != following_id:
+            batch.append(Follow(follower_id=follower_id, following_id=following_id))
+        if len(batch) >= BATCH_SIZE:
+            Follow.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        Follow.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def merge_follow_stores(apps, schema_editor):
+    Follow = apps.get_model('ReachOut2Me', 'Follow')
+    UserProfile = apps.get_model('ReachOut2Me', 'UserProfile')
+    # `profile.following` holds the users the profile's user follows
+    copy_edges(Follow, UserProfile.following.through.objects.order_by('pk').values_list('userprofile__user_id', 'user_id'))
+    # `profile.followers` holds the users following the profile's user
+    copy_edges(Follow, UserProfile.followers.through.objects.order_by('pk').values_list('user_id', 'userprofile__user_id'))
+
+    # the counts are then computed from the merged edges, one range of profiles at a time
+    def count(field, other):
+        edges = Follow.objects.filter(**{field: OuterRef('user_id')}).order_by().values(field)
+        return Coalesce(Subquery(edges.annotate(count=Count(other)).values('count')), Value(0))
+
+    last_pk = 0
+    while True:
+        pks = list(UserProfile.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:BATCH_SIZE])
+        if not pks:
+            break
+        UserProfile.objects.filter(pk__gt=last_pk, pk__lte=pks[-1]).update(
+            follower_count=count('following_id', 'follower_id'),
+            following_count=count('follower_id', 'following_id'),
+        )
+        last_pk = pks[-1]
+
+
+def restore_following(apps, schema_editor):
+    Follow = apps.get_model('ReachOut2Me', 'Follow')
+    UserProfile = apps.get_model('ReachOut2Me', 'UserProfile')
+    Through = UserProfile.following.through
+    profile_ids = dict(UserProfile.objects.values_list('user_id', 'pk'))
+    batch = []
+    for follower_id, following_id in Follow.objects.order_by('pk').values_list('follower_id', 'following_id').iterator(chunk_size=BATCH_SIZE):
+        if follower_id in profile_ids:
+            batch.append(Through(userprofile_id=profile_ids[follower_id], user_id=following_id))
+        if len(batch) >= BATCH_SIZE:
+            Through.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        Through.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ReachOut2Me', '0031_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['following', 'follower'], name='follow_following_follower_idx'),
+        ),
+        migrations.RunPython(merge_follow_stores, restore_following),
+        migrations.RemoveField(
+            model_name='userprofile',
+            name='followers',
+        ),
+        migrations.RemoveField(
+            model_name='userprofile',
+            name='following',
+        ),
+    ]
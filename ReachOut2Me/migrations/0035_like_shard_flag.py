@@ -0,0 +1,32 @@
+# Generated by Django 4.2.1 on 2026-10-18 17:25
+
+from django.db import migrations, models
+
+
+def flag_sharded_objects(apps, schema_editor):
+    # the objects with likes waiting in shards were only known to the cache until now
+    LikeCounterShard = apps.get_model('ReachOut2Me', 'LikeCounterShard')
+    for model_name, target_type in (('Post', 'post'), ('Comment', 'comment')):
+        target_ids = LikeCounterShard.objects.filter(target_type=target_type).values('target_id')
+        apps.get_model('ReachOut2Me', model_name).objects.filter(pk__in=target_ids).update(likes_sharded=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ReachOut2Me', '0034_followsuggestion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='likes_sharded',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='likes_sharded',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(flag_sharded_objects, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.1 on 2026-10-18 17:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ReachOut2Me', '0035_like_shard_flag'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commentreplylike',
+            index=models.Index(fields=['comment_reply', '-created_at', '-id'], name='replylike_reply_created_idx'),
+        ),
+    ]
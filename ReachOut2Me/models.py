@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
@@ -13,6 +15,10 @@ class Post(models.Model):
     content = models.CharField(max_length=280)
     # the image of the post
     image = models.ImageField(upload_to='post_images/', null=True, blank=True)
+    # the resized copies of the image made by the image workers, by variant and format
+    image_variants = models.JSONField(default=dict, blank=True)
+    # the size, byte size, dominant color and placeholder of the image, computed by the image workers
+    image_meta = models.JSONField(default=dict, blank=True)
     # the user who wrote the post
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     # the time the post was created
@@ -20,10 +26,18 @@ class Post(models.Model):
     # the time the post was last updated
     updated_at = models.DateTimeField(auto_now=True)
     # the users who liked the post
-    likes = models.ManyToManyField(User, related_name='post_likes', blank=True)
+    likes = models.ManyToManyField(User, through='PostLike', related_name='post_likes', blank=True)
+    # the number of likes and comments, kept current with atomic increments
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    # set while likes of the post wait in LikeCounterShard rows to be folded into like_count
+    likes_sharded = models.BooleanField(default=False)
 
     class Meta:
         app_label = 'ReachOut2Me'
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='post_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username}'s post: {self.content}"
@@ -33,33 +47,122 @@ class Comment(models.Model):
     # the comment itself
     content = models.TextField()
     image = models.ImageField(upload_to='comment_images/', null=True, blank=True)
+    # the resized copies of the image made by the image workers, by variant and format
+    image_variants = models.JSONField(default=dict, blank=True)
+    # the size, byte size, dominant color and placeholder of the image, computed by the image workers
+    image_meta = models.JSONField(default=dict, blank=True)
     # the user who wrote the comment
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     # the post that the comment is on
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
     # Allow users to like a comment
-    likes = models.ManyToManyField(User, related_name='comment_likes', blank=True)
+    likes = models.ManyToManyField(User, through='CommentLike', related_name='comment_likes', blank=True)
     # the time the comment was created
     created_at = models.DateTimeField(auto_now_add=True)
     # the time the comment was last updated
     updated_at = models.DateTimeField(auto_now=True)
+    # the number of likes and replies, kept current with atomic increments
+    like_count = models.PositiveIntegerField(default=0)
+    reply_count = models.PositiveIntegerField(default=0)
+    # set while likes of the comment wait in LikeCounterShard rows to be folded into like_count
+    likes_sharded = models.BooleanField(default=False)
 
     class Meta:
         app_label = 'ReachOut2Me'
+        indexes = [
+            models.Index(fields=['post', '-created_at', '-id'], name='comment_post_created_idx'),
+            # the recent comments of every post, read by the trending job
+            models.Index(fields=['created_at', 'post'], name='comment_created_idx'),
+        ]
 
     def __str__(self):
         return self.content
     
 
+class PostLike(models.Model):
+    # the post that was liked
+    post = models.ForeignKey(Post, on_delete=models.CASCADE)
+    # the user who liked the post
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # the time the like was created
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        app_label = 'ReachOut2Me'
+        # the table was created for the former implicit many-to-many relation
+        db_table = 'ReachOut2Me_post_likes'
+        # A user can only like a post once
+        unique_together = ('post', 'user')
+        indexes = [
+            models.Index(fields=['post', '-created_at', '-id'], name='postlike_post_created_idx'),
+            # the recent likes of every post, read by the trending job
+            models.Index(fields=['created_at', 'post'], name='postlike_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} liked {self.post}"
+
+
+class CommentLike(models.Model):
+    # the comment that was liked
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE)
+    # the user who liked the comment
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # the time the like was created
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        app_label = 'ReachOut2Me'
+        # the table was created for the former implicit many-to-many relation
+        db_table = 'ReachOut2Me_comment_likes'
+        # A user can only like a comment once
+        unique_together = ('comment', 'user')
+        indexes = [
+            models.Index(fields=['comment', '-created_at', '-id'], name='commentlike_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} liked {self.comment}"
+
+
+class LikeCounterShard(models.Model):
+    TARGET_TYPES = (
+        ("post", "Post"),
+        ("comment", "Comment"),
+    )
+
+    # the kind and id of the object whose likes are counted
+    target_type = models.CharField(max_length=10, choices=TARGET_TYPES)
+    target_id = models.PositiveBigIntegerField()
+    # the number of the shard, spreading concurrent likes of one object over several rows
+    shard = models.PositiveSmallIntegerField()
+    # the likes counted by this shard and not yet folded into the object's like_count
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        app_label = 'ReachOut2Me'
+        unique_together = ('target_type', 'target_id', 'shard')
+
+    def __str__(self):
+        return f"{self.target_type} {self.target_id} shard {self.shard}: {self.count}"
+
+
 class CommentReply(models.Model):
     comment = models.ForeignKey(Comment, on_delete=models.CASCADE, related_name='commentreplies')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     reply = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    # the number of likes, kept current with atomic increments
+    like_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         app_label = 'ReachOut2Me'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['comment', '-created_at', '-id'], name='reply_comment_created_idx'),
+            # the recent replies of every comment, read by the trending job
+            models.Index(fields=['created_at', 'comment'], name='reply_created_idx'),
+        ]
 
     def __str__(self):
         return f'Reply by {self.user.username} to {self.comment}'
@@ -72,6 +175,9 @@ class CommentReplyLike(models.Model):
     class Meta:
         app_label = 'ReachOut2Me'
         unique_together = ('user', 'comment_reply')  # A user can only like a comment reply once
+        indexes = [
+            models.Index(fields=['comment_reply', '-created_at', '-id'], name='replylike_reply_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} liked {self.comment_reply}"  # String representation of the object```
@@ -87,11 +193,19 @@ class Message(models.Model):
     # the content of the message
     content = models.TextField()
     image = models.ImageField(upload_to='message_images/', null=True, blank=True)
+    # the resized copies of the image made by the image workers, by variant and format
+    image_variants = models.JSONField(default=dict, blank=True)
+    # the size, byte size, dominant color and placeholder of the image, computed by the image workers
+    image_meta = models.JSONField(default=dict, blank=True)
     # the time the message was sent
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         app_label = 'ReachOut2Me'
+        indexes = [
+            models.Index(fields=['sender', '-created_at', '-id'], name='message_sender_created_idx'),
+            models.Index(fields=['recipient', '-created_at', '-id'], name='message_recipient_created_idx'),
+        ]
 
     def __str__(self):
         return self.content
@@ -99,15 +213,21 @@ class Message(models.Model):
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
-    following = models.ManyToManyField(User, related_name='followers_profile', blank=True)
     bio = models.TextField(null=True)
     avatar = models.ImageField(upload_to='avatars/', null=True)
+    # the square copies of the avatar made by the image workers, by size and format
+    avatar_variants = models.JSONField(default=dict, blank=True)
+    # the size, byte size, dominant color and placeholder of the avatar, computed by the image workers
+    avatar_meta = models.JSONField(default=dict, blank=True)
     gender = models.CharField(max_length=10, null=True)
     date_of_birth = models.DateField(null=True)
     country = models.CharField(max_length=100, null=True)
     state_or_city = models.CharField(max_length=100, null=True)
     telephone_number = models.CharField(max_length=20, null=True)
-    followers = models.ManyToManyField(User, related_name='following_profiles', blank=True)
+    # the number of users following this user, kept in step with the Follow table
+    follower_count = models.PositiveIntegerField(default=0)
+    # the number of users this user follows, kept in step with the Follow table
+    following_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         app_label = 'ReachOut2Me'
@@ -117,18 +237,193 @@ class UserProfile(models.Model):
 
 
 class Follow(models.Model):
+    # the single store of the follow graph: one row per edge from the follower to the followed user
     follower = models.ForeignKey(User, on_delete=models.CASCADE, related_name='following_relationships')
     following = models.ForeignKey(User, on_delete=models.CASCADE, related_name='follower_relationships')
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         app_label = 'ReachOut2Me'
+        # the unique constraint indexes the edges by (follower, following)
         unique_together = ('follower', 'following')
+        indexes = [
+            models.Index(fields=['following', 'follower'], name='follow_following_follower_idx'),
+            models.Index(fields=['following', '-created_at', '-id'], name='follow_following_created_idx'),
+            models.Index(fields=['follower', '-created_at', '-id'], name='follow_follower_created_idx'),
+        ]
 
     def __str__(self):
         return f'{self.follower.username} follows {self.following.username}'
 
 
+class FollowEvent(models.Model):
+    # every follow and unfollow in the order they happened, replayed by the follow graph snapshots;
+    # the users are plain ids so the events of deleted users are kept
+    id = models.BigAutoField(primary_key=True)
+    follower_id = models.IntegerField()
+    following_id = models.IntegerField()
+    # True for a follow, False for an unfollow
+    followed = models.BooleanField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        app_label = 'ReachOut2Me'
+
+    def __str__(self):
+        return f"{self.follower_id} {'followed' if self.followed else 'unfollowed'} {self.following_id}"
+
+
+class FollowSuggestion(models.Model):
+    # the user the suggestion is shown to
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='follow_suggestions')
+    # the user suggested to follow
+    suggested = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    # the position of the suggestion for the user, 1 being the best
+    rank = models.PositiveIntegerField()
+    # the overlap and recency score the suggestion was ranked by
+    score = models.FloatField()
+    # the time the suggestions were computed
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        app_label = 'ReachOut2Me'
+        # the suggestions of a user are read in rank order from this index
+        unique_together = ('user', 'rank')
+
+    def __str__(self):
+        return f"#{self.rank} {self.suggested} for {self.user}"
+
+
+class FeedItem(models.Model):
+    # the user whose home timeline this entry belongs to
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='feed_items')
+    # the post pushed into the timeline
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='feed_items')
+    # the author of the post, copied here so unfollowing can prune the feed without a join
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    # the time the post was created, copied here so the timeline is ordered by this table alone
+    created_at = models.DateTimeField()
+
+    class Meta:
+        app_label = 'ReachOut2Me'
+        unique_together = ('owner', 'post')
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-id'], name='feeditem_owner_timeline_idx'),
+            models.Index(fields=['owner', 'author'], name='feeditem_owner_author_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.post} in {self.owner.username}'s feed"
+
+
+class Hashtag(models.Model):
+    # the tag without its `#`, case folded so #Django and #django are the same tag
+    name = models.CharField(max_length=100, unique=True)
+
+    class Meta:
+        app_label = 'ReachOut2Me'
+
+    def __str__(self):
+        return f"#{self.name}"
+
+
+class PostHashtag(models.Model):
+    # the tagged post
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='post_hashtags')
+    # the tag used in the post
+    hashtag = models.ForeignKey(Hashtag, on_delete=models.CASCADE, related_name='post_hashtags')
+    # the time the post was created, copied here so the posts of a tag are ordered by this table alone
+    created_at = models.DateTimeField()
+
+    class Meta:
+        app_label = 'ReachOut2Me'
+        unique_together = ('hashtag', 'post')
+        indexes = [
+            models.Index(fields=['hashtag', '-created_at', '-id'], name='posthashtag_tag_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.hashtag} in {self.post}"
+
+
+class PostMention(models.Model):
+    # the post mentioning the user
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='mentions')
+    # the mentioned user
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='post_mentions')
+    # the time the post was created
+    created_at = models.DateTimeField()
+
+    class Meta:
+        app_label = 'ReachOut2Me'
+        unique_together = ('post', 'user')
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='postmention_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} mentioned in {self.post}"
+
+
+class MediaBlob(models.Model):
+    # the sha256 of the file content, which the file is named after
+    sha256 = models.CharField(max_length=64, unique=True)
+    # the name of the file in the media storage
+    name = models.CharField(max_length=255, unique=True)
+    # the size of the file in bytes
+    size = models.PositiveBigIntegerField()
+    # the number of image and avatar fields pointing at the file; the file is deleted at zero
+    ref_count = models.PositiveIntegerField(default=0)
+    # the time the content was first uploaded
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        app_label = 'ReachOut2Me'
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} reference(s))"
+
+
+class ChunkedUpload(models.Model):
+    # the id the upload is resumed and attached by
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # the user uploading the file, the only one who can write or attach it
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chunked_uploads')
+    # the name of the file on the client, used as the upload name once attached
+    filename = models.CharField(max_length=255)
+    # the total size of the file in bytes, announced when the upload starts
+    size = models.PositiveBigIntegerField()
+    # the number of bytes received so far, where the next chunk starts
+    offset = models.PositiveBigIntegerField(default=0)
+    # the time the upload was started
+    created_at = models.DateTimeField(auto_now_add=True)
+    # the time every byte was received and the file checked to be an image
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        app_label = 'ReachOut2Me'
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size} bytes)"
+
+
+class TrendingPost(models.Model):
+    # the post ranked by the trending job
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, related_name='trending')
+    # the position of the post in the ranking, 1 being the most trending
+    rank = models.PositiveIntegerField(unique=True)
+    # the time-decayed activity score the post was ranked by
+    score = models.FloatField()
+    # the time the ranking was computed
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        app_label = 'ReachOut2Me'
+
+    def __str__(self):
+        return f"#{self.rank} {self.post}"
+
+
 class Notification(models.Model):
     NOTIFICATION_TYPES = (
         ("follow", "Follow"),
@@ -138,6 +433,7 @@ class Notification(models.Model):
         ("comment_like", "Comment Like"),
         ("reply", "Reply"),
         ("reply_like", "Reply"),
+        ("mention", "Mention"),
     )
 
     recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -148,6 +444,11 @@ class Notification(models.Model):
     read = models.BooleanField(default=False)
     timestamp = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['recipient', '-timestamp', '-id'], name='notification_recipient_idx'),
+        ]
+
     def __str__(self):
         return f"{self.recipient.username} {self.verb}"
 
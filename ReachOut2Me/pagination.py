@@ -0,0 +1,135 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a unique ordering such as `(created_at, id)`.
+
+    The cursor is an opaque token holding the ordering values of the last row of the page,
+    and the next page is fetched with a `WHERE (created_at, id) < (...)` style filter,
+    so with a matching index page N costs the same as page 1 and no OFFSET is ever used.
+    """
+    # the ordering used when neither the view nor the caller gives one; the last field must be unique
+    ordering = ('-created_at', '-id')
+    # the query parameter holding the cursor of the requested page
+    cursor_query_param = 'cursor'
+    # the query parameter clients can use to choose the page size
+    page_size_query_param = 'page_size'
+    # the default page size and the hard maximum a client can ask for
+    page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE') or 20
+    max_page_size = getattr(settings, 'PAGINATION_MAX_PAGE_SIZE', 100)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        if view is not None and getattr(view, 'ordering', None):
+            self.ordering = tuple(view.ordering)
+        page_size = self.get_page_size(request)
+        fields = [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset.model, fields)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(fields, position))
+
+        # fetch one extra row to find out whether there is a next page
+        results = list(queryset[:page_size + 1])
+        page = results[:page_size]
+        self.next_position = None
+        if len(results) > page_size:
+            self.next_position = [self.get_value(page[-1], name) for name, descending in fields]
+        return page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_position_filter(self, fields, position):
+        # lexicographic comparison: (a, b) < (x, y)  <=>  a < x OR (a = x AND b < y)
+        condition = Q()
+        for index, (name, descending) in enumerate(fields):
+            lookup = Q(**{'%s__%s' % (name, 'lt' if descending else 'gt'): position[index]})
+            for previous_index, (previous_name, _) in enumerate(fields[:index]):
+                lookup &= Q(**{previous_name: position[previous_index]})
+            condition |= lookup
+        return condition
+
+    def get_value(self, instance, name):
+        value = getattr(instance, instance._meta.get_field(name).attname)
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        return value
+
+    def encode_cursor(self, position):
+        data = json.dumps(position, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(data).decode('ascii')
+
+    def decode_position(self, request, length):
+        """
+        Return the raw values held by the cursor of the request, or None on the first page.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != length:
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def decode_cursor(self, request, model, fields):
+        position = self.decode_position(request, len(fields))
+        if position is None:
+            return None
+        try:
+            return [
+                model._meta.get_field(name).to_python(value)
+                for (name, descending), value in zip(fields, position)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                },
+                'results': schema,
+            },
+        }
@@ -0,0 +1,124 @@
+import re
+
+from django.db import connections
+
+from .models import Post
+
+# the external-content FTS5 table indexing the content of the posts on SQLite
+SQLITE_FTS_TABLE = 'ReachOut2Me_post_fts'
+# the GIN index over the content of the posts on PostgreSQL
+POSTGRES_INDEX = 'post_content_search_idx'
+# the text search configuration of the PostgreSQL index and queries
+POSTGRES_CONFIG = 'simple'
+
+SQLITE_SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS "{SQLITE_FTS_TABLE}" USING fts5(
+        content, content='ReachOut2Me_post', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    # the triggers keep the index in step with every insert, content change and delete of a post
+    f"""CREATE TRIGGER IF NOT EXISTS "{SQLITE_FTS_TABLE}_ai" AFTER INSERT ON "ReachOut2Me_post" BEGIN
+        INSERT INTO "{SQLITE_FTS_TABLE}"(rowid, content) VALUES (new.id, new.content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS "{SQLITE_FTS_TABLE}_ad" AFTER DELETE ON "ReachOut2Me_post" BEGIN
+        INSERT INTO "{SQLITE_FTS_TABLE}"("{SQLITE_FTS_TABLE}", rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS "{SQLITE_FTS_TABLE}_au" AFTER UPDATE OF content ON "ReachOut2Me_post"
+    WHEN old.content IS NOT new.content BEGIN
+        INSERT INTO "{SQLITE_FTS_TABLE}"("{SQLITE_FTS_TABLE}", rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO "{SQLITE_FTS_TABLE}"(rowid, content) VALUES (new.id, new.content);
+    END""",
+]
+
+POSTGRES_SCHEMA = [
+    f"""CREATE INDEX IF NOT EXISTS "{POSTGRES_INDEX}" ON "ReachOut2Me_post"
+        USING GIN (to_tsvector('{POSTGRES_CONFIG}', content))""",
+]
+
+# one page of matches ranked best first, resuming after the (score, id) position of the previous page
+SQLITE_SEARCH = f"""
+    SELECT id, score FROM (
+        SELECT rowid AS id, -bm25("{SQLITE_FTS_TABLE}") AS score
+        FROM "{SQLITE_FTS_TABLE}" WHERE "{SQLITE_FTS_TABLE}" MATCH %s
+    ) WHERE %s OR score < %s OR (score = %s AND id < %s)
+    ORDER BY score DESC, id DESC LIMIT %s
+"""
+
+# ts_rank is a real, so it is widened to the double precision of the cursor score: compared as a real,
+# the score of the last match would not equal itself once read back as a Python float
+POSTGRES_SEARCH = f"""
+    SELECT id, score FROM (
+        SELECT id, ts_rank(to_tsvector('{POSTGRES_CONFIG}', content), query)::float8 AS score
+        FROM "ReachOut2Me_post", plainto_tsquery('{POSTGRES_CONFIG}', %s) AS query
+        WHERE to_tsvector('{POSTGRES_CONFIG}', content) @@ query
+    ) AS matches WHERE %s OR score < %s OR (score = %s AND id < %s)
+    ORDER BY score DESC, id DESC LIMIT %s
+"""
+
+
+def search_supported(using='default'):
+    return connections[using].vendor in ('sqlite', 'postgresql')
+
+
+def install_search_index(using='default', rebuild=False):
+    """
+    Create the search index of the posts if it is missing.
+    SQLite drops the triggers of a table when a migration rebuilds it, so this is safe to run
+    again after every migration; `rebuild` re-reads every post into the FTS5 table.
+    """
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+                           [f'{SQLITE_FTS_TABLE}_a%'])
+            complete = cursor.fetchone()[0] == 3
+            for statement in SQLITE_SCHEMA:
+                cursor.execute(statement)
+            if rebuild or not complete:
+                cursor.execute(f'INSERT INTO "{SQLITE_FTS_TABLE}"("{SQLITE_FTS_TABLE}") VALUES (\'rebuild\')')
+    elif connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            for statement in POSTGRES_SCHEMA:
+                cursor.execute(statement)
+
+
+def drop_search_index(using='default'):
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS "{SQLITE_FTS_TABLE}_{suffix}"')
+            cursor.execute(f'DROP TABLE IF EXISTS "{SQLITE_FTS_TABLE}"')
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f'DROP INDEX IF EXISTS "{POSTGRES_INDEX}"')
+
+
+def sqlite_match(query):
+    # every word is quoted so the search text cannot use the FTS5 query syntax, and all must match
+    words = re.findall(r'\w+', query)
+    return ' '.join('"%s"' % word for word in words)
+
+
+def search_posts(query, position=None, limit=20, using='default'):
+    """
+    Return up to `limit` `(post id, score)` pairs of the posts matching every word of `query`,
+    best match first, starting after the `(score, id)` position of the previous page.
+    The matches are looked up in the inverted index, so the cost follows the number of
+    matching posts rather than the size of the post table.
+    """
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        sql, text = SQLITE_SEARCH, sqlite_match(query)
+    else:
+        sql, text = POSTGRES_SEARCH, query
+    if not text.strip():
+        return []
+    score, post_id = position or (0.0, 0)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [text, position is None, score, score, post_id, limit])
+        return [(row[0], row[1]) for row in cursor.fetchall()]
+
+
+def matching_posts(rows):
+    # load the posts of a page of matches, keeping the order of the matches
+    posts = Post.objects.select_related('user').in_bulk([post_id for post_id, score in rows])
+    return [posts[post_id] for post_id, score in rows if post_id in posts]
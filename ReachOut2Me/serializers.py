@@ -1,38 +1,198 @@
 from rest_framework import serializers, viewsets
-from .models import Post, Comment, Message, UserProfile, User, CommentReply, Notification, CommentReplyLike, Follow
+from .models import Post, Comment, Message, UserProfile, User, CommentReply, Notification, CommentReplyLike, Follow, ChunkedUpload, FollowSuggestion
 from dj_rest_auth.registration.serializers import RegisterSerializer
 from django.dispatch import receiver
 from django.db.models.signals import post_save
 from django.conf import settings
 from drf_spectacular.utils import extend_schema_field
+from .counters import like_total
+from .images import image_meta, image_srcset
+from .uploads import discard_upload, upload_path
+from .follows import BULK_FOLLOW_MAX, follow
+from django.core.files import File
+
+
+@extend_schema_field({'type': 'object', 'nullable': True, 'additionalProperties': {'type': 'object'}})
+class ImageSrcsetField(serializers.Field):
+    """
+    The URLs of the resized variants of the object's image, e.g. `{'thumb': {'webp': ..., 'jpeg': ...,
+    'width': 150, 'height': 100}, ...}`, or null until the image workers have rendered them.
+    """
+    def __init__(self, field='image', variants_field='image_variants', **kwargs):
+        self.image_field = field
+        self.variants_field = variants_field
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        return image_srcset(instance, self.context.get('request'), self.image_field, self.variants_field)
+
+
+@extend_schema_field({
+    'type': 'object',
+    'nullable': True,
+    'properties': {
+        'width': {'type': 'integer'},
+        'height': {'type': 'integer'},
+        'bytes': {'type': 'integer'},
+        'dominant_color': {'type': 'string'},
+        'placeholder': {'type': 'string'},
+    },
+})
+class ImageMetaField(serializers.Field):
+    """
+    The size, byte size, dominant color and blurred placeholder data URI of the object's image,
+    stored when it was uploaded, or null until the image workers have computed them.
+    """
+    def __init__(self, field='image', meta_field='image_meta', **kwargs):
+        self.image_field = field
+        self.meta_field = meta_field
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        return image_meta(instance, self.image_field, self.meta_field)
+
+
+class ChunkedUploadField(serializers.UUIDField):
+    """
+    The id of a finished chunked upload of the requesting user, given instead of a multipart file.
+    It is validated into the upload, whose file `ChunkedUploadMixin.save` writes to the image
+    field named by `source`; the file is only opened then, so a request failing validation leaves
+    nothing open.
+    """
+    default_error_messages = {
+        'not_found': 'No finished upload with this id.',
+    }
+
+    def __init__(self, **kwargs):
+        kwargs['write_only'] = True
+        kwargs['required'] = False
+        super().__init__(**kwargs)
+        self.upload = None
+
+    def to_internal_value(self, data):
+        upload_id = super().to_internal_value(data)
+        upload = ChunkedUpload.objects.filter(
+            pk=upload_id, user=self.context['request'].user, completed_at__isnull=False,
+        ).first()
+        if upload is None:
+            self.fail('not_found')
+        self.upload = upload
+        return upload
+
+
+class ChunkedUploadMixin:
+    """
+    Saves the files of the chunked uploads attached through a `ChunkedUploadField`, and discards
+    the uploads once the object is saved.
+    """
+    def save(self, **kwargs):
+        fields = [field for field in self.fields.values() if isinstance(field, ChunkedUploadField) and field.upload]
+        for field in fields:
+            self.validated_data[field.source] = File(open(upload_path(field.upload.pk), 'rb'), name=field.upload.filename)
+        try:
+            instance = super().save(**kwargs)
+        finally:
+            for field in fields:
+                self.validated_data[field.source].close()
+        # the file now lives in the media storage, so the assembled copy is not needed any more
+        for field in fields:
+            discard_upload(field.upload)
+        return instance
+
+
+class UpdateFieldsMixin:
+    """
+    Saves only the columns of the validated fields on update, so the columns other requests change
+    at the same time, like the follow counts, are not written back with the values read before.
+    """
+    def update(self, instance, validated_data):
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
 
 
-class PostSerializer(serializers.ModelSerializer):
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChunkedUpload
+        fields = ['id', 'filename', 'size', 'offset', 'created_at', 'completed_at']
+        read_only_fields = ['id', 'offset', 'created_at', 'completed_at']
+
+
+class ViewerStateMixin:
+    """
+    Adds the viewer's flags to each item when the list view put them in the serializer context.
+    """
+    # the context key holding the ids liked by the viewer
+    liked_ids_context_key = None
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        liked_ids = self.context.get(self.liked_ids_context_key)
+        if liked_ids is not None:
+            data['viewer_has_liked'] = instance.pk in liked_ids
+        following_ids = self.context.get('following_ids')
+        if following_ids is not None:
+            data['viewer_follows_author'] = instance.user_id in following_ids
+        return data
+
+
+class PostSerializer(ChunkedUploadMixin, ViewerStateMixin, serializers.ModelSerializer):
     # set the user field to a required field
     user = serializers.CharField(required=False)
+    # the number of likes, including the likes still waiting in the counter shards of a hot post
+    like_count = serializers.SerializerMethodField()
+    # the resized copies of the image
+    image_srcset = ImageSrcsetField()
+    # the size and placeholder of the image
+    image_meta = ImageMetaField()
+    # the id of a finished chunked upload to use as the image
+    upload_id = ChunkedUploadField(source='image')
+    liked_ids_context_key = 'liked_post_ids'
 
     # define the fields that will be serialized/deserialized
     class Meta:
-        # set the fields to all fields in the Post model
-        fields = '__all__'
+        # set the fields to all fields in the Post model except the list of likers,
+        # which is replaced by the like counter, the variants, which are shown as image_srcset,
+        # and the internal sharded counter flag
+        exclude = ['likes', 'image_variants', 'likes_sharded']
+        # the counters are only changed by likes and comments
+        read_only_fields = ['comment_count']
         # set the model to the Post model
         model = Post
 
+    @extend_schema_field(int)
+    def get_like_count(self, obj):
+        return like_total(obj)
+
 
-class CommentSerializer(serializers.ModelSerializer):
-    likes = serializers.SerializerMethodField()
+class CommentSerializer(ChunkedUploadMixin, ViewerStateMixin, serializers.ModelSerializer):
+    liked_ids_context_key = 'liked_comment_ids'
     user = serializers.StringRelatedField()
+    # the number of likes, including the likes still waiting in the counter shards of a hot comment
+    like_count = serializers.SerializerMethodField()
     image = serializers.ImageField(required=False, use_url=True)
+    # the resized copies of the image
+    image_srcset = ImageSrcsetField()
+    # the size and placeholder of the image
+    image_meta = ImageMetaField()
+    # the id of a finished chunked upload to use as the image
+    upload_id = ChunkedUploadField(source='image')
     content = serializers.CharField()
 
     class Meta:
         model = Comment
-        fields = ['id', 'user', 'post', 'image','content', 'likes']
+        fields = ['id', 'user', 'post', 'image', 'image_srcset', 'image_meta', 'upload_id', 'content', 'like_count', 'reply_count']
+        read_only_fields = ['reply_count']
 
     def create(self, validated_data):
         request = self.context.get('request')
-        image = request.FILES.get('image')
-        validated_data.pop('image', None)
+        # the file of a chunked upload, put there by ChunkedUploadMixin.save, or the multipart file
+        image = validated_data.pop('image', None) or request.FILES.get('image')
         comment = Comment.objects.create(
             user=request.user,
             image=image if image else None,
@@ -40,30 +200,93 @@ class CommentSerializer(serializers.ModelSerializer):
         )
         return comment
 
-    @extend_schema_field(str)
-    def get_likes(self, obj):
-        return str(obj.likes.count())
+    @extend_schema_field(int)
+    def get_like_count(self, obj):
+        return like_total(obj)
+
+
+
+class CommentReplySerializer(ViewerStateMixin, serializers.ModelSerializer):
+    liked_ids_context_key = 'liked_reply_ids'
+
+    class Meta:
+        model = CommentReply
+        fields = ['id', 'comment', 'user', 'reply', 'created_at', 'like_count']
+        read_only_fields = ['like_count']
+
+
+class AuthorSummarySerializer(serializers.ModelSerializer):
+    avatar = serializers.ImageField(source='userprofile.avatar', read_only=True)
+
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'first_name', 'last_name', 'avatar']
 
 
+class ThreadReplySerializer(serializers.ModelSerializer):
+    user = AuthorSummarySerializer(read_only=True)
 
-class CommentReplySerializer(serializers.ModelSerializer):
     class Meta:
         model = CommentReply
-        fields = ['id', 'comment', 'user', 'reply', 'created_at']
+        fields = ['id', 'user', 'reply', 'created_at', 'like_count']
+
+
+class ThreadCommentSerializer(serializers.ModelSerializer):
+    """
+    A comment of a post thread with its author, its like count and its first replies.
+    The view prefetches the replies into `first_replies` and passes the number to show
+    in the `replies_per_comment` context key; the extra prefetched reply tells whether
+    there are more, in which case `replies_next` links to the next page of replies.
+    """
+    user = AuthorSummarySerializer(read_only=True)
+    like_count = serializers.SerializerMethodField()
+    image_srcset = ImageSrcsetField()
+    image_meta = ImageMetaField()
+    replies = serializers.SerializerMethodField()
+    replies_next = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Comment
+        fields = ['id', 'user', 'content', 'image', 'image_srcset', 'image_meta', 'created_at', 'like_count', 'reply_count', 'replies', 'replies_next']
+
+    @extend_schema_field(int)
+    def get_like_count(self, obj):
+        return like_total(obj)
+
+    @extend_schema_field(ThreadReplySerializer(many=True))
+    def get_replies(self, obj):
+        replies = obj.first_replies[:self.context['replies_per_comment']]
+        return ThreadReplySerializer(replies, many=True, context=self.context).data
 
+    @extend_schema_field(serializers.URLField(allow_null=True))
+    def get_replies_next(self, obj):
+        limit = self.context['replies_per_comment']
+        if len(obj.first_replies) <= limit:
+            return None
+        return self.context['replies_next_link'](obj, obj.first_replies[limit - 1])
 
-class MessageSerializer(serializers.ModelSerializer):
+
+class MessageSerializer(ChunkedUploadMixin, serializers.ModelSerializer):
     sender = serializers.ReadOnlyField(source='sender.username')
+    # the resized copies of the image
+    image_srcset = ImageSrcsetField()
+    # the size and placeholder of the image
+    image_meta = ImageMetaField()
+    # the id of a finished chunked upload to use as the image
+    upload_id = ChunkedUploadField(source='image')
 
     class Meta:
         model = Message
-        fields = ['id', 'sender', 'recipient', 'content', 'image', 'created_at']
+        fields = ['id', 'sender', 'recipient', 'content', 'image', 'image_srcset', 'image_meta', 'upload_id', 'created_at']
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(UpdateFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = UserProfile
-        fields = '__all__'
+        # the avatar variants and metadata are only written by the image workers
+        exclude = ['avatar_variants', 'avatar_meta']
+        # the follow counts are only changed by following and unfollowing
+        read_only_fields = ['follower_count', 'following_count']
 
 
 class UserProfileViewSet(viewsets.ModelViewSet):
@@ -71,10 +294,29 @@ class UserProfileViewSet(viewsets.ModelViewSet):
     serializer_class = UserProfileSerializer
 
 
-class UploadAvatarSerializer(serializers.ModelSerializer):
+class UploadAvatarSerializer(ChunkedUploadMixin, UpdateFieldsMixin, serializers.ModelSerializer):
+    # the id of a finished chunked upload to use as the avatar
+    upload_id = ChunkedUploadField(source='avatar')
+
     class Meta:
         model = UserProfile
-        fields = ('avatar',)
+        fields = ('avatar', 'upload_id')
+        extra_kwargs = {'avatar': {'required': False}}
+
+    def validate(self, attrs):
+        if not attrs.get('avatar'):
+            raise serializers.ValidationError('Send an avatar file or the upload_id of a finished upload.')
+        return attrs
+
+
+class FollowSuggestionSerializer(serializers.ModelSerializer):
+    # a suggestion rendered as the suggested user
+    id = serializers.ReadOnlyField(source='suggested.id')
+    username = serializers.ReadOnlyField(source='suggested.username')
+
+    class Meta:
+        model = FollowSuggestion
+        fields = ['id', 'username', 'score']
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -90,10 +332,14 @@ class UserProfile_Serializer(serializers.ModelSerializer):
     first_name = serializers.CharField(source='user.first_name')
     last_name = serializers.CharField(source='user.last_name')
     date_joined = serializers.DateTimeField(source='user.date_joined')
+    # the square 48, 96 and 256 px copies of the avatar
+    avatar_srcset = ImageSrcsetField(field='avatar', variants_field='avatar_variants')
+    # the size and placeholder of the avatar
+    avatar_meta = ImageMetaField(field='avatar', meta_field='avatar_meta')
 
     class Meta:
         model = UserProfile
-        fields = '__all__'
+        exclude = ['avatar_variants']
 
 
 
@@ -129,6 +375,32 @@ def create_user_profile(sender, instance, created, **kwargs):
         UserProfile.objects.create(user=instance)
 
 
+class LikerSerializer(serializers.Serializer):
+    # a like row rendered as a summary of the profile of the user who liked
+    id = serializers.ReadOnlyField(source='user.id')
+    username = serializers.ReadOnlyField(source='user.username')
+    first_name = serializers.ReadOnlyField(source='user.first_name')
+    last_name = serializers.ReadOnlyField(source='user.last_name')
+    avatar = serializers.ImageField(source='user.userprofile.avatar', read_only=True)
+
+
+class ViewerStateSerializer(serializers.Serializer):
+    liked_posts = serializers.ListField(child=serializers.IntegerField())
+    liked_comments = serializers.ListField(child=serializers.IntegerField())
+    liked_replies = serializers.ListField(child=serializers.IntegerField())
+    following = serializers.ListField(child=serializers.IntegerField())
+
+
+class RelationshipSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    # the authenticated user follows this user
+    you_follow = serializers.BooleanField()
+    # this user follows the authenticated user
+    follows_you = serializers.BooleanField()
+    # both of the above
+    mutual = serializers.BooleanField()
+
+
 class CommentReplyLikeSerializer(serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source='user.username')
     comment_reply = serializers.PrimaryKeyRelatedField(queryset=CommentReply.objects.all())
@@ -152,16 +424,27 @@ class FollowUserSerializer(serializers.Serializer):
     def create(self, validated_data):
         user_to_follow = validated_data['user_id']
         current_user = self.context['request'].user
-        current_user_profile, created = UserProfile.objects.get_or_create(user=current_user)
         if user_to_follow == current_user:
             raise serializers.ValidationError("You can't follow yourself")
-        if user_to_follow in current_user_profile.following.all():
+        if not follow(current_user.id, user_to_follow.id):
             raise serializers.ValidationError("You are already following this user")
-        current_user_profile.following.add(user_to_follow)
-        current_user_profile.save()
         return {'success': 'User followed successfully'}
 
 
+class BulkFollowSerializer(serializers.Serializer):
+    # the ids of the users to follow
+    user_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=BULK_FOLLOW_MAX)
+
+
+class BulkFollowResponseSerializer(serializers.Serializer):
+    # the users followed by the request
+    followed = serializers.ListField(child=serializers.IntegerField())
+    # the users that were already followed
+    already_following = serializers.ListField(child=serializers.IntegerField())
+    # the ids matching no user
+    not_found = serializers.ListField(child=serializers.IntegerField())
+
+
 class ResponseSerializer(serializers.Serializer):
     success = serializers.BooleanField(default=False)
     error = serializers.CharField(allow_blank=True, default='')
@@ -183,6 +466,16 @@ class FollowerSerializer(serializers.ModelSerializer):
         fields = ['id', 'username']
 
 
+class FollowingSerializer(serializers.ModelSerializer):
+    # a follow row rendered as the followed user
+    id = serializers.ReadOnlyField(source='following.id')
+    username = serializers.ReadOnlyField(source='following.username')
+
+    class Meta:
+        model = Follow
+        fields = ['id', 'username']
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
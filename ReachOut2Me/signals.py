@@ -0,0 +1,148 @@
+from django.db import connections
+from django.apps import apps
+from django.db.models.signals import pre_save, pre_delete, post_save, post_delete, m2m_changed, post_migrate
+from django.db.migrations.recorder import MigrationRecorder
+from django.dispatch import receiver
+
+from .cache import invalidate_on_commit, post_scope, comments_scope, profile_scope, following_scope
+from .search import install_search_index
+from .images import IMAGE_FIELDS, process_image
+from .storage import MEDIA_FIELDS, release
+from .models import Post, PostLike, Comment, CommentLike, CommentReply, User, UserProfile, Follow
+from .follows import forget_follows_of
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post(sender, instance, **kwargs):
+    invalidate_on_commit(post_scope(instance.pk), comments_scope(instance.pk))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment(sender, instance, **kwargs):
+    # the post payload holds the comment counter and the comment listing holds the comment
+    invalidate_on_commit(post_scope(instance.post_id), comments_scope(instance.post_id))
+
+
+@receiver(post_save, sender=CommentReply)
+@receiver(post_delete, sender=CommentReply)
+def invalidate_comment_reply(sender, instance, **kwargs):
+    # the comment listing holds the reply counter of the comment
+    post_id = Comment.objects.filter(pk=instance.comment_id).values_list('post_id', flat=True).first()
+    if post_id is not None:
+        invalidate_on_commit(comments_scope(post_id))
+
+
+@receiver(post_save, sender=PostLike)
+@receiver(post_delete, sender=PostLike)
+def invalidate_post_like(sender, instance, **kwargs):
+    invalidate_on_commit(post_scope(instance.post_id))
+
+
+@receiver(post_save, sender=CommentLike)
+@receiver(post_delete, sender=CommentLike)
+def invalidate_comment_like(sender, instance, **kwargs):
+    post_id = Comment.objects.filter(pk=instance.comment_id).values_list('post_id', flat=True).first()
+    if post_id is not None:
+        invalidate_on_commit(comments_scope(post_id))
+
+
+@receiver(m2m_changed, sender=PostLike)
+def invalidate_post_likes_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # likes added or removed through `post.likes` or `user.post_likes`
+    if not action.startswith('post_'):
+        return
+    post_ids = (pk_set or []) if reverse else [instance.pk]
+    invalidate_on_commit(*[post_scope(post_id) for post_id in post_ids])
+
+
+@receiver(m2m_changed, sender=CommentLike)
+def invalidate_comment_likes_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # likes added or removed through `comment.likes` or `user.comment_likes`
+    if not action.startswith('post_'):
+        return
+    comment_ids = (pk_set or []) if reverse else [instance.pk]
+    post_ids = set(Comment.objects.filter(pk__in=comment_ids).values_list('post_id', flat=True))
+    invalidate_on_commit(*[comments_scope(post_id) for post_id in post_ids])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user(sender, instance, **kwargs):
+    invalidate_on_commit(profile_scope(instance.username))
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_profile(sender, instance, **kwargs):
+    username = User.objects.filter(pk=instance.user_id).values_list('username', flat=True).first()
+    if username is not None:
+        invalidate_on_commit(profile_scope(username))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow(sender, instance, **kwargs):
+    # both sides of a follow change their counts, and the follower's cached following set changes
+    usernames = User.objects.filter(pk__in=[instance.follower_id, instance.following_id]).values_list('username', flat=True)
+    invalidate_on_commit(following_scope(instance.follower_id), *[profile_scope(username) for username in usernames])
+
+
+@receiver(pre_delete, sender=User)
+def forget_deleted_user_follows(sender, instance, **kwargs):
+    # the follows of a deleted user go away by cascade, without going through unfollow
+    forget_follows_of(instance.pk)
+
+
+@receiver(post_migrate)
+def ensure_search_index(sender, app_config, using='default', **kwargs):
+    # SQLite drops the search triggers whenever a migration rebuilds the post table,
+    # so they are put back as long as the migration creating them is applied
+    if app_config.label != 'ReachOut2Me':
+        return
+    applied = MigrationRecorder(connections[using]).applied_migrations()
+    if ('ReachOut2Me', '0025_post_search_index') in applied:
+        install_search_index(using)
+
+
+def render_image_variants(sender, instance, update_fields=None, **kwargs):
+    # a new or replaced image gets its variants and metadata computed by the image workers
+    field, variants_field, meta_field, kind = IMAGE_FIELDS[sender.__name__]
+    if update_fields is not None and field not in update_fields:
+        return
+    image = getattr(instance, field)
+    if not image:
+        if getattr(instance, variants_field) or getattr(instance, meta_field):
+            sender.objects.filter(pk=instance.pk).update(**{variants_field: {}, meta_field: {}})
+        return
+    if getattr(instance, variants_field).get('source') != image.name:
+        process_image(instance)
+
+
+for model_name in IMAGE_FIELDS:
+    model = apps.get_model('ReachOut2Me', model_name)
+    post_save.connect(render_image_variants, sender=model, dispatch_uid=f'render_variants_{model.__name__}')
+
+
+# the reference counted file field of each model
+MEDIA_FIELD_OF = {apps.get_model('ReachOut2Me', model_name): field for model_name, field in MEDIA_FIELDS}
+
+
+def release_replaced_media(sender, instance, update_fields=None, **kwargs):
+    # the stored file loses a reference when the field is pointed at another upload or cleared
+    field = MEDIA_FIELD_OF[sender]
+    if instance.pk is None or (update_fields is not None and field not in update_fields):
+        return
+    old_name = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+    if old_name and old_name != getattr(instance, field).name:
+        release(old_name)
+
+
+def release_deleted_media(sender, instance, **kwargs):
+    release(getattr(instance, MEDIA_FIELD_OF[sender]).name)
+
+
+for model in MEDIA_FIELD_OF:
+    pre_save.connect(release_replaced_media, sender=model, dispatch_uid=f'release_replaced_{model.__name__}')
+    post_delete.connect(release_deleted_media, sender=model, dispatch_uid=f'release_deleted_{model.__name__}')
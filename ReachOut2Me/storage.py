@@ -0,0 +1,147 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+from django.db.models import F
+
+# the directory of the media root holding the content-addressed files
+CAS_DIR = 'cas'
+# the image and avatar fields whose files are reference counted
+MEDIA_FIELDS = [
+    ('Post', 'image'),
+    ('Comment', 'image'),
+    ('Message', 'image'),
+    ('UserProfile', 'avatar'),
+]
+
+
+def content_name(sha256, original_name):
+    # cas/ab/cd/abcd....jpg: two directory levels keep every directory small
+    extension = os.path.splitext(original_name)[1].lower()[:10]
+    return '/'.join([CAS_DIR, sha256[:2], sha256[2:4], sha256 + extension])
+
+
+def is_content_addressed(name):
+    return bool(name) and name.startswith(CAS_DIR + '/')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    A file system storage keeping one copy of every distinct upload.
+
+    Uploads are hashed with sha256 while they are read, then stored under
+    `cas/<hash[:2]>/<hash[2:4]>/<hash>.<ext>` whatever name they were uploaded with,
+    so a file uploaded a thousand times is written once. The `MediaBlob` table counts the
+    fields pointing at each file, and `delete` only removes the file with its last reference.
+    Files saved before this storage was used keep their names and are deleted as before.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # the final name depends on the content, which is only known when saving
+        return name
+
+    def _save(self, name, content):
+        from .models import MediaBlob
+
+        sha256, size = self.hash_content(content)
+        name = content_name(sha256, name)
+        with transaction.atomic():
+            # two uploads of new content both insert the blob and the second insert is ignored,
+            # then the row is locked so a collection of the same content waits or is waited on
+            MediaBlob.objects.bulk_create([MediaBlob(sha256=sha256, name=name, size=size)], ignore_conflicts=True)
+            blob = MediaBlob.objects.select_for_update().get(sha256=sha256)
+            # the content is only written when no copy of it is stored yet
+            if not self.exists(blob.name):
+                self.write_once(blob.name, content)
+            MediaBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+        return blob.name
+
+    def hash_content(self, content):
+        digest = hashlib.sha256()
+        size = 0
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+            size += len(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        return digest.hexdigest(), size
+
+    def write_once(self, name, content):
+        # write to a temporary file first and link it into place, so a reader never sees
+        # a partial file and two processes storing the same content do not clash
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        handle, temporary_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                for chunk in content.chunks():
+                    file.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temporary_path, self.file_permissions_mode)
+            try:
+                os.link(temporary_path, full_path)
+            except FileExistsError:
+                pass
+        finally:
+            os.remove(temporary_path)
+
+    def delete(self, name):
+        """
+        Release one reference to the file, deleting it and its image variants after the last one.
+        """
+        from .images import variants_dir
+        from .models import MediaBlob
+
+        if not is_content_addressed(name):
+            return super().delete(name)
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+            if blob is None or blob.ref_count == 0:
+                return
+            MediaBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+            if blob.ref_count > 1:
+                return
+
+            def remove_files():
+                super(ContentAddressedStorage, self).delete(name)
+                shutil.rmtree(self.path(variants_dir(name)), ignore_errors=True)
+
+            # the blob is kept at zero until the release commits, and the files only go if no upload
+            # of the same content took a new reference in the meantime
+            transaction.on_commit(lambda: collect_blob(name, remove_files))
+
+
+def collect_blob(name, remove, size=0):
+    """
+    Delete the blob of an unreferenced content-addressed file and call `remove` to delete the file.
+
+    The blob row is locked while the file is removed, so an upload of the same content either
+    takes its reference first, and the file is kept, or waits and finds the file gone and writes
+    it again. A file without a blob gets one first, so it is locked the same way.
+    Return whether the file was removed.
+    """
+    from .models import MediaBlob
+
+    sha256 = os.path.splitext(os.path.basename(name))[0]
+    with transaction.atomic():
+        MediaBlob.objects.bulk_create([MediaBlob(sha256=sha256, name=name, size=size)], ignore_conflicts=True)
+        blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+        if blob is None or blob.ref_count > 0:
+            return False
+        blob.delete()
+        remove()
+    return True
+
+
+def release(name):
+    """
+    Drop the reference of a field to a stored file, once the current transaction commits.
+    """
+    if name:
+        transaction.on_commit(lambda: default_storage.delete(name))
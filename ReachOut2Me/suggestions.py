@@ -0,0 +1,167 @@
+import multiprocessing
+import os
+
+import numpy as np
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from scipy import sparse
+
+from .models import Follow, FollowSuggestion, User
+
+# the number of suggestions kept per user
+SUGGESTIONS_TOP_K = getattr(settings, 'SUGGESTIONS_TOP_K', 20)
+# the age after which a follow counts for half as much towards the recency part of the score, in days
+SUGGESTIONS_HALF_LIFE_DAYS = getattr(settings, 'SUGGESTIONS_HALF_LIFE_DAYS', 30)
+# how much a brand new follow adds on top of the 1 every follow by a followed user is worth
+SUGGESTIONS_RECENCY_WEIGHT = getattr(settings, 'SUGGESTIONS_RECENCY_WEIGHT', 1.0)
+# the number of users scored per matrix product; the product of a chunk is the only large allocation
+SUGGESTIONS_CHUNK_SIZE = getattr(settings, 'SUGGESTIONS_CHUNK_SIZE', 2000)
+# the number of edges read per query when loading the graph
+LOAD_CHUNK_SIZE = 100000
+# the number of rows written, or ids looked up, per query
+WRITE_BATCH_SIZE = 500
+
+# the matrices the worker processes score their chunks with, inherited from the parent when they fork
+_matrices = None
+
+
+def load_matrices(now=None, half_life_days=SUGGESTIONS_HALF_LIFE_DAYS, recency_weight=SUGGESTIONS_RECENCY_WEIGHT):
+    """
+    Read the Follow table into two sparse matrices indexed by user id: `following`, with a 1
+    where a user follows another, and `weighted`, with the weight each follow carries as evidence,
+    1 plus its recency bonus. The product `following @ weighted` then gives, for every user and
+    candidate, the number of followed users who follow the candidate, plus how recently they did.
+    """
+    now = now or timezone.now()
+    count = Follow.objects.count()
+    followers = np.empty(count, dtype=np.int32)
+    followed = np.empty(count, dtype=np.int32)
+    ages = np.empty(count, dtype=np.float32)
+    # the edges are copied into preallocated arrays, so no Python list of the whole graph is made
+    filled = 0
+    edges = Follow.objects.order_by().values_list('follower_id', 'following_id', 'created_at')
+    for follower_id, following_id, created_at in edges.iterator(chunk_size=LOAD_CHUNK_SIZE):
+        if filled == count:
+            break
+        followers[filled] = follower_id
+        followed[filled] = following_id
+        ages[filled] = (now - created_at).total_seconds() / 86400
+        filled += 1
+    followers, followed, ages = followers[:filled], followed[:filled], ages[:filled]
+
+    size = int(max(followers.max(initial=0), followed.max(initial=0))) + 1
+    weights = 1 + recency_weight * np.exp2(-np.maximum(ages, 0) / half_life_days, dtype=np.float32)
+    following = sparse.csr_matrix((np.ones(filled, dtype=np.float32), (followers, followed)), shape=(size, size))
+    weighted = sparse.csr_matrix((weights, (followers, followed)), shape=(size, size))
+    following.sort_indices()
+    return following, weighted
+
+
+def score_chunk(following, weighted, start, end, top_k=SUGGESTIONS_TOP_K):
+    """
+    Return the `(user_id, candidate_ids, scores)` of the users `start` to `end`, best first,
+    with the user and the users they already follow left out.
+    """
+    rows = following[start:end]
+    scores = rows @ weighted
+    scores.sort_indices()
+    results = []
+    for offset in range(end - start):
+        low, high = scores.indptr[offset], scores.indptr[offset + 1]
+        if low == high:
+            continue
+        user_id = start + offset
+        candidates = scores.indices[low:high]
+        values = scores.data[low:high]
+        # both index arrays are sorted, so the followed users are found with a binary search;
+        # a user with candidates follows someone, so the row is never empty
+        followed = rows.indices[rows.indptr[offset]:rows.indptr[offset + 1]]
+        position = np.minimum(np.searchsorted(followed, candidates), len(followed) - 1)
+        keep = (candidates != user_id) & (followed[position] != candidates)
+        candidates, values = candidates[keep], values[keep]
+        if len(candidates) > top_k:
+            best = np.argpartition(-values, top_k - 1)[:top_k]
+            candidates, values = candidates[best], values[best]
+        # the best score first, the lowest id first between equal scores
+        order = np.lexsort((candidates, -values))
+        results.append((user_id, candidates[order], values[order]))
+    return results
+
+
+def _score_chunk(bounds):
+    start, end, top_k = bounds
+    following, weighted = _matrices
+    return start, end, score_chunk(following, weighted, start, end, top_k=top_k)
+
+
+def write_chunk(start, end, results, computed_at):
+    """
+    Replace the suggestions of the users `start` to `end` in one transaction,
+    so a user sees either their previous suggestions or the new ones.
+    """
+    # users deleted while the job ran are skipped
+    existing = set(User.objects.filter(pk__gte=start, pk__lt=end).values_list('pk', flat=True))
+    rows = []
+    for user_id, candidates, values in results:
+        if user_id not in existing:
+            continue
+        rows.extend(
+            FollowSuggestion(user_id=user_id, suggested_id=int(candidate), rank=rank, score=float(value), computed_at=computed_at)
+            for rank, (candidate, value) in enumerate(zip(candidates, values), start=1)
+        )
+    with transaction.atomic():
+        FollowSuggestion.objects.filter(user_id__gte=start, user_id__lt=end).delete()
+        # a suggested user deleted since the graph was read would make the insert fail, so they are dropped
+        suggested = existing_user_ids({row.suggested_id for row in rows})
+        rows = [row for row in rows if row.suggested_id in suggested]
+        FollowSuggestion.objects.bulk_create(rows, batch_size=WRITE_BATCH_SIZE)
+    return len(rows)
+
+
+def existing_user_ids(user_ids):
+    # the ids are looked up in batches, to stay under the bound variables limit of SQLite
+    user_ids = sorted(user_ids)
+    existing = set()
+    for index in range(0, len(user_ids), WRITE_BATCH_SIZE):
+        existing.update(User.objects.filter(pk__in=user_ids[index:index + WRITE_BATCH_SIZE]).values_list('pk', flat=True))
+    return existing
+
+
+def compute_suggestions(top_k=SUGGESTIONS_TOP_K, chunk_size=SUGGESTIONS_CHUNK_SIZE, workers=None, **options):
+    """
+    Score the friends-of-friends of every user and store their top `top_k` suggestions.
+
+    The users are scored `chunk_size` at a time, by `workers` processes (one per core by
+    default) forked after the matrices are loaded, so they share them copy-on-write. Chunks are
+    written as they come back, which bounds the memory to the matrices plus one product per worker.
+    Returns the number of users with suggestions and the number of suggestions stored.
+    """
+    global _matrices
+    computed_at = timezone.now()
+    following, weighted = load_matrices(now=computed_at, **options)
+    size = following.shape[0]
+    # users with ids past the last follow have nothing to suggest, so only their old rows are cleared
+    FollowSuggestion.objects.filter(user_id__gte=size).delete()
+    chunks = [(start, min(start + chunk_size, size), top_k) for start in range(0, size, chunk_size)]
+    workers = workers or os.cpu_count() or 1
+
+    users = stored = 0
+    _matrices = (following, weighted)
+    if workers > 1 and len(chunks) > 1:
+        # the forked workers must not share the parent's database connections
+        connections.close_all()
+        pool = multiprocessing.get_context('fork').Pool(workers)
+        scored = pool.imap_unordered(_score_chunk, chunks)
+    else:
+        pool = None
+        scored = map(_score_chunk, chunks)
+    try:
+        for start, end, results in scored:
+            users += len(results)
+            stored += write_chunk(start, end, results, computed_at)
+    finally:
+        _matrices = None
+        if pool is not None:
+            pool.terminate()
+    return users, stored
@@ -0,0 +1,109 @@
+import re
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+from .models import Hashtag, PostHashtag, PostMention, Notification, Post, User
+
+# the longest tag stored, the length of Hashtag.name
+HASHTAG_MAX_LENGTH = 100
+# a `#` not preceded by a word character, followed by the tag
+HASHTAG_RE = re.compile(r'(?<![\w&])#(\w{1,%d})' % HASHTAG_MAX_LENGTH)
+# an `@` not preceded by a word character or `@`, followed by a username
+MENTION_RE = re.compile(r'(?<![\w@])@([\w.@+-]{1,150})')
+
+
+def normalize_tag(tag):
+    # case folding can lengthen a tag (ß becomes ss), so the length is only cut once it is folded
+    return tag.lstrip('#').casefold()[:HASHTAG_MAX_LENGTH]
+
+
+def extract_hashtags(content):
+    """
+    Return the normalized hashtags of a text, without duplicates, in order of appearance.
+    """
+    return list(dict.fromkeys(normalize_tag(tag) for tag in HASHTAG_RE.findall(content or '')))
+
+
+def extract_mentions(content):
+    """
+    Return the usernames mentioned in a text, without duplicates, in order of appearance.
+    A trailing full stop ends the sentence rather than the username.
+    """
+    return list(dict.fromkeys(name.rstrip('.') for name in MENTION_RE.findall(content or '') if name.rstrip('.')))
+
+
+def hashtag_ids(names):
+    # create the tags seen for the first time, then read back the ids of them all
+    if not names:
+        return {}
+    Hashtag.objects.bulk_create([Hashtag(name=name) for name in names], ignore_conflicts=True)
+    return dict(Hashtag.objects.filter(name__in=names).values_list('name', 'id'))
+
+
+def index_posts(posts, notify=True):
+    """
+    Bring the hashtag and mention rows of the given posts in line with their content.
+
+    The posts are handled together: one query per table reads the current rows and one
+    bulk insert or delete applies the differences, so a chunk of posts costs the same
+    number of queries as a single post. Users mentioned for the first time in a post are
+    notified in a single bulk insert when `notify` is set.
+    """
+    posts = list(posts)
+    if not posts:
+        return
+    post_ids = [post.pk for post in posts]
+    tags = {post.pk: extract_hashtags(post.content) for post in posts}
+    mentions = {post.pk: extract_mentions(post.content) for post in posts}
+
+    with transaction.atomic():
+        # hashtags: insert the new (post, tag) pairs and delete the ones no longer in the content
+        ids = hashtag_ids({name for names in tags.values() for name in names})
+        wanted = {(post.pk, ids[name]) for post in posts for name in tags[post.pk]}
+        existing = set(PostHashtag.objects.filter(post_id__in=post_ids).values_list('post_id', 'hashtag_id'))
+        created_at = {post.pk: post.created_at for post in posts}
+        PostHashtag.objects.bulk_create(
+            [
+                PostHashtag(post_id=post_id, hashtag_id=hashtag_id, created_at=created_at[post_id])
+                for post_id, hashtag_id in wanted - existing
+            ],
+            ignore_conflicts=True,
+        )
+        delete_pairs(PostHashtag, 'hashtag_id', existing - wanted)
+
+        # mentions: only existing users other than the author can be mentioned
+        usernames = {name for names in mentions.values() for name in names}
+        user_ids = dict(User.objects.filter(username__in=usernames).values_list('username', 'id')) if usernames else {}
+        wanted = {
+            (post.pk, user_ids[name])
+            for post in posts for name in mentions[post.pk]
+            if name in user_ids and user_ids[name] != post.user_id
+        }
+        existing = set(PostMention.objects.filter(post_id__in=post_ids).values_list('post_id', 'user_id'))
+        added = wanted - existing
+        PostMention.objects.bulk_create(
+            [PostMention(post_id=post_id, user_id=user_id, created_at=created_at[post_id]) for post_id, user_id in added],
+            ignore_conflicts=True,
+        )
+        delete_pairs(PostMention, 'user_id', existing - wanted)
+
+        if notify and added:
+            post_type = ContentType.objects.get_for_model(Post)
+            Notification.objects.bulk_create([
+                Notification(recipient_id=user_id, actor_content_type=post_type, actor_object_id=post_id, verb='mention')
+                for post_id, user_id in sorted(added)
+            ])
+
+
+def delete_pairs(model, field, pairs):
+    # delete the rows of the given (post id, other id) pairs, grouped by post
+    by_post = {}
+    for post_id, other_id in pairs:
+        by_post.setdefault(post_id, []).append(other_id)
+    for post_id, other_ids in by_post.items():
+        model.objects.filter(post_id=post_id, **{f'{field}__in': other_ids}).delete()
+
+
+def index_post(post, notify=True):
+    index_posts([post], notify=notify)
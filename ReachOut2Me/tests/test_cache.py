@@ -0,0 +1,189 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.test import TestCase
+from django.core.cache import cache
+from rest_framework.test import APIClient
+from rest_framework import status
+from django.urls import reverse
+from django.contrib.auth.models import User
+from ..models import Post, Comment
+from ..cache import cache_stats, get_or_build, needs_refresh
+from rest_framework.authtoken.models import Token
+
+
+class PayloadCacheTestCase(TestCase):
+    """This class defines the test suite for the cached post and comment payloads."""
+
+    def setUp(self):
+        """Define the test client and other test variables."""
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpasswordForMe")
+        self.post = Post.objects.create(user=self.user, content="test content")
+        self.detail_url = reverse("post_detail", kwargs={"pk": self.post.id})
+        self.comments_url = reverse("create-comment", kwargs={"post_id": self.post.id})
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=self.user).key)
+
+    def counts(self, kind):
+        return cache_stats().get(kind, {"hits": 0, "misses": 0})
+
+    def test_post_detail_is_served_from_cache(self):
+        """Test the second read of a post is a cache hit that does not query the post."""
+        before = self.counts("post")
+        self.client.get(self.detail_url)
+        # only the token of the request is looked up
+        with self.assertNumQueries(1):
+            response = self.client.get(self.detail_url)
+        self.assertEqual(response.data["content"], "test content")
+        after = self.counts("post")
+        self.assertEqual(after["misses"] - before["misses"], 1)
+        self.assertEqual(after["hits"] - before["hits"], 1)
+
+    def test_like_and_comment_invalidate_post_detail(self):
+        """Test liking and commenting on a post are visible on the next read of the post."""
+        self.client.get(self.detail_url)
+        self.client.put(reverse("post_like", kwargs={"pk": self.post.id}))
+        self.client.post(self.comments_url, data={"content": "first", "post": self.post.id})
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.data["like_count"], 1)
+        self.assertEqual(response.data["comment_count"], 1)
+
+    def test_comment_listing_is_invalidated(self):
+        """Test new comments, replies and deletions show up in the cached comment listing."""
+        self.client.get(self.comments_url)
+        response = self.client.post(self.comments_url, data={"content": "first", "post": self.post.id})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        comment_id = response.data["id"]
+        response = self.client.get(self.comments_url)
+        self.assertEqual([comment["content"] for comment in response.data["results"]], ["first"])
+
+        replies_url = reverse("create_get_comment_reply", kwargs={"comment_id": comment_id})
+        self.client.post(replies_url, data={"reply": "reply", "comment": comment_id, "user": self.user.id})
+        response = self.client.get(self.comments_url)
+        self.assertEqual(response.data["results"][0]["reply_count"], 1)
+
+        Comment.objects.filter(pk=comment_id).first().delete()
+        response = self.client.get(self.comments_url)
+        self.assertEqual(response.data["results"], [])
+
+    def test_cached_pages_keep_their_next_link(self):
+        """Test a cached page still links to the next page of comments."""
+        for i in range(3):
+            Comment.objects.create(user=self.user, post=self.post, content="comment %d" % i)
+        self.client.get(self.comments_url + "?page_size=2")
+        response = self.client.get(self.comments_url + "?page_size=2")
+        self.assertEqual(len(response.data["results"]), 2)
+        response = self.client.get(response.data["next"])
+        self.assertEqual([comment["content"] for comment in response.data["results"]], ["comment 0"])
+
+    def test_viewer_state_bypasses_cache(self):
+        """Test pages with the viewer's flags are built for each request."""
+        Comment.objects.create(user=self.user, post=self.post, content="comment")
+        before = self.counts("comments")
+        response = self.client.get(self.comments_url + "?viewer_state=1")
+        self.assertIn("viewer_has_liked", response.data["results"][0])
+        self.assertEqual(self.counts("comments"), before)
+
+    def test_cache_stats_are_for_admins(self):
+        """Test only staff users can read the cache metrics."""
+        response = self.client.get(reverse("cache_stats"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.user.is_staff = True
+        self.user.save()
+        self.client.get(self.detail_url)
+        response = self.client.get(reverse("cache_stats"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("post", response.data)
+
+
+class SingleFlightTestCase(TestCase):
+    """This class defines the test suite for the coalesced rebuilds of cached payloads."""
+
+    def setUp(self):
+        """Define the test client and other test variables."""
+        cache.clear()
+        self.calls = {}
+        self.calls_lock = threading.Lock()
+
+    def builder(self, key):
+        def build():
+            with self.calls_lock:
+                self.calls[key] = self.calls.get(key, 0) + 1
+            # a slow query, so every other request arrives while it runs
+            time.sleep(0.2)
+            return {"key": key}
+        return build
+
+    def test_parallel_misses_build_once_per_key(self):
+        """Test 100 parallel requests on two cold keys run each builder once."""
+        keys = ["single-flight:a", "single-flight:b"]
+        barrier = threading.Barrier(100)
+
+        def request(index):
+            key = keys[index % 2]
+            barrier.wait()
+            return get_or_build("test", key, self.builder(key))
+
+        with ThreadPoolExecutor(max_workers=100) as pool:
+            results = list(pool.map(request, range(100)))
+        self.assertEqual(self.calls, {"single-flight:a": 1, "single-flight:b": 1})
+        self.assertEqual([result["key"] for result in results], [keys[index % 2] for index in range(100)])
+
+    def test_expired_payload_is_served_while_rebuilt(self):
+        """Test requests arriving during a rebuild get the stale payload instead of waiting."""
+        key = "single-flight:stale"
+        cache.set(key, {"value": "old", "delta": 0.1, "expires": time.time() - 1}, 60)
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            leader = pool.submit(get_or_build, "test", key, lambda: time.sleep(0.3) or "new")
+            time.sleep(0.1)
+            others = [pool.submit(get_or_build, "test", key, self.builder(key)) for i in range(9)]
+            self.assertEqual([future.result() for future in others], ["old"] * 9)
+            self.assertEqual(leader.result(), "new")
+        self.assertEqual(self.calls, {})
+        self.assertEqual(get_or_build("test", key, self.builder(key)), "new")
+
+    def test_early_refresh_is_probabilistic(self):
+        """Test entries close to expiring are refreshed early by chance and fresh ones are not."""
+        now = time.time()
+        entry = {"value": 1, "delta": 1.0, "expires": now + 0.5}
+        with mock.patch("ReachOut2Me.cache.random.random", return_value=0.9):
+            self.assertTrue(needs_refresh(entry, now))
+        with mock.patch("ReachOut2Me.cache.random.random", return_value=0.0):
+            self.assertFalse(needs_refresh(entry, now))
+        self.assertFalse(needs_refresh(dict(entry, expires=now + 3600), now))
+        self.assertTrue(needs_refresh(dict(entry, expires=now - 1), now, beta=0))
+
+
+class ProfileCacheTestCase(TestCase):
+    """This class defines the test suite for the cached profile lookups."""
+
+    def setUp(self):
+        """Define the test client and other test variables."""
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", password="testpasswordForMe")
+        self.other = User.objects.create_user(username="other", password="testpasswordForMe")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=self.user).key)
+
+    def test_follow_counts_follow_the_follows(self):
+        """Test the profile lookup shows follower counts that change with follows."""
+        url = reverse("search_user", kwargs={"username": "other"})
+        response = self.client.get(url)
+        self.assertEqual(response.data["follower_count"], 0)
+        self.client.post(reverse("follow_user", kwargs={"user_id": self.other.id}))
+        response = self.client.get(url)
+        self.assertEqual(response.data["follower_count"], 1)
+        response = self.client.get(reverse("search_user", kwargs={"username": "testuser"}))
+        self.assertEqual(response.data["following_count"], 1)
+
+    def test_missing_user_is_cached_until_created(self):
+        """Test a lookup of a missing username returns 404 until that user signs up."""
+        url = reverse("search_user", kwargs={"username": "newcomer"})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        User.objects.create_user(username="newcomer", password="testpasswordForMe")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["username"], "newcomer")
@@ -51,9 +51,9 @@ class CommentTestCase(TestCase):
         """Test the api can get comment on a post."""
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data[0]["content"], "test comment")
-        self.assertEqual(response.data[0]["author"], self.user2.username)
-        self.assertEqual(response.data[0]["post"], self.post.id)
+        self.assertEqual(response.data["results"][0]["content"], "test comment")
+        self.assertEqual(response.data["results"][0]["author"], self.user2.username)
+        self.assertEqual(response.data["results"][0]["post"], self.post.id)
 
     def test_create_comment_on_a_post(self):
         """Test the api can create comment on a post."""
@@ -0,0 +1,90 @@
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+from django.urls import reverse
+from django.contrib.auth.models import User
+from ..models import Post, Comment, CommentReply, LikeCounterShard
+from .. import counters
+from rest_framework.authtoken.models import Token
+
+
+class CounterTestCase(TestCase):
+    """This class defines the test suite for the denormalized like, comment and reply counters."""
+
+    def setUp(self):
+        """Define the test client and other test variables."""
+        self.user = User.objects.create_user(username="testuser", password="testpasswordForMe")
+        self.post = Post.objects.create(user=self.user, content="test content")
+        self.comment = Comment.objects.create(user=self.user, post=self.post, content="test comment")
+        self.reply = CommentReply.objects.create(user=self.user, comment=self.comment, reply="test reply")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=self.user).key)
+        cache.clear()
+
+    def test_post_like_updates_counter(self):
+        """Test liking and unliking a post updates the like counter."""
+        url = reverse("post_like", kwargs={"pk": self.post.id})
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["post"]["like_count"], 1)
+        self.assertNotIn("likes", response.data["post"])
+        response = self.client.post(url)
+        self.assertEqual(response.data["post"]["like_count"], 0)
+
+    def test_comment_and_reply_update_counters(self):
+        """Test creating comments and replies and liking them update the counters."""
+        self.client.post(reverse("create-comment", kwargs={"post_id": self.post.id}), {"content": "another", "post": self.post.id})
+        self.client.post(reverse("create_get_comment_reply", kwargs={"comment_id": self.comment.id}),
+                         {"comment": self.comment.id, "reply": "another reply", "user": self.user.id})
+        response = self.client.post(reverse("comment_like", kwargs={"comment_id": self.comment.id}))
+        self.assertEqual(response.data["like_count"], 1)
+        # liking twice does not count twice
+        response = self.client.post(reverse("comment_like", kwargs={"comment_id": self.comment.id}))
+        self.assertEqual(response.data["like_count"], 1)
+        self.client.post(reverse("comment_reply_like", kwargs={"comment_reply_id": self.reply.id}))
+
+        self.post.refresh_from_db()
+        self.comment.refresh_from_db()
+        self.reply.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        self.assertEqual(self.comment.reply_count, 1)
+        self.assertEqual(self.reply.like_count, 1)
+
+    def test_reconcile_counters_repairs_drift(self):
+        """Test the reconcile command recounts counters that drifted."""
+        self.post.likes.add(self.user)
+        Post.objects.filter(id=self.post.id).update(like_count=42, comment_count=0)
+        call_command("reconcile_counters", stdout=StringIO())
+        self.post.refresh_from_db()
+        self.comment.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+        self.assertEqual(self.post.comment_count, 1)
+        self.assertEqual(self.comment.reply_count, 1)
+
+    def test_hot_post_likes_go_to_shards(self):
+        """Test likes over the rate threshold are counted in shards and folded back by the flush."""
+        fans = [User.objects.create_user(username="fan%d" % i, password="testpasswordForMe") for i in range(5)]
+        with mock.patch.object(counters, "LIKE_SHARDING_THRESHOLD", 2):
+            for fan in fans:
+                client = APIClient()
+                client.force_authenticate(fan)
+                response = client.put(reverse("post_like", kwargs={"pk": self.post.id}))
+        self.assertEqual(response.data["post"]["like_count"], 5)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 2)
+        self.assertEqual(sum(LikeCounterShard.objects.values_list("count", flat=True)), 3)
+
+        # another worker, with none of this one's cache, still adds the shards
+        cache.clear()
+        response = self.client.get(reverse("post_detail", kwargs={"pk": self.post.id}))
+        self.assertEqual(response.data["like_count"], 5)
+
+        call_command("flush_like_shards", stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 5)
+        self.assertFalse(self.post.likes_sharded)
+        self.assertFalse(LikeCounterShard.objects.exists())
@@ -0,0 +1,55 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+from django.urls import reverse
+from django.contrib.auth.models import User
+from ..models import Post, FeedItem
+from rest_framework.authtoken.models import Token
+
+
+class FeedTestCase(TestCase):
+    """This class defines the test suite for the home timeline."""
+
+    def setUp(self):
+        """Define the test client and other test variables."""
+        self.url = reverse("feed")
+        self.user = User.objects.create_user(username="reader", password="testpasswordForMe")
+        self.author = User.objects.create_user(username="author", password="testpasswordForMe")
+        self.stranger = User.objects.create_user(username="stranger", password="testpasswordForMe")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=self.user).key)
+        self.author_client = APIClient()
+        self.author_client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=self.author).key)
+
+    def test_feed_shows_posts_of_followed_users(self):
+        """Test a new post is pushed into the feed of the author's followers only."""
+        self.client.post(reverse("follow_user", kwargs={"user_id": self.author.id}))
+        Post.objects.create(user=self.stranger, content="not followed")
+        response = self.author_client.post(reverse("post_list_create"), data={"content": "hello followers"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([post["content"] for post in response.data["results"]], ["hello followers"])
+        self.assertFalse(FeedItem.objects.filter(owner=self.stranger).exists())
+
+    def test_follow_backfills_and_unfollow_prunes_feed(self):
+        """Test following copies recent posts into the feed and unfollowing removes them."""
+        Post.objects.create(user=self.author, content="older post")
+        self.client.post(reverse("follow_user", kwargs={"user_id": self.author.id}))
+        response = self.client.get(self.url)
+        self.assertEqual([post["content"] for post in response.data["results"]], ["older post"])
+
+        self.client.post(reverse("unfollow_user", kwargs={"user_id": self.author.id}))
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["results"], [])
+
+    def test_feed_query_count_does_not_depend_on_follows(self):
+        """Test reading the feed costs the same number of queries however many users are followed."""
+        for i in range(5):
+            followed = User.objects.create_user(username="followed%d" % i, password="testpasswordForMe")
+            Post.objects.create(user=followed, content="post %d" % i)
+            self.client.post(reverse("follow_user", kwargs={"user_id": followed.id}))
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data["results"]), 5)
@@ -0,0 +1,134 @@
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+from django.urls import reverse
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from .. import follows
+from ..models import FeedItem, Follow, FollowEvent, Notification, Post, UserProfile
+from rest_framework.authtoken.models import Token
+
+
+class FollowTestCase(TestCase):
+    """This class defines the test suite for following and unfollowing users."""
+
+    def setUp(self):
+        """Define the test client and other test variables."""
+        self.user = User.objects.create_user(username="fan", password="testpasswordForMe")
+        self.star = User.objects.create_user(username="star", password="testpasswordForMe")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=self.user).key)
+
+    def counts(self, user):
+        profile = UserProfile.objects.get(user=user)
+        return profile.follower_count, profile.following_count
+
+    def test_follow_and_unfollow_keep_counts(self):
+        """Test following writes one edge and counts it on both profiles, and unfollowing undoes both."""
+        response = self.client.post(reverse("follow_user", kwargs={"user_id": self.star.id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(Follow.objects.filter(follower=self.user, following=self.star).exists())
+        self.assertEqual(self.counts(self.star), (1, 0))
+        self.assertEqual(self.counts(self.user), (0, 1))
+
+        response = self.client.post(reverse("follow_user", kwargs={"user_id": self.star.id}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.counts(self.star), (1, 0))
+
+        response = self.client.post(reverse("unfollow_user", kwargs={"user_id": self.star.id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.counts(self.star), (0, 0))
+        response = self.client.post(reverse("unfollow_user", kwargs={"user_id": self.star.id}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.counts(self.user), (0, 0))
+
+    def test_follower_and_following_lists(self):
+        """Test the follower list of a user shows who follows them and the following list whom they follow."""
+        self.client.post(reverse("follow_user", kwargs={"user_id": self.star.id}))
+        response = self.client.get(reverse("followers_list", kwargs={"user_id": self.star.id}))
+        self.assertEqual(response.data["results"], [{"id": self.user.id, "username": "fan"}])
+        response = self.client.get(reverse("following_list", kwargs={"user_id": self.user.id}))
+        self.assertEqual(response.data["results"], [{"id": self.star.id, "username": "star"}])
+        response = self.client.get(reverse("following_list", kwargs={"user_id": self.star.id}))
+        self.assertEqual(response.data["results"], [])
+
+    def test_profile_shows_counts(self):
+        """Test the profile lookup returns the stored follow counts."""
+        self.client.post(reverse("follow_user", kwargs={"user_id": self.star.id}))
+        response = self.client.get(reverse("search_user", kwargs={"username": "star"}))
+        self.assertEqual((response.data["follower_count"], response.data["following_count"]), (1, 0))
+
+    def test_deleting_a_user_uncounts_its_follows(self):
+        """Test the counts of the other side drop when a user and its follows are deleted."""
+        self.client.post(reverse("follow_user", kwargs={"user_id": self.star.id}))
+        self.user.delete()
+        self.assertEqual(self.counts(self.star), (0, 0))
+
+    def bulk_follow(self, user_ids):
+        return self.client.post(reverse("bulk_follow_users"), {"user_ids": user_ids}, format="json")
+
+    def test_bulk_follow(self):
+        """Test the bulk follow adds the missing edges, counts, events, notifications and feed posts at once."""
+        others = [User.objects.create_user(username=f"user{index}", password="testpasswordForMe") for index in range(3)]
+        post = Post.objects.create(user=others[0], content="hello")
+        self.client.post(reverse("follow_user", kwargs={"user_id": self.star.id}))
+
+        response = self.bulk_follow([others[0].id, self.star.id, 999999, others[1].id, others[0].id])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            "followed": [others[0].id, others[1].id],
+            "already_following": [self.star.id],
+            "not_found": [999999],
+        })
+        self.assertEqual(Follow.objects.filter(follower=self.user).count(), 3)
+        self.assertEqual(self.counts(self.user), (0, 3))
+        self.assertEqual(self.counts(others[0]), (1, 0))
+        self.assertEqual(self.counts(self.star), (1, 0))
+        self.assertEqual(self.counts(others[2]), (0, 0))
+        self.assertEqual(FollowEvent.objects.filter(follower_id=self.user.id, followed=True).count(), 3)
+        self.assertEqual(
+            sorted(Notification.objects.filter(actor_object_id=self.user.id).values_list("recipient_id", flat=True)),
+            sorted([self.star.id, others[0].id, others[1].id]),
+        )
+        self.assertTrue(FeedItem.objects.filter(owner=self.user, post=post).exists())
+
+    def test_bulk_follow_reads_edges_after_taking_the_lock(self):
+        """Test a follow committed while the bulk follow waited for the follower's lock is neither counted nor notified twice."""
+        lock_follower = follows.lock_follower
+
+        def follow_while_waiting(follower_id):
+            # the single follow of the same user wins the race for the lock
+            patcher.stop()
+            follows.follow(follower_id, self.star.id)
+            lock_follower(follower_id)
+
+        patcher = mock.patch.object(follows, "lock_follower", side_effect=follow_while_waiting)
+        patcher.start()
+        self.addCleanup(mock.patch.stopall)
+        response = self.bulk_follow([self.star.id])
+
+        self.assertEqual(response.data["followed"], [])
+        self.assertEqual(response.data["already_following"], [self.star.id])
+        self.assertEqual(self.counts(self.user), (0, 1))
+        self.assertEqual(self.counts(self.star), (1, 0))
+        self.assertEqual(FollowEvent.objects.filter(following_id=self.star.id).count(), 1)
+
+    def test_bulk_follow_queries_do_not_grow_with_targets(self):
+        """Test following many users takes as many queries as following a few."""
+        users = [User.objects.create_user(username=f"user{index}", password="testpasswordForMe") for index in range(40)]
+        with CaptureQueriesContext(connection) as few:
+            self.bulk_follow([user.id for user in users[:2]])
+        with CaptureQueriesContext(connection) as many:
+            self.bulk_follow([user.id for user in users[2:]])
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(self.counts(self.user), (0, 40))
+
+    def test_bulk_follow_rejects_bad_requests(self):
+        """Test the bulk follow refuses the user themself, empty lists and lists over the limit."""
+        self.assertEqual(self.bulk_follow([self.user.id, self.star.id]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.bulk_follow([]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.bulk_follow(list(range(1, 102))).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Follow.objects.exists())
@@ -0,0 +1,114 @@
+import os
+from unittest import mock
+import shutil
+import tempfile
+from io import StringIO
+
+from django.test import TestCase, override_settings
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from ..models import Post, MediaBlob, ChunkedUpload
+from ..uploads import start_upload, upload_path
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class GarbageCollectMediaTestCase(TestCase):
+    """This class defines the test suite for the orphaned media collector."""
+
+    def setUp(self):
+        """Define the test variables and media files."""
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        self.user = User.objects.create_user(username="testuser", password="testpasswordForMe")
+        self.files = {
+            "post_images/kept.jpg": b"k" * 10,
+            "post_images/variants/kept.jpg/thumb.webp": b"v" * 5,
+            "post_images/gone.jpg": b"g" * 100,
+            "post_images/variants/gone.jpg/thumb.webp": b"v" * 20,
+            "avatars/old.png": b"a" * 7,
+            "cas/ab/cd/abcd.png": b"c" * 3,
+        }
+        for name, content in self.files.items():
+            os.makedirs(os.path.dirname(os.path.join(MEDIA_ROOT, name)), exist_ok=True)
+            with open(os.path.join(MEDIA_ROOT, name), "wb") as file:
+                file.write(content)
+        # the post row is written directly so no upload goes through the storage
+        post = Post.objects.create(user=self.user, content="with image")
+        Post.objects.filter(pk=post.pk).update(image="post_images/kept.jpg")
+        MediaBlob.objects.create(sha256="abcd", name="cas/ab/cd/abcd.png", size=3, ref_count=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def gc(self, *args):
+        out = StringIO()
+        call_command("gc_media", "--min-age=0", "--batch-size=2", *args, stdout=out)
+        return out.getvalue()
+
+    def remaining(self):
+        return {name for name in self.files if os.path.exists(os.path.join(MEDIA_ROOT, name))}
+
+    def test_dry_run_only_reports(self):
+        """Test a dry run reports the orphans and their size without touching them."""
+        output = self.gc("--dry-run")
+        self.assertIn("3 orphaned file(s), 127 byte(s) would be reclaimed", output)
+        self.assertEqual(self.remaining(), set(self.files))
+
+    def test_orphans_and_their_variants_are_deleted(self):
+        """Test unreferenced files are deleted while referenced files and their variants are kept."""
+        output = self.gc()
+        self.assertIn("127 byte(s) reclaimed", output)
+        self.assertEqual(
+            self.remaining(),
+            {"post_images/kept.jpg", "post_images/variants/kept.jpg/thumb.webp", "cas/ab/cd/abcd.png"},
+        )
+
+    def test_quarantine_moves_orphans(self):
+        """Test quarantined files are moved aside and skipped by the next run."""
+        self.gc("--quarantine")
+        self.assertNotIn("post_images/gone.jpg", self.remaining())
+        quarantined = [
+            os.path.join(directory, name)
+            for directory, subdirectories, names in os.walk(os.path.join(MEDIA_ROOT, ".quarantine"))
+            for name in names
+        ]
+        self.assertEqual(len(quarantined), 3)
+        self.assertIn("0 orphaned file(s)", self.gc("--dry-run"))
+
+    def test_recent_files_are_kept(self):
+        """Test files younger than the minimum age are never collected."""
+        out = StringIO()
+        call_command("gc_media", stdout=out)
+        self.assertIn("0 orphaned file(s)", out.getvalue())
+
+    def test_expired_uploads_are_deleted(self):
+        """Test chunked uploads never attached are deleted once expired, and their files are not orphans."""
+        upload = start_upload(self.user, "big.jpg", 100)
+        self.assertIn("3 orphaned file(s)", self.gc("--dry-run"))
+        self.assertIn("0 expired upload(s)", self.gc())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            output = self.gc("--upload-expiry=-1")
+        self.assertIn("1 expired upload(s) deleted", output)
+        self.assertFalse(ChunkedUpload.objects.filter(pk=upload.pk).exists())
+        self.assertFalse(os.path.exists(upload_path(upload.pk)))
+
+    def test_unreferenced_blobs_are_collected_with_their_file(self):
+        """Test a content-addressed file whose blob dropped to zero references is deleted with its blob."""
+        MediaBlob.objects.filter(name="cas/ab/cd/abcd.png").update(ref_count=0)
+        self.assertIn("130 byte(s) reclaimed", self.gc())
+        self.assertNotIn("cas/ab/cd/abcd.png", self.remaining())
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_content_referenced_again_after_the_scan_is_kept(self):
+        """Test a content-addressed file an upload took a reference to after the scan is neither deleted nor its blob."""
+        with mock.patch(
+            "ReachOut2Me.management.commands.gc_media.orphan_batches",
+            return_value=[[("cas/ab/cd/abcd.png", 3)]],
+        ):
+            self.assertIn("0 orphaned file(s)", self.gc())
+        self.assertIn("cas/ab/cd/abcd.png", self.remaining())
+        self.assertEqual(MediaBlob.objects.get().ref_count, 1)
@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+import numpy as np
+from django.test import TestCase
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from django.utils import timezone
+from ..follows import follow, unfollow
+from ..graph import FollowGraph, CURRENT, load_snapshot
+from ..models import FollowEvent
+
+
+class FollowGraphTestCase(TestCase):
+    """This class defines the test suite for the in-memory follow graph."""
+
+    def setUp(self):
+        """Define the users and follows of the graph."""
+        self.users = [User.objects.create_user(username="user%d" % i, password="testpasswordForMe") for i in range(5)]
+        self.a, self.b, self.c, self.d, self.e = [user.id for user in self.users]
+        for follower, followed in [(self.a, self.b), (self.a, self.c), (self.b, self.a), (self.b, self.d), (self.c, self.d), (self.d, self.e)]:
+            follow(follower, followed)
+
+    def assertUsers(self, ids, expected):
+        self.assertEqual(list(ids), sorted(expected))
+
+    def test_neighbor_and_intersection_queries(self):
+        """Test the graph built from the follow table answers neighbor and intersection queries."""
+        graph = FollowGraph.build()
+        self.assertEqual(graph.following(self.a).dtype, np.int32)
+        self.assertUsers(graph.following(self.a), [self.b, self.c])
+        self.assertUsers(graph.followers(self.d), [self.b, self.c])
+        self.assertUsers(graph.mutual_follows(self.a), [self.b])
+        self.assertUsers(graph.common_followers(self.b, self.c), [self.a])
+        self.assertUsers(graph.common_following(self.b, self.c), [self.d])
+        self.assertUsers(graph.following(10 ** 6), [])
+
+    def test_k_hop(self):
+        """Test the k-hop query returns the users first reached after exactly k follows."""
+        graph = FollowGraph.build()
+        self.assertUsers(graph.k_hop(self.a, 1), [self.b, self.c])
+        self.assertUsers(graph.k_hop(self.a, 2), [self.d])
+        self.assertUsers(graph.k_hop(self.a, 3), [self.e])
+        self.assertUsers(graph.k_hop(self.e, 2, followers=True), [self.b, self.c])
+
+    def test_refresh_replays_follow_events(self):
+        """Test follows and unfollows made after the build are replayed, then merged by compaction."""
+        graph = FollowGraph.build()
+        follow(self.e, self.a)
+        unfollow(self.a, self.c)
+        follow(self.a, self.c)
+        unfollow(self.a, self.b)
+        self.assertEqual(graph.refresh(), 4)
+        self.assertEqual(graph.refresh(), 0)
+        self.assertUsers(graph.following(self.a), [self.c])
+        self.assertUsers(graph.followers(self.a), [self.b, self.e])
+        self.assertUsers(graph.k_hop(self.e, 2), [self.c])
+
+        graph.compact()
+        self.assertEqual(graph.following_edges.pending, 0)
+        self.assertUsers(graph.following(self.a), [self.c])
+        self.assertUsers(graph.followers(self.a), [self.b, self.e])
+
+    def test_refresh_replays_events_committed_out_of_order(self):
+        """Test an event committed after a later one was replayed is still applied."""
+        graph = FollowGraph.build()
+        follow(self.e, self.a)
+        # as if the event with the next id had committed and been replayed first
+        graph.last_event_id = FollowEvent.objects.latest("id").id + 1
+        self.assertEqual(graph.refresh(), 0)
+        self.assertUsers(graph.followers(self.a), [self.b, self.e])
+
+    def test_deleted_user_is_removed_from_the_graph(self):
+        """Test deleting a user logs the removal of its follows."""
+        graph = FollowGraph.build()
+        self.users[3].delete()
+        graph.refresh()
+        self.assertUsers(graph.following(self.b), [self.a])
+        self.assertUsers(graph.followers(self.e), [])
+
+    def test_snapshot_is_memory_mapped(self):
+        """Test the snapshot command writes arrays that load memory-mapped and catch up with new events."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        call_command("build_follow_graph", "--output", directory, stdout=StringIO())
+        follow(self.e, self.a)
+
+        graph = load_snapshot(directory)
+        self.assertIsInstance(graph.following_edges.csr.targets, np.memmap)
+        self.assertUsers(graph.followers(self.a), [self.b])
+        graph.refresh()
+        self.assertUsers(graph.followers(self.a), [self.b, self.e])
+
+        # the previous snapshot is kept for the workers loading it, the older ones are removed
+        first = os.readlink(os.path.join(directory, CURRENT))
+        call_command("build_follow_graph", "--output", directory, stdout=StringIO())
+        second = os.readlink(os.path.join(directory, CURRENT))
+        call_command("build_follow_graph", "--output", directory, stdout=StringIO())
+        self.assertFalse(os.path.exists(os.path.join(directory, first)))
+        self.assertTrue(os.path.exists(os.path.join(directory, second)))
+        self.assertUsers(load_snapshot(directory).followers(self.a), [self.b, self.e])
+
+    def test_prune_follow_events(self):
+        """Test the prune command deletes the old follow events without a snapshot."""
+        FollowEvent.objects.filter(follower_id=self.a).update(created_at=timezone.now() - timedelta(days=30))
+        out = StringIO()
+        call_command("prune_follow_events", "--keep-days", "7", stdout=out)
+        self.assertIn("2 old event(s) deleted", out.getvalue())
+        self.assertFalse(FollowEvent.objects.filter(follower_id=self.a).exists())
+        self.assertEqual(FollowEvent.objects.count(), 4)
@@ -0,0 +1,159 @@
+import io
+import os
+import shutil
+import tempfile
+
+from PIL import Image
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APIClient
+from rest_framework import status
+from django.urls import reverse
+from django.contrib.auth.models import User
+from ..models import Post
+from ..images import describe_image, render_variants
+from rest_framework.authtoken.models import Token
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_image(size=(2000, 1000), image_format="JPEG", mode="RGB", orientation=None):
+    data = io.BytesIO()
+    image = Image.new(mode, size, "red")
+    exif = Image.Exif()
+    # the camera model tag, which must not survive in the variants
+    exif[0x0110] = "Test camera"
+    if orientation is not None:
+        exif[0x0112] = orientation
+    image.save(data, image_format, exif=exif)
+    return data.getvalue()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_PROCESSING_EAGER=True)
+class ImageVariantsTestCase(TestCase):
+    """This class defines the test suite for the resized image variants."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        """Define the test client and other test variables."""
+        self.user = User.objects.create_user(username="testuser", password="testpasswordForMe")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=self.user).key)
+
+    def test_render_variants_resizes_and_strips_metadata(self):
+        """Test each variant fits its size, keeps the aspect ratio and has no EXIF data."""
+        os.makedirs(os.path.join(MEDIA_ROOT, "post_images"), exist_ok=True)
+        with open(os.path.join(MEDIA_ROOT, "post_images", "photo.jpg"), "wb") as file:
+            file.write(make_image())
+        variants = render_variants(MEDIA_ROOT, "post_images/photo.jpg")
+        self.assertEqual((variants["thumb"]["width"], variants["thumb"]["height"]), (150, 75))
+        self.assertEqual(variants["large"]["webp"], "post_images/variants/photo.jpg/large.webp")
+        for variant in ("thumb", "medium", "large"):
+            for extension in ("webp", "jpeg"):
+                with Image.open(os.path.join(MEDIA_ROOT, variants[variant][extension])) as image:
+                    self.assertEqual(image.format, extension.upper())
+                    self.assertEqual(len(image.getexif()), 0)
+
+    def test_small_transparent_image_is_not_enlarged(self):
+        """Test an image smaller than a variant keeps its size and loses its transparency."""
+        os.makedirs(os.path.join(MEDIA_ROOT, "message_images"), exist_ok=True)
+        with open(os.path.join(MEDIA_ROOT, "message_images", "icon.png"), "wb") as file:
+            file.write(make_image(size=(100, 40), image_format="PNG", mode="RGBA"))
+        variants = render_variants(MEDIA_ROOT, "message_images/icon.png")
+        self.assertEqual((variants["large"]["width"], variants["large"]["height"]), (100, 40))
+
+    def test_post_image_has_srcset(self):
+        """Test the api returns the variant urls of an uploaded post image."""
+        upload = SimpleUploadedFile("holiday.jpg", make_image(), content_type="image/jpeg")
+        response = self.client.post(reverse("post_list_create"), data={"content": "look", "image": upload}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        post = Post.objects.get(pk=response.data["id"])
+        self.assertEqual(post.image_variants["source"], post.image.name)
+
+        response = self.client.get(reverse("post_detail", kwargs={"pk": post.pk}))
+        srcset = response.data["image_srcset"]
+        self.assertEqual(set(srcset), {"thumb", "medium", "large"})
+        self.assertTrue(srcset["thumb"]["webp"].startswith("http://testserver/media/cas/"))
+        self.assertEqual(srcset["medium"]["width"], 600)
+
+    def test_post_without_image_has_no_srcset(self):
+        """Test a post without an image has no variants."""
+        response = self.client.post(reverse("post_list_create"), data={"content": "just text"})
+        self.assertIsNone(response.data["image_srcset"])
+        self.assertEqual(Post.objects.get(pk=response.data["id"]).image_variants, {})
+
+    def test_avatar_has_square_variants_with_immutable_urls(self):
+        """Test an uploaded avatar gets square variants served with immutable cache headers."""
+        upload = SimpleUploadedFile("me.jpg", make_image(size=(400, 300)), content_type="image/jpeg")
+        response = self.client.put(reverse("user_avatar"), data={"avatar": upload}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(reverse("search_user", kwargs={"username": "testuser"}))
+        srcset = response.data["avatar_srcset"]
+        self.assertEqual(
+            {name: (variant["width"], variant["height"]) for name, variant in srcset.items()},
+            {"small": (48, 48), "medium": (96, 96), "large": (256, 256)},
+        )
+        self.assertNotIn("avatar_variants", response.data)
+
+        url = srcset["small"]["webp"].replace("http://testserver", "")
+        self.assertRegex(url, r"^/media/cas/[0-9a-f]{2}/[0-9a-f]{2}/variants/[0-9a-f]{64}\.jpg/avatar-48\.webp$")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        with Image.open(io.BytesIO(b"".join(response.streaming_content))) as image:
+            self.assertEqual(image.size, (48, 48))
+
+    def test_describe_image_reports_upright_size_and_placeholder(self):
+        """Test the metadata has the rotated size, the file size, the dominant color and a placeholder."""
+        os.makedirs(os.path.join(MEDIA_ROOT, "post_images"), exist_ok=True)
+        path = os.path.join(MEDIA_ROOT, "post_images", "rotated.jpg")
+        with open(path, "wb") as file:
+            file.write(make_image(size=(800, 400), orientation=6))
+        meta = describe_image(MEDIA_ROOT, "post_images/rotated.jpg", render_variants(MEDIA_ROOT, "post_images/rotated.jpg"))
+        self.assertEqual((meta["width"], meta["height"]), (400, 800))
+        self.assertEqual(meta["bytes"], os.path.getsize(path))
+        red, green, blue = (int(meta["dominant_color"][i:i + 2], 16) for i in (1, 3, 5))
+        self.assertGreater(red, 240)
+        self.assertLess(max(green, blue), 16)
+        self.assertTrue(meta["placeholder"].startswith("data:image/webp;base64,"))
+        self.assertLess(len(meta["placeholder"]), 1000)
+
+    def test_post_image_meta_is_returned_without_reading_the_file(self):
+        """Test the api returns the stored metadata of a post image even once the file is gone."""
+        upload = SimpleUploadedFile("beach.jpg", make_image(size=(1000, 500)), content_type="image/jpeg")
+        response = self.client.post(reverse("post_list_create"), data={"content": "sea", "image": upload}, format="multipart")
+        post = Post.objects.get(pk=response.data["id"])
+        self.assertEqual(post.image_meta["source"], post.image.name)
+        os.rename(post.image.path, post.image.path + ".moved")
+        try:
+            response = self.client.get(reverse("post_detail", kwargs={"pk": post.pk}))
+        finally:
+            os.rename(post.image.path + ".moved", post.image.path)
+        meta = response.data["image_meta"]
+        self.assertEqual((meta["width"], meta["height"]), (1000, 500))
+        self.assertNotIn("source", meta)
+
+    def test_backfill_image_meta(self):
+        """Test the backfill command computes the metadata of images stored before it existed."""
+        upload = SimpleUploadedFile("old.jpg", make_image(size=(300, 200)), content_type="image/jpeg")
+        response = self.client.post(reverse("post_list_create"), data={"content": "old", "image": upload}, format="multipart")
+        Post.objects.filter(pk=response.data["id"]).update(image_variants={}, image_meta={})
+        Post.objects.create(user=self.user, content="no image")
+        # the post is cached without its metadata
+        self.client.get(reverse("post_detail", kwargs={"pk": response.data["id"]}))
+
+        output = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("backfill_image_meta", stdout=output)
+        self.assertIn("1 image(s) processed, 0 failed", output.getvalue())
+        post = Post.objects.get(pk=response.data["id"])
+        self.assertEqual((post.image_meta["width"], post.image_meta["height"]), (300, 200))
+        self.assertEqual(post.image_variants["source"], post.image.name)
+        detail = self.client.get(reverse("post_detail", kwargs={"pk": post.pk}))
+        self.assertEqual(detail.data["image_meta"]["width"], 300)
@@ -0,0 +1,86 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework import status
+from django.urls import reverse
+from django.contrib.auth.models import User
+from ..models import Post, Comment, CommentReply, CommentReplyLike
+from rest_framework.authtoken.models import Token
+
+
+class LikeTestCase(TestCase):
+    """This class defines the test suite for likes on posts, comments and replies."""
+
+    def setUp(self):
+        """Define the test client and other test variables."""
+        self.user = User.objects.create_user(username="testuser", password="testpasswordForMe")
+        self.likers = [User.objects.create_user(username="liker%d" % i, password="testpasswordForMe") for i in range(3)]
+        self.post = Post.objects.create(user=self.user, content="test content")
+        self.comment = Comment.objects.create(user=self.user, post=self.post, content="test comment")
+        self.reply = CommentReply.objects.create(user=self.user, comment=self.comment, reply="test reply")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=self.user).key)
+
+    def test_list_post_likers(self):
+        """Test the likers of a post are listed newest first, one page at a time."""
+        for liker in self.likers:
+            self.post.likes.add(liker)
+        response = self.client.get(reverse("post_likers", kwargs={"pk": self.post.id}) + "?page_size=2")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([liker["username"] for liker in response.data["results"]], ["liker2", "liker1"])
+        response = self.client.get(response.data["next"])
+        self.assertEqual([liker["username"] for liker in response.data["results"]], ["liker0"])
+        self.assertIsNone(response.data["next"])
+
+    def test_list_comment_and_reply_likers(self):
+        """Test the likers of comments and replies are listed."""
+        self.comment.likes.add(self.likers[0])
+        CommentReplyLike.objects.create(user=self.likers[1], comment_reply=self.reply)
+        response = self.client.get(reverse("comment_likers", kwargs={"comment_id": self.comment.id}))
+        self.assertEqual(response.data["results"][0]["id"], self.likers[0].id)
+        response = self.client.get(reverse("comment_reply_likers", kwargs={"comment_reply_id": self.reply.id}))
+        self.assertEqual(response.data["results"][0]["username"], "liker1")
+
+    def test_likers_of_missing_post(self):
+        """Test listing the likers of a post that does not exist returns 404."""
+        response = self.client.get(reverse("post_likers", kwargs={"pk": 999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_put_and_delete_post_like_are_idempotent(self):
+        """Test liking twice and unliking twice leave one and then zero likes."""
+        url = reverse("post_like", kwargs={"pk": self.post.id})
+        for _ in range(2):
+            response = self.client.put(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data["post"]["like_count"], 1)
+        self.assertEqual(self.post.likes.count(), 1)
+        for _ in range(2):
+            response = self.client.delete(url)
+            self.assertEqual(response.data["post"]["like_count"], 0)
+        self.assertEqual(self.post.likes.count(), 0)
+
+    def test_like_cost_does_not_depend_on_likers(self):
+        """Test liking a post runs the same queries whether it has one liker or many."""
+        url = reverse("post_like", kwargs={"pk": self.post.id})
+        other = Post.objects.create(user=self.user, content="popular post")
+        for i in range(30):
+            other.likes.add(User.objects.create_user(username="fan%d" % i, password="testpasswordForMe"))
+        # the first like warms the content type cache used by the notification
+        self.client.put(reverse("post_like", kwargs={"pk": Post.objects.create(user=self.user, content="warm up").id}))
+        with CaptureQueriesContext(connection) as quiet:
+            self.client.put(url)
+        with CaptureQueriesContext(connection) as popular:
+            self.client.put(reverse("post_like", kwargs={"pk": other.id}))
+        self.assertEqual(len(quiet), len(popular))
+
+    def test_comment_reply_like_put_and_delete(self):
+        """Test the comment reply like endpoint accepts repeated PUT and DELETE."""
+        url = reverse("comment_reply_like", kwargs={"comment_reply_id": self.reply.id})
+        self.assertEqual(self.client.put(url).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.client.put(url).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_200_OK)
+        self.reply.refresh_from_db()
+        self.assertEqual(self.reply.like_count, 0)
@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+from django.utils.http import http_date
+
+MEDIA_ROOT = tempfile.mkdtemp()
+CONTENT = bytes(range(256)) * 40
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ServeMediaTestCase(TestCase):
+    """This class defines the test suite for serving media files."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for name in ("cas/ab/cd/abcd.jpg", "avatars/old.jpg", "avatars/my photo é.jpg", ".uploads/partial"):
+            os.makedirs(os.path.dirname(os.path.join(MEDIA_ROOT, name)), exist_ok=True)
+            with open(os.path.join(MEDIA_ROOT, name), "wb") as file:
+                file.write(CONTENT)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def test_file_is_served_with_validators(self):
+        """Test a media file is streamed with its ETag, Last-Modified and cache headers."""
+        response = self.client.get("/media/cas/ab/cd/abcd.jpg")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), CONTENT)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertTrue(response["ETag"].startswith('"'))
+        response = self.client.get("/media/avatars/old.jpg")
+        self.assertEqual(response["Cache-Control"], "public, max-age=3600")
+
+    def test_conditional_get_is_answered_with_304(self):
+        """Test a revalidation with a matching ETag or date gets an empty 304."""
+        etag = self.client.get("/media/avatars/old.jpg")["ETag"]
+        response = self.client.get("/media/avatars/old.jpg", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        mtime = os.path.getmtime(os.path.join(MEDIA_ROOT, "avatars/old.jpg"))
+        response = self.client.get("/media/avatars/old.jpg", HTTP_IF_MODIFIED_SINCE=http_date(mtime))
+        self.assertEqual(response.status_code, 304)
+
+    def test_range_requests(self):
+        """Test single byte ranges are answered with 206 and ranges outside the file with 416."""
+        response = self.client.get("/media/avatars/old.jpg", HTTP_RANGE="bytes=100-199")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 100-199/%d" % len(CONTENT))
+        self.assertEqual(response["Content-Length"], "100")
+        self.assertEqual(b"".join(response.streaming_content), CONTENT[100:200])
+
+        response = self.client.get("/media/avatars/old.jpg", HTTP_RANGE="bytes=-10")
+        self.assertEqual(b"".join(response.streaming_content), CONTENT[-10:])
+
+        response = self.client.get("/media/avatars/old.jpg", HTTP_RANGE="bytes=%d-" % len(CONTENT))
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */%d" % len(CONTENT))
+
+        # the range is ignored once the file changed from the version named by If-Range
+        response = self.client.get("/media/avatars/old.jpg", HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_hidden_and_missing_files_are_not_served(self):
+        """Test unfinished uploads, missing files and paths outside MEDIA_ROOT give 404."""
+        self.assertEqual(self.client.get("/media/.uploads/partial").status_code, 404)
+        self.assertEqual(self.client.get("/media/avatars/missing.jpg").status_code, 404)
+        self.assertEqual(self.client.get("/media/avatars").status_code, 404)
+        self.assertEqual(self.client.get("/media/avatars/..%2F..%2Fetc%2Fpasswd").status_code, 404)
+
+    @override_settings(MEDIA_SERVE_MODE="x-accel-redirect")
+    def test_front_proxy_sends_the_file(self):
+        """Test the x-accel-redirect mode leaves the body to the proxy."""
+        response = self.client.get("/media/cas/ab/cd/abcd.jpg")
+        self.assertEqual(response["X-Accel-Redirect"], "/protected-media/cas/ab/cd/abcd.jpg")
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        # names the proxy would decode differently are percent-encoded
+        response = self.client.get("/media/avatars/my%20photo%20%C3%A9.jpg")
+        self.assertEqual(response["X-Accel-Redirect"], "/protected-media/avatars/my%20photo%20%C3%A9.jpg")
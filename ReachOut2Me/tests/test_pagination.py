@@ -0,0 +1,47 @@
+from unittest import mock
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+from django.urls import reverse
+from django.contrib.auth.models import User
+from ..models import Post
+from ..pagination import KeysetPagination
+from rest_framework.authtoken.models import Token
+
+
+class PaginationTestCase(TestCase):
+    """This class defines the test suite for the keyset pagination of list endpoints."""
+
+    def setUp(self):
+        """Define the test client and other test variables."""
+        self.url = reverse("post_list_create")
+        self.user = User.objects.create_user(username="testuser", password="testpasswordForMe")
+        self.posts = [Post.objects.create(user=self.user, content="post %d" % i) for i in range(5)]
+        # give two posts the same creation time so the id has to break the tie
+        Post.objects.filter(id__in=[self.posts[1].id, self.posts[2].id]).update(created_at=self.posts[1].created_at)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=self.user).key)
+
+    def test_walk_pages_with_cursor(self):
+        """Test following the next links returns every post once, newest first."""
+        contents = []
+        url = self.url + "?page_size=2"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data["results"]), 2)
+            contents += [post["content"] for post in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(contents, ["post 4", "post 3", "post 2", "post 1", "post 0"])
+
+    def test_page_size_is_capped(self):
+        """Test the page size cannot go over the configured maximum."""
+        with mock.patch.object(KeysetPagination, "max_page_size", 3):
+            response = self.client.get(self.url + "?page_size=1000")
+        self.assertEqual(len(response.data["results"]), 3)
+        self.assertIsNotNone(response.data["next"])
+
+    def test_invalid_cursor(self):
+        """Test a tampered cursor is rejected."""
+        response = self.client.get(self.url + "?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -29,7 +29,7 @@ class PostTestCase(TestCase):
         """Test the api can get all posts."""
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data["results"]), 1)
 
     def test_create_post(self):
         """Test the api can create a post."""
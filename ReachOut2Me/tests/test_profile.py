@@ -4,6 +4,7 @@ from rest_framework import status
 from django.urls import reverse
 from django.contrib.auth.models import User
 from ..models import UserProfile
+from ..serializers import UserProfileSerializer
 from rest_framework.authtoken.models import Token
 
 
@@ -53,6 +54,18 @@ class ProfileTestCase(TestCase):
         self.assertEqual(response.data["country"], "france")
         self.assertEqual(response.data["user"], self.user.id)
 
+    def test_update_keeps_follow_counts(self):
+        """Test a profile update does not write back the follow counts read before a follow."""
+        profile = UserProfile.objects.get(user=self.user)
+        serializer = UserProfileSerializer(profile, data={"bio": "test bio"}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        # a follow counted while the update is being made
+        UserProfile.objects.filter(pk=profile.pk).update(follower_count=1)
+        serializer.save()
+        profile.refresh_from_db()
+        self.assertEqual(profile.bio, "test bio")
+        self.assertEqual(profile.follower_count, 1)
+
     def test_get_user_account(self):
         """Test the api can get user account."""
         response = self.client.get(reverse("get_user_profile"))
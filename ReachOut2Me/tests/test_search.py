@@ -0,0 +1,68 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+from django.urls import reverse
+from django.contrib.auth.models import User
+from ..models import Post
+from rest_framework.authtoken.models import Token
+
+
+class SearchPostsTestCase(TestCase):
+    """This class defines the test suite for the full-text search of posts."""
+
+    def setUp(self):
+        """Define the test client and other test variables."""
+        self.url = reverse("search_posts")
+        self.user = User.objects.create_user(username="testuser", password="testpasswordForMe")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=self.user).key)
+
+    def search(self, query, **params):
+        response = self.client.get(self.url, dict(params, q=query))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post["content"] for post in response.data["results"]]
+
+    def test_search_finds_posts_with_every_word(self):
+        """Test the api can find the posts containing all the searched words, best match first."""
+        Post.objects.create(user=self.user, content="Sunny day at the beach")
+        Post.objects.create(user=self.user, content="Beach beach beach, sunny beach")
+        Post.objects.create(user=self.user, content="Rainy day at home")
+        self.assertEqual(self.search("sunny BEACH"), ["Beach beach beach, sunny beach", "Sunny day at the beach"])
+        self.assertEqual(self.search("snow"), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        """Test edited and deleted posts are found by their current content only."""
+        post = Post.objects.create(user=self.user, content="first draft")
+        post.content = "final version"
+        post.save()
+        self.assertEqual(self.search("draft"), [])
+        self.assertEqual(self.search("final"), ["final version"])
+        # counter updates do not touch the index
+        Post.objects.filter(pk=post.pk).update(like_count=3)
+        self.assertEqual(self.search("version"), ["final version"])
+        post.delete()
+        self.assertEqual(self.search("final"), [])
+
+    def test_search_syntax_is_not_interpreted(self):
+        """Test quotes and operators in the search text are treated as plain words."""
+        Post.objects.create(user=self.user, content="cats AND dogs")
+        self.assertEqual(self.search('"cats" OR NOT* dogs'), [])
+        self.assertEqual(self.search('cats" dogs'), ["cats AND dogs"])
+
+    def test_search_is_cursor_paginated(self):
+        """Test the matches are split in pages that follow each other."""
+        for i in range(5):
+            Post.objects.create(user=self.user, content="match number %d" % i)
+        response = self.client.get(self.url, {"q": "match", "page_size": 3})
+        first = [post["content"] for post in response.data["results"]]
+        response = self.client.get(response.data["next"])
+        second = [post["content"] for post in response.data["results"]]
+        self.assertIsNone(response.data["next"])
+        self.assertEqual(sorted(first + second), ["match number %d" % i for i in range(5)])
+
+    def test_search_needs_a_query(self):
+        """Test a search without text is refused and a bad cursor is not found."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {"q": "x", "cursor": "bad"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,119 @@
+import io
+import os
+import shutil
+import tempfile
+
+from PIL import Image
+from django.test import TestCase, override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APIClient
+from rest_framework import status
+from django.urls import reverse
+from django.contrib.auth.models import User
+from ..models import Post, MediaBlob, UserProfile
+from rest_framework.authtoken.models import Token
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_bytes(color="red"):
+    data = io.BytesIO()
+    Image.new("RGB", (40, 30), color).save(data, "PNG")
+    return data.getvalue()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_PROCESSING_EAGER=True)
+class ContentAddressedStorageTestCase(TestCase):
+    """This class defines the test suite for the deduplicated media storage."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        """Define the test client and other test variables."""
+        self.user = User.objects.create_user(username="testuser", password="testpasswordForMe")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=self.user).key)
+
+    def upload_post(self, filename, content):
+        upload = SimpleUploadedFile(filename, content, content_type="image/png")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("post_list_create"), data={"content": "meme", "image": upload}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Post.objects.get(pk=response.data["id"])
+
+    def delete_post(self, post):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(reverse("post_detail", kwargs={"pk": post.pk}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_same_content_is_stored_once(self):
+        """Test the same image uploaded under different names is one file with two references."""
+        first = self.upload_post("meme.png", image_bytes())
+        second = self.upload_post("copy of meme.PNG", image_bytes())
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.startswith("cas/"))
+        self.assertTrue(first.image.name.endswith(".png"))
+        self.assertEqual(MediaBlob.objects.get().ref_count, 2)
+        other = self.upload_post("other.png", image_bytes("blue"))
+        self.assertNotEqual(other.image.name, first.image.name)
+        self.assertEqual(MediaBlob.objects.count(), 2)
+
+    def test_shared_file_outlives_its_first_post(self):
+        """Test deleting one of the posts sharing a file keeps the file for the other."""
+        first = self.upload_post("meme.png", image_bytes())
+        second = self.upload_post("meme.png", image_bytes())
+        path = first.image.path
+        variants = os.path.join(MEDIA_ROOT, os.path.dirname(first.image_variants["thumb"]["jpeg"]))
+
+        self.delete_post(first)
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(MediaBlob.objects.get().ref_count, 1)
+
+        self.delete_post(second)
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(variants))
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_upload_reuses_a_blob_inserted_concurrently(self):
+        """Test an upload finding the blob of its content already inserted by another upload stores the file once."""
+        first = self.upload_post("meme.png", image_bytes())
+        blob = MediaBlob.objects.get()
+        os.remove(first.image.path)
+        first.delete()
+        MediaBlob.objects.filter(pk=blob.pk).update(ref_count=0)
+
+        second = self.upload_post("meme.png", image_bytes())
+        self.assertEqual(second.image.name, blob.name)
+        self.assertTrue(os.path.exists(second.image.path))
+        self.assertEqual(MediaBlob.objects.get().ref_count, 1)
+
+    def test_file_referenced_again_before_its_release_commits_is_kept(self):
+        """Test an upload of the same content taking a reference before the last release commits keeps the file."""
+        post = self.upload_post("meme.png", image_bytes())
+        path = post.image.path
+        with self.captureOnCommitCallbacks() as releases:
+            self.client.delete(reverse("post_detail", kwargs={"pk": post.pk}))
+        with self.captureOnCommitCallbacks() as removals:
+            for callback in releases:
+                callback()
+        self.assertEqual(MediaBlob.objects.get().ref_count, 0)
+
+        self.upload_post("meme.png", image_bytes())
+        for callback in removals:
+            callback()
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(MediaBlob.objects.get().ref_count, 1)
+
+    def test_replaced_avatar_is_released(self):
+        """Test uploading a new avatar releases the previous file."""
+        for color in ("red", "green"):
+            upload = SimpleUploadedFile("avatar.png", image_bytes(color), content_type="image/png")
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.put(reverse("user_avatar"), data={"avatar": upload}, format="multipart")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        blob = MediaBlob.objects.get()
+        self.assertEqual(UserProfile.objects.get(user=self.user).avatar.name, blob.name)
+        self.assertEqual(blob.ref_count, 1)
@@ -0,0 +1,90 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from ..models import Follow, FollowSuggestion
+from ..suggestions import compute_suggestions
+
+
+class FollowSuggestionsTestCase(TestCase):
+    """This class defines the test suite for the follow suggestions job and endpoint."""
+
+    def setUp(self):
+        """Define the test client and a small follow graph."""
+        self.users = {
+            name: User.objects.create_user(username=name, password="testpasswordForMe")
+            for name in ["fan", "alice", "bob", "carol", "dave", "erin", "frank"]
+        }
+        edges = [
+            ("fan", "alice"), ("fan", "bob"), ("fan", "dave"),
+            # carol is followed by two of the users fan follows
+            ("alice", "carol"), ("bob", "carol"),
+            # dave is already followed by fan and fan is the user, so neither is suggested
+            ("alice", "dave"), ("alice", "fan"),
+            # erin and frank are followed by one each, frank more recently
+            ("bob", "erin"), ("alice", "frank"),
+        ]
+        for follower, following in edges:
+            Follow.objects.create(follower=self.users[follower], following=self.users[following])
+        Follow.objects.filter(following=self.users["erin"]).update(created_at=timezone.now() - timedelta(days=365))
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=self.users["fan"]).key)
+
+    def suggested(self, name):
+        return list(
+            FollowSuggestion.objects.filter(user=self.users[name]).order_by("rank").values_list("suggested__username", flat=True)
+        )
+
+    def test_job_ranks_friends_of_friends_by_overlap_and_recency(self):
+        """Test the job suggests the followed users' follows, most shared first and more recent first, without the user's own follows."""
+        compute_suggestions(workers=1)
+        self.assertEqual(self.suggested("fan"), ["carol", "frank", "erin"])
+        # alice follows fan, who follows alice, dave, already followed by alice, and bob
+        self.assertEqual(self.suggested("alice"), ["bob"])
+        # carol follows nobody
+        self.assertEqual(self.suggested("carol"), [])
+
+    def test_job_keeps_the_top_suggestions(self):
+        """Test the job stores at most the asked number of suggestions per user and replaces them on the next run."""
+        compute_suggestions(top_k=1, workers=1)
+        self.assertEqual(self.suggested("fan"), ["carol"])
+        Follow.objects.create(follower=self.users["fan"], following=self.users["carol"])
+        compute_suggestions(top_k=1, workers=1)
+        self.assertEqual(self.suggested("fan"), ["frank"])
+
+    def test_parallel_job_matches_the_serial_one(self):
+        """Test scoring the users in chunks on several processes stores the same suggestions."""
+        compute_suggestions(workers=1)
+        expected = list(FollowSuggestion.objects.order_by("user_id", "rank").values_list("user_id", "suggested_id", "rank"))
+        out = StringIO()
+        call_command("compute_suggestions", "--workers", "2", "--chunk-size", "2", stdout=out)
+        self.assertIn(f"{len(expected)} suggestion(s) stored", out.getvalue())
+        self.assertEqual(
+            list(FollowSuggestion.objects.order_by("user_id", "rank").values_list("user_id", "suggested_id", "rank")),
+            expected,
+        )
+
+    def test_api_lists_suggestions(self):
+        """Test the api returns the stored suggestions in rank order, without the users followed since."""
+        compute_suggestions(workers=1)
+        response = self.client.get(reverse("follow_suggestions"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["username"] for item in response.data["results"]], ["carol", "frank", "erin"])
+        self.assertEqual(response.data["results"][0]["id"], self.users["carol"].id)
+
+        self.client.post(reverse("follow_user", kwargs={"user_id": self.users["carol"].id}))
+        response = self.client.get(reverse("follow_suggestions"))
+        self.assertEqual([item["username"] for item in response.data["results"]], ["frank", "erin"])
+
+        response = self.client.get(reverse("follow_suggestions"), {"page_size": 1})
+        self.assertEqual([item["username"] for item in response.data["results"]], ["frank"])
+        response = self.client.get(response.data["next"])
+        self.assertEqual([item["username"] for item in response.data["results"]], ["erin"])
@@ -0,0 +1,74 @@
+from io import StringIO
+
+from django.test import TestCase
+from django.core.management import call_command
+from rest_framework.test import APIClient
+from rest_framework import status
+from django.urls import reverse
+from django.contrib.auth.models import User
+from ..models import Post, PostHashtag, PostMention, Notification
+from ..tags import extract_hashtags, extract_mentions
+from rest_framework.authtoken.models import Token
+
+
+class TagsTestCase(TestCase):
+    """This class defines the test suite for hashtags and mentions."""
+
+    def setUp(self):
+        """Define the test client and other test variables."""
+        self.user = User.objects.create_user(username="testuser", password="testpasswordForMe")
+        self.friend = User.objects.create_user(username="friend", password="testpasswordForMe")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=self.user).key)
+
+    def create_post(self, content):
+        response = self.client.post(reverse("post_list_create"), data={"content": content})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data["id"]
+
+    def tag_posts(self, tag, **params):
+        response = self.client.get(reverse("tag_posts", kwargs={"tag": tag}), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_extraction(self):
+        """Test hashtags are case folded and mentions lose a trailing full stop."""
+        self.assertEqual(extract_hashtags("#Django and #django, a#b &#39; #café"), ["django", "café"])
+        self.assertEqual(extract_mentions("hi @friend. mail me@example.com @friend @a_b"), ["friend", "a_b"])
+        # a tag that only outgrows the stored length once case folded is cut to it
+        self.assertEqual(extract_hashtags("#" + "ß" * 100), ["s" * 100])
+
+    def test_tagged_posts_are_listed_newest_first(self):
+        """Test the api can list the posts of a tag with cursor pagination."""
+        for i in range(3):
+            self.create_post("post %d #Weekend" % i)
+        self.create_post("no tag here")
+        response = self.tag_posts("weekend", page_size=2)
+        self.assertEqual([post["content"] for post in response.data["results"]], ["post 2 #Weekend", "post 1 #Weekend"])
+        response = self.client.get(response.data["next"])
+        self.assertEqual([post["content"] for post in response.data["results"]], ["post 0 #Weekend"])
+        self.assertEqual(self.tag_posts("unknown").data["results"], [])
+
+    def test_edit_updates_tags_without_notifying_twice(self):
+        """Test editing a post re-indexes its tags and only notifies newly mentioned users."""
+        post_id = self.create_post("hello @friend #one")
+        self.assertEqual(Notification.objects.filter(recipient=self.friend, verb="mention").count(), 1)
+        response = self.client.patch(reverse("post_detail", kwargs={"pk": post_id}), data={"content": "hi @friend #two"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.tag_posts("one").data["results"], [])
+        self.assertEqual(len(self.tag_posts("two").data["results"]), 1)
+        self.assertEqual(Notification.objects.filter(recipient=self.friend, verb="mention").count(), 1)
+
+    def test_mentions_skip_author_and_unknown_users(self):
+        """Test only existing users other than the author are mentioned."""
+        post_id = self.create_post("@testuser @nobody @friend")
+        self.assertEqual(list(PostMention.objects.filter(post_id=post_id).values_list("user__username", flat=True)), ["friend"])
+
+    def test_backfill_indexes_existing_posts(self):
+        """Test the backfill command indexes posts written before tags were extracted."""
+        for i in range(5):
+            Post.objects.create(user=self.user, content="old #post %d for @friend" % i)
+        call_command("backfill_tags", chunk_size=2, stdout=StringIO())
+        self.assertEqual(PostHashtag.objects.count(), 5)
+        self.assertEqual(PostMention.objects.count(), 5)
+        self.assertFalse(Notification.objects.filter(verb="mention").exists())
@@ -0,0 +1,70 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+from django.urls import reverse
+from django.contrib.auth.models import User
+from ..models import Post, Comment, CommentReply, LikeCounterShard
+from rest_framework.authtoken.models import Token
+
+
+class ThreadTestCase(TestCase):
+    """This class defines the test suite for the post thread endpoint."""
+
+    def setUp(self):
+        """Define the test client and other test variables."""
+        self.user = User.objects.create_user(username="testuser", password="testpasswordForMe")
+        self.post = Post.objects.create(user=self.user, content="test content")
+        self.url = reverse("post_thread", kwargs={"post_id": self.post.id})
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=self.user).key)
+
+    def add_comments(self, count, replies):
+        for i in range(count):
+            author = User.objects.create_user(username="author%d-%d" % (Comment.objects.count(), i), password="x")
+            comment = Comment.objects.create(user=author, post=self.post, content="comment %d" % i)
+            for j in range(replies):
+                CommentReply.objects.create(user=author, comment=comment, reply="reply %d" % j)
+
+    def test_thread_shows_first_replies_and_next_link(self):
+        """Test each comment carries its newest replies and a link to the rest."""
+        self.add_comments(1, 5)
+        response = self.client.get(self.url + "?replies=2")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        comment = response.data["results"][0]
+        self.assertEqual([reply["reply"] for reply in comment["replies"]], ["reply 4", "reply 3"])
+        self.assertEqual(comment["user"]["username"], comment["replies"][0]["user"]["username"])
+
+        response = self.client.get(comment["replies_next"] + "&page_size=10")
+        self.assertEqual([reply["reply"] for reply in response.data["results"]], ["reply 2", "reply 1", "reply 0"])
+
+    def test_thread_query_count_is_fixed(self):
+        """Test the thread costs the same number of queries for few or many comments."""
+        self.add_comments(2, 1)
+        with self.assertNumQueries(4):
+            self.client.get(self.url)
+        self.add_comments(10, 4)
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data["results"]), 12)
+        self.assertIsNone(response.data["results"][-1]["replies_next"])
+
+    def test_thread_query_count_is_fixed_with_hot_comments(self):
+        """Test the pending likes of every hot comment of the thread are read with one query."""
+        def add_hot_comments(count):
+            self.add_comments(count, 1)
+            for comment in Comment.objects.filter(likes_sharded=False):
+                Comment.objects.filter(pk=comment.pk).update(like_count=1, likes_sharded=True)
+                LikeCounterShard.objects.create(target_type="comment", target_id=comment.pk, shard=0, count=2)
+
+        add_hot_comments(1)
+        with self.assertNumQueries(5):
+            self.client.get(self.url)
+        add_hot_comments(5)
+        with self.assertNumQueries(5):
+            response = self.client.get(self.url)
+        self.assertEqual([comment["like_count"] for comment in response.data["results"]], [3] * 6)
+
+    def test_thread_of_missing_post(self):
+        """Test the thread of a post that does not exist returns 404."""
+        response = self.client.get(reverse("post_thread", kwargs={"post_id": 999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,75 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.test import TestCase
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from django.urls import reverse
+from django.contrib.auth.models import User
+from ..models import Post, PostLike, Comment, CommentReply, TrendingPost
+from ..trending import score_posts
+from rest_framework.authtoken.models import Token
+
+
+class TrendingTestCase(TestCase):
+    """This class defines the test suite for the trending posts ranking."""
+
+    def setUp(self):
+        """Define the test client and other test variables."""
+        self.url = reverse("trending_posts")
+        self.user = User.objects.create_user(username="testuser", password="testpasswordForMe")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=self.user).key)
+
+    def like(self, post, count, hours_ago=0):
+        for i in range(count):
+            liker = User.objects.create_user(username="liker%d-%d" % (post.id, PostLike.objects.count()), password="x")
+            like = PostLike.objects.create(post=post, user=liker)
+            PostLike.objects.filter(pk=like.pk).update(created_at=timezone.now() - timedelta(hours=hours_ago))
+
+    def test_recent_activity_outranks_older_activity(self):
+        """Test the same activity scores less the older it is."""
+        old = Post.objects.create(user=self.user, content="old buzz")
+        new = Post.objects.create(user=self.user, content="new buzz")
+        quiet = Post.objects.create(user=self.user, content="quiet")
+        self.like(old, 4, hours_ago=20)
+        self.like(new, 2)
+        call_command("compute_trending", stdout=StringIO())
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([post["content"] for post in response.data["results"]], ["new buzz", "old buzz"])
+        self.assertFalse(TrendingPost.objects.filter(post=quiet).exists())
+
+    def test_comments_and_replies_count_more_than_likes(self):
+        """Test comments and replies are weighted above likes."""
+        liked = Post.objects.create(user=self.user, content="liked")
+        discussed = Post.objects.create(user=self.user, content="discussed")
+        self.like(liked, 2)
+        comment = Comment.objects.create(user=self.user, post=discussed, content="comment")
+        CommentReply.objects.create(user=self.user, comment=comment, reply="reply")
+        scores, complete = score_posts()
+        self.assertTrue(complete)
+        self.assertGreater(scores[discussed.id], scores[liked.id])
+
+    def test_activity_outside_window_is_ignored(self):
+        """Test interactions older than the window do not rank a post."""
+        post = Post.objects.create(user=self.user, content="stale")
+        self.like(post, 3, hours_ago=100)
+        scores, complete = score_posts(window_hours=48)
+        self.assertNotIn(post.id, scores)
+
+    def test_ranking_is_paginated_by_rank(self):
+        """Test the ranking pages follow each other in rank order with a fixed query count."""
+        for i in range(5):
+            post = Post.objects.create(user=self.user, content="post %d" % i)
+            self.like(post, i + 1)
+        call_command("compute_trending", top=4, stdout=StringIO())
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url + "?page_size=3")
+        self.assertEqual([post["content"] for post in response.data["results"]], ["post 4", "post 3", "post 2"])
+        response = self.client.get(response.data["next"])
+        self.assertEqual([post["content"] for post in response.data["results"]], ["post 1"])
+        self.assertIsNone(response.data["next"])
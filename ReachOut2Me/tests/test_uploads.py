@@ -0,0 +1,162 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework import status
+from django.urls import reverse
+from django.contrib.auth.models import User
+from ..models import Post, Comment, UserProfile, ChunkedUpload
+from ..uploads import append_chunk, upload_path, write_chunk
+from rest_framework.authtoken.models import Token
+from .test_images import make_image
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_PROCESSING_EAGER=True)
+class ChunkedUploadTestCase(TestCase):
+    """This class defines the test suite for the resumable chunked uploads."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        """Define the test client and other test variables."""
+        self.user = User.objects.create_user(username="testuser", password="testpasswordForMe")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=self.user).key)
+        self.image = make_image(size=(640, 480))
+
+    def start(self, size=None):
+        response = self.client.post(
+            reverse("chunked_upload"), data={"filename": "big.jpg", "size": size or len(self.image)}, format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data["id"]
+
+    def put_chunk(self, upload_id, offset, data):
+        return self.client.put(
+            reverse("chunked_upload_detail", kwargs={"upload_id": upload_id}),
+            data=data, content_type="application/octet-stream", HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def upload(self):
+        upload_id = self.start()
+        half = len(self.image) // 2
+        self.put_chunk(upload_id, 0, self.image[:half])
+        self.put_chunk(upload_id, half, self.image[half:])
+        response = self.client.post(reverse("chunked_upload_complete", kwargs={"upload_id": upload_id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return upload_id
+
+    def test_chunks_are_resumed_from_the_stored_offset(self):
+        """Test the api appends chunks at the upload offset and rejects chunks at any other offset."""
+        upload_id = self.start()
+        response = self.put_chunk(upload_id, 0, self.image[:1000])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Upload-Offset"], "1000")
+
+        # the client lost the answer, resends from the start and is told where to resume
+        response = self.put_chunk(upload_id, 0, self.image[:1000])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data["offset"], 1000)
+        response = self.client.get(reverse("chunked_upload_detail", kwargs={"upload_id": upload_id}))
+        self.assertEqual(response.data["offset"], 1000)
+
+        complete_url = reverse("chunked_upload_complete", kwargs={"upload_id": upload_id})
+        self.assertEqual(self.client.post(complete_url).status_code, status.HTTP_409_CONFLICT)
+        self.put_chunk(upload_id, 1000, self.image[1000:])
+        response = self.client.post(complete_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(response.data["completed_at"])
+        with open(upload_path(upload_id), "rb") as file:
+            self.assertEqual(file.read(), self.image)
+
+    def test_racing_chunks_at_the_same_offset_write_once(self):
+        """Test a chunk sent at an offset another chunk already filled does not overwrite its bytes."""
+        upload_id = self.start()
+        first, second = ChunkedUpload.objects.get(pk=upload_id), ChunkedUpload.objects.get(pk=upload_id)
+        # both requests received their chunk at offset 0 before either one was appended
+        first_chunk = write_chunk(first, io.BytesIO(self.image[:1000]), 1000)
+        second_chunk = write_chunk(second, io.BytesIO(b"x" * 1000), 1000)
+        self.assertTrue(append_chunk(first, *first_chunk))
+        self.assertFalse(append_chunk(second, *second_chunk))
+        self.assertEqual(ChunkedUpload.objects.get(pk=upload_id).offset, 1000)
+        with open(upload_path(upload_id), "rb") as file:
+            self.assertEqual(file.read(), self.image[:1000])
+        # the received chunks are removed whether they were appended or not
+        self.assertFalse([name for name in os.listdir(os.path.dirname(upload_path(upload_id))) if name.startswith(".chunk-")])
+
+    def test_upload_must_fit_its_size_and_be_an_image(self):
+        """Test the api rejects chunks past the announced size and uploads that are not images."""
+        upload_id = self.start(size=10)
+        response = self.put_chunk(upload_id, 0, b"x" * 11)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.put_chunk(upload_id, 0, b"x" * 10)
+        response = self.client.post(reverse("chunked_upload_complete", kwargs={"upload_id": upload_id}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_post_is_created_from_an_upload(self):
+        """Test the api attaches a finished upload to a new post and then discards the upload."""
+        upload_id = self.upload()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("post_list_create"), data={"content": "big", "upload_id": upload_id})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        post = Post.objects.get(pk=response.data["id"])
+        self.assertTrue(post.image.name.startswith("cas/"))
+        with post.image.open("rb") as file:
+            self.assertEqual(file.read(), self.image)
+        self.assertEqual(post.image_meta["width"], 640)
+        self.assertFalse(ChunkedUpload.objects.filter(pk=upload_id).exists())
+        self.assertFalse(os.path.exists(upload_path(upload_id)))
+
+    def test_comment_is_created_from_an_upload(self):
+        """Test the api attaches a finished upload to a new comment and then discards the upload."""
+        post = Post.objects.create(user=self.user, content="sea")
+        upload_id = self.upload()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("create-comment", kwargs={"post_id": post.pk}),
+                data={"content": "big", "post": post.pk, "upload_id": upload_id},
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        comment = Comment.objects.get(pk=response.data["id"])
+        self.assertTrue(comment.image.name.startswith("cas/"))
+        with comment.image.open("rb") as file:
+            self.assertEqual(file.read(), self.image)
+        self.assertFalse(ChunkedUpload.objects.filter(pk=upload_id).exists())
+
+    def test_upload_is_not_opened_when_validation_fails(self):
+        """Test the file of an upload is only opened once the request is valid, and stays usable."""
+        upload_id = self.upload()
+        with mock.patch("ReachOut2Me.serializers.open", create=True, side_effect=open) as opened:
+            response = self.client.post(reverse("post_list_create"), data={"content": "x" * 281, "upload_id": upload_id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        opened.assert_not_called()
+        response = self.client.post(reverse("post_list_create"), data={"content": "sea", "upload_id": upload_id})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_avatar_is_set_from_an_upload(self):
+        """Test the api sets the avatar from a finished upload."""
+        upload_id = self.upload()
+        response = self.client.put(reverse("user_avatar"), data={"upload_id": upload_id}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(UserProfile.objects.get(user=self.user).avatar.name.startswith("cas/"))
+
+    def test_upload_of_another_user_cannot_be_attached(self):
+        """Test the api does not let a user attach or read an upload they did not make."""
+        upload_id = self.upload()
+        other = User.objects.create_user(username="other", password="testpasswordForMe")
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=other).key)
+        response = client.post(reverse("post_list_create"), data={"content": "mine", "upload_id": upload_id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("upload_id", response.data)
+        response = client.get(reverse("chunked_upload_detail", kwargs={"upload_id": upload_id}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,107 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework import status
+from django.urls import reverse
+from django.contrib.auth.models import User
+from ..models import Post, Follow
+from rest_framework.authtoken.models import Token
+
+
+class ViewerStateTestCase(TestCase):
+    """This class defines the test suite for the viewer's like and follow flags."""
+
+    def setUp(self):
+        """Define the test client and other test variables."""
+        self.user = User.objects.create_user(username="viewer", password="testpasswordForMe")
+        self.author = User.objects.create_user(username="author", password="testpasswordForMe")
+        self.other = User.objects.create_user(username="other", password="testpasswordForMe")
+        self.liked = Post.objects.create(user=self.author, content="liked post")
+        self.unliked = Post.objects.create(user=self.other, content="unliked post")
+        self.liked.likes.add(self.user)
+        Follow.objects.create(follower=self.user, following=self.author)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=self.user).key)
+
+    def test_viewer_state_endpoint(self):
+        """Test the endpoint returns the liked posts and followed users among the given ids."""
+        url = reverse("viewer_state") + "?posts=%d,%d&users=%d,%d" % (
+            self.liked.id, self.unliked.id, self.author.id, self.other.id)
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["liked_posts"], [self.liked.id])
+        self.assertEqual(response.data["following"], [self.author.id])
+        self.assertEqual(response.data["liked_comments"], [])
+
+    def test_viewer_state_rejects_bad_ids(self):
+        """Test ids that are not numbers are rejected."""
+        response = self.client.get(reverse("viewer_state") + "?posts=1,abc")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_viewer_state_embedded_in_post_list(self):
+        """Test the post list carries the viewer's flags only when asked for them."""
+        response = self.client.get(reverse("post_list_create"))
+        self.assertNotIn("viewer_has_liked", response.data["results"][0])
+        response = self.client.get(reverse("post_list_create") + "?viewer_state=1")
+        flags = {post["id"]: (post["viewer_has_liked"], post["viewer_follows_author"]) for post in response.data["results"]}
+        self.assertEqual(flags, {self.liked.id: (True, True), self.unliked.id: (False, False)})
+
+
+class RelationshipsTestCase(TestCase):
+    """This class defines the test suite for the follow relationship badges."""
+
+    def setUp(self):
+        """Define the test client and users in every relationship to the viewer."""
+        cache.clear()
+        self.user = User.objects.create_user(username="viewer", password="testpasswordForMe")
+        self.followed = User.objects.create_user(username="followed", password="testpasswordForMe")
+        self.follower = User.objects.create_user(username="follower", password="testpasswordForMe")
+        self.friend = User.objects.create_user(username="friend", password="testpasswordForMe")
+        self.stranger = User.objects.create_user(username="stranger", password="testpasswordForMe")
+        Follow.objects.create(follower=self.user, following=self.followed)
+        Follow.objects.create(follower=self.follower, following=self.user)
+        Follow.objects.create(follower=self.user, following=self.friend)
+        Follow.objects.create(follower=self.friend, following=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + Token.objects.create(user=self.user).key)
+        self.url = reverse("relationships") + "?ids=%d,%d,%d,%d" % (
+            self.followed.id, self.follower.id, self.friend.id, self.stranger.id)
+
+    def badges(self, response):
+        return {item["id"]: (item["you_follow"], item["follows_you"], item["mutual"]) for item in response.data}
+
+    def test_relationships_endpoint(self):
+        """Test the endpoint returns both directions of the follows with one query each."""
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["id"] for item in response.data], [self.followed.id, self.follower.id, self.friend.id, self.stranger.id])
+        self.assertEqual(self.badges(response), {
+            self.followed.id: (True, False, False),
+            self.follower.id: (False, True, False),
+            self.friend.id: (True, True, True),
+            self.stranger.id: (False, False, False),
+        })
+
+    def test_relationships_rejects_bad_ids(self):
+        """Test ids that are not numbers and lists over the limit are rejected."""
+        response = self.client.get(reverse("relationships") + "?ids=1,abc")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse("relationships") + "?ids=" + ",".join(map(str, range(1, 202))))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(FOLLOWING_SET_CACHE=True)
+    def test_following_set_cache(self):
+        """Test the cached following set saves a query and is dropped when the user follows someone."""
+        self.client.get(self.url)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(self.badges(response)[self.follower.id], (False, True, False))
+
+        self.client.post(reverse("follow_user", kwargs={"user_id": self.follower.id}))
+        response = self.client.get(self.url)
+        self.assertEqual(self.badges(response)[self.follower.id], (True, True, True))
+        self.client.post(reverse("unfollow_user", kwargs={"user_id": self.followed.id}))
+        response = self.client.get(self.url)
+        self.assertEqual(self.badges(response)[self.followed.id], (False, False, False))
@@ -0,0 +1,106 @@
+import heapq
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .models import Post, PostLike, Comment, CommentReply, TrendingPost
+
+# how far back interactions count towards the trending score
+TRENDING_WINDOW_HOURS = getattr(settings, 'TRENDING_WINDOW_HOURS', 48)
+# the age after which an interaction counts for half as much
+TRENDING_HALF_LIFE_HOURS = getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 6)
+# the number of posts kept in the ranking
+TRENDING_TOP_N = getattr(settings, 'TRENDING_TOP_N', 500)
+# the number of hours aggregated per round of queries, newest first
+TRENDING_SLICE_HOURS = getattr(settings, 'TRENDING_SLICE_HOURS', 6)
+# the time the job may spend aggregating before it ranks what it has
+TRENDING_TIME_BUDGET_SECONDS = getattr(settings, 'TRENDING_TIME_BUDGET_SECONDS', 60)
+# how much one interaction of each kind is worth
+TRENDING_WEIGHTS = getattr(settings, 'TRENDING_WEIGHTS', {'like': 1.0, 'comment': 3.0, 'reply': 2.0})
+
+# every kind of interaction: the rows it is read from and the path from a row to its post
+INTERACTIONS = [
+    ('like', PostLike.objects, 'post_id'),
+    ('comment', Comment.objects, 'post_id'),
+    ('reply', CommentReply.objects, 'comment__post_id'),
+]
+
+
+def hourly_counts(queryset, post_field, start, end):
+    """
+    Count the interactions of each post per hour between `start` and `end`.
+    The database does the grouping, so millions of rows come back as one row per post and hour.
+    """
+    return (
+        queryset.filter(created_at__gte=start, created_at__lt=end)
+        .annotate(hour=TruncHour('created_at'))
+        .values_list(post_field, 'hour')
+        .annotate(count=Count('pk'))
+        .order_by()
+    )
+
+
+def score_posts(now=None, window_hours=TRENDING_WINDOW_HOURS, half_life_hours=TRENDING_HALF_LIFE_HOURS,
+                time_budget=TRENDING_TIME_BUDGET_SECONDS):
+    """
+    Return the time-decayed activity score of every post with interactions in the window,
+    and whether the whole window was read.
+
+    Each interaction adds its weight halved for every `half_life_hours` of age, so the score
+    measures recent velocity. The window is read in slices from the newest hours back, and when
+    the time budget runs out the older slices, which weigh the least, are left out.
+    """
+    now = now or timezone.now()
+    started = time.monotonic()
+    window_start = now - timedelta(hours=window_hours)
+    scores = {}
+    end = now
+    while end > window_start:
+        start = max(end - timedelta(hours=TRENDING_SLICE_HOURS), window_start)
+        for kind, queryset, post_field in INTERACTIONS:
+            weight = TRENDING_WEIGHTS[kind]
+            for post_id, hour, count in hourly_counts(queryset, post_field, start, end).iterator():
+                # the interactions of an hour are taken to be in its middle
+                age_hours = (now - hour).total_seconds() / 3600 - 0.5
+                decay = 0.5 ** (max(age_hours, 0) / half_life_hours)
+                scores[post_id] = scores.get(post_id, 0.0) + weight * count * decay
+        end = start
+        if time.monotonic() - started > time_budget:
+            return scores, end <= window_start
+    return scores, True
+
+
+def write_ranking(scores, top_n=TRENDING_TOP_N, computed_at=None):
+    """
+    Replace the ranking with the `top_n` highest scored posts, in one transaction,
+    so readers see either the previous ranking or the new one.
+    """
+    computed_at = computed_at or timezone.now()
+    top = heapq.nlargest(top_n, scores.items(), key=lambda item: item[1])
+    # posts deleted while the job ran are skipped
+    existing = set(Post.objects.filter(pk__in=[post_id for post_id, score in top]).values_list('pk', flat=True))
+    rows = [
+        TrendingPost(post_id=post_id, rank=rank, score=score, computed_at=computed_at)
+        for rank, (post_id, score) in enumerate(
+            ((post_id, score) for post_id, score in top if post_id in existing), start=1
+        )
+    ]
+    with transaction.atomic():
+        TrendingPost.objects.all().delete()
+        TrendingPost.objects.bulk_create(rows)
+    return rows
+
+
+def compute_trending(top_n=TRENDING_TOP_N, **options):
+    """
+    Score the recent activity and store the new ranking.
+    Returns the ranked rows and whether the whole window fit in the time budget.
+    """
+    now = timezone.now()
+    scores, complete = score_posts(now=now, **options)
+    return write_ranking(scores, top_n=top_n, computed_at=now), complete
@@ -0,0 +1,126 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.http import UnreadablePostError
+from django.utils import timezone
+from PIL import Image
+
+from .media_gc import UPLOADS_DIR
+from .models import ChunkedUpload
+# the largest file a chunked upload can announce, in bytes
+CHUNKED_UPLOAD_MAX_BYTES = getattr(settings, 'CHUNKED_UPLOAD_MAX_BYTES', 50 * 1024 * 1024)
+# the largest chunk accepted by one request, in bytes, so no request holds a worker for long
+CHUNKED_UPLOAD_MAX_CHUNK_BYTES = getattr(settings, 'CHUNKED_UPLOAD_MAX_CHUNK_BYTES', 5 * 1024 * 1024)
+# the number of hours an upload that was never attached is kept for
+CHUNKED_UPLOAD_EXPIRY_HOURS = getattr(settings, 'CHUNKED_UPLOAD_EXPIRY_HOURS', 24)
+# the number of bytes read from the request and written to disk at a time
+READ_SIZE = 64 * 1024
+
+
+def upload_path(upload_id):
+    # the partial file of an upload, named after its id
+    return os.path.join(str(settings.MEDIA_ROOT), UPLOADS_DIR, str(upload_id))
+
+
+def start_upload(user, filename, size):
+    """
+    Create an upload of `size` bytes and its empty file on disk.
+    """
+    upload = ChunkedUpload.objects.create(user=user, filename=os.path.basename(filename), size=size)
+    path = upload_path(upload.pk)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+    return upload
+
+
+def write_chunk(upload, stream, length):
+    """
+    Copy `length` bytes of `stream` into a temporary file next to the file of `upload`,
+    reading a small buffer at a time so memory does not depend on the chunk size.
+
+    Returns the path of the temporary file and the number of bytes written, which is less
+    than `length` when the client went away; those bytes are kept and the client resumes
+    after them once `append_chunk` added them to the upload.
+    """
+    handle, chunk_path = tempfile.mkstemp(dir=os.path.dirname(upload_path(upload.pk)), prefix='.chunk-')
+    written = 0
+    try:
+        with os.fdopen(handle, 'wb') as file:
+            while written < length:
+                data = stream.read(min(READ_SIZE, length - written))
+                if not data:
+                    break
+                file.write(data)
+                written += len(data)
+    except UnreadablePostError:
+        pass
+    except BaseException:
+        os.remove(chunk_path)
+        raise
+    return chunk_path, written
+
+
+def append_chunk(upload, chunk_path, written):
+    """
+    Copy the `written` bytes received in `chunk_path` into the file of `upload` at its offset and
+    move the offset past them, unless another request moved it first, and return whether it did.
+
+    The chunk streams in without holding anything; only the local copy runs under the lock of the
+    upload row, where the offset is checked again, so two chunks sent at the same offset never
+    both write to the file. The temporary file is removed either way.
+    """
+    try:
+        with transaction.atomic():
+            locked = ChunkedUpload.objects.select_for_update().filter(
+                pk=upload.pk, offset=upload.offset, completed_at__isnull=True,
+            ).first()
+            if locked is None:
+                return False
+            with open(chunk_path, 'rb') as chunk, open(upload_path(upload.pk), 'r+b') as file:
+                file.seek(upload.offset)
+                shutil.copyfileobj(chunk, file, READ_SIZE)
+            ChunkedUpload.objects.filter(pk=upload.pk).update(offset=upload.offset + written)
+    finally:
+        os.remove(chunk_path)
+    upload.offset += written
+    return True
+
+
+def complete_upload(upload):
+    """
+    Check the received file is an image and mark the upload as ready to be attached.
+    Raises ValueError when it is not an image Pillow can read.
+    """
+    try:
+        with Image.open(upload_path(upload.pk)) as image:
+            image.verify()
+    except (OSError, SyntaxError) as error:
+        raise ValueError(str(error))
+    upload.completed_at = timezone.now()
+    upload.save(update_fields=['completed_at'])
+
+
+def discard_upload(upload):
+    """
+    Delete an upload, and its file once the current transaction commits.
+    """
+    path = upload_path(upload.pk)
+    upload.delete()
+
+    def remove():
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    transaction.on_commit(remove)
+
+
+def expired_uploads(hours=None):
+    # the uploads started too long ago that were never attached to anything
+    cutoff = timezone.now() - timedelta(hours=CHUNKED_UPLOAD_EXPIRY_HOURS if hours is None else hours)
+    return ChunkedUpload.objects.filter(created_at__lt=cutoff)
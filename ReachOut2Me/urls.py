@@ -1,10 +1,19 @@
 from .endpoints.users import *
 from .endpoints.auth import *
 from django.urls import path
-from .endpoints.posts import PostListCreateView, PostDetailView, PostLikeView, CreateGetComment, UpdateDeleteComment, CommentLike, UpdateDeleteCommentReply, ListCreateCommentReply, CommentReplyLikeView
+from .endpoints.posts import PostListCreateView, PostDetailView, PostLikeView, CreateGetComment, UpdateDeleteComment, CommentLikeView, UpdateDeleteCommentReply, ListCreateCommentReply, CommentReplyLikeView
 from .endpoints.message import send_message, message_list, message_detail
-from .endpoints.followers import follow_user, unfollow_user,followers_list, following_list
+from .endpoints.followers import follow_user, bulk_follow_users, unfollow_user,followers_list, following_list, follow_suggestions
 from .endpoints.notification import list_notifications, delete_notification
+from .endpoints.feed import FeedView
+from .endpoints.likes import PostLikersView, CommentLikersView, CommentReplyLikersView
+from .endpoints.viewer import viewer_state, relationships
+from .endpoints.thread import PostThreadView
+from .endpoints.cache import cache_stats
+from .endpoints.trending import TrendingPostsView
+from .endpoints.search import SearchPostsView
+from .endpoints.tags import TagPostsView
+from .endpoints.uploads import ChunkedUploadView, ChunkedUploadDetailView, CompleteChunkedUploadView
 
 urlpatterns = [
     # get all users
@@ -18,16 +27,28 @@ urlpatterns = [
     # path('avatar/<string:first_name>/<string:last_name>/', UploadAvatarView.as_view(), name='user_avatar'),
     # retrieve a list of posts or create a new post by sending a POST request with the required data in the request body
     path('posts/', PostListCreateView.as_view(), name='post_list_create'),
+    # home timeline with the posts of the accounts the user follows
+    path('feed/', FeedView.as_view(), name='feed'),
+    # the posts with the most recent activity, ranked by the compute_trending job
+    path('posts/trending/', TrendingPostsView.as_view(), name='trending_posts'),
+    # the posts using a hashtag
+    path('tags/<str:tag>/posts/', TagPostsView.as_view(), name='tag_posts'),
     # allows users to retrieve a single post using the GET method and update using PUT method
     path('posts/<int:pk>/', PostDetailView.as_view(), name='post_detail'),
     # allows users to retrieve a single post and like/unlike post using POST method
     path('posts/<int:pk>/like/', PostLikeView.as_view(), name='post_like'),
+    # list the users who liked a post
+    path('posts/<int:pk>/likes/', PostLikersView.as_view(), name='post_likers'),
     # allows users to create and retrieve comment by ID
     path('posts/<int:post_id>/comments/', CreateGetComment.as_view(), name='create-comment'),
+    # the comments of a post with their first replies
+    path('posts/<int:post_id>/thread/', PostThreadView.as_view(), name='post_thread'),
     # allows users to update and delete comment by ID
     path('posts/<int:post_id>/comments/<int:comment_id>/', UpdateDeleteComment.as_view(), name='update-comment'),
     # allows users to like/unlike comment by ID
-    path('comments/<int:comment_id>/like/', CommentLike.as_view(), name='comment_like'),
+    path('comments/<int:comment_id>/like/', CommentLikeView.as_view(), name='comment_like'),
+    # list the users who liked a comment
+    path('comments/<int:comment_id>/likes/', CommentLikersView.as_view(), name='comment_likers'),
     # allows users to reply a comment and view all comment replies
     path('comments/<int:comment_id>/replies/', ListCreateCommentReply.as_view(), name='create_get_comment_reply'),
     # allows users to update and delete reply
@@ -38,6 +59,8 @@ urlpatterns = [
     path('my_account/', GetUserProfile.as_view(), name='get_user_profile'),
     # logout user
     # path('logout/', LogoutView.as_view(), name='logout_user'),
+    # full-text search over the content of the posts
+    path('search/posts/', SearchPostsView.as_view(), name='search_posts'),
     # search for user by username
     path('search/<slug:username>/', SearchUserView.as_view(), name='search_user'),
     # allow users to view all messages
@@ -48,18 +71,36 @@ urlpatterns = [
     path('messages/<int:pk>/detail/', message_detail, name='message_detail'),
     # follow user
     path('user/<int:user_id>/follow/', follow_user, name='follow_user'),
+    # follow several users at once
+    path('user/follow/bulk/', bulk_follow_users, name='bulk_follow_users'),
     # unfollow user
     path('user/<int:user_id>/unfollow/', unfollow_user, name='unfollow_user'),
+    # the users suggested to follow, computed by the compute_suggestions job
+    path('users/suggestions/', follow_suggestions, name='follow_suggestions'),
     # list followers
     path('users/<int:user_id>/followers/', followers_list, name='followers_list'),
     # list following
     path('user/<int:user_id>/following/', following_list, name='following_list'),
     # like and unlike a comment reply
     path('comment-replies/<int:comment_reply_id>/like/', CommentReplyLikeView.as_view(), name='comment_reply_like'),
+    # list the users who liked a comment reply
+    path('comment-replies/<int:comment_reply_id>/likes/', CommentReplyLikersView.as_view(), name='comment_reply_likers'),
+    # which of the given posts, comments and replies the user liked and which users they follow
+    path('viewer-state/', viewer_state, name='viewer_state'),
+    # whether the user follows each of the given users and whether they follow the user back
+    path('relationships/', relationships, name='relationships'),
     # list notifications
     path('notifications/', list_notifications, name='notification_list'),
     # delete notifications
     path('notifications/<int:pk>/delete/', delete_notification, name='notification_delete'),
+    # start a resumable image upload
+    path('uploads/', ChunkedUploadView.as_view(), name='chunked_upload'),
+    # the progress of an upload, send the next chunk of it, or abandon it
+    path('uploads/<uuid:upload_id>/', ChunkedUploadDetailView.as_view(), name='chunked_upload_detail'),
+    # finish an upload so it can be attached to a post, comment, message or avatar
+    path('uploads/<uuid:upload_id>/complete/', CompleteChunkedUploadView.as_view(), name='chunked_upload_complete'),
+    # hit and miss counts of the payload cache, for admins
+    path('cache/stats/', cache_stats, name='cache_stats'),
 
     path('dj-rest-auth/registration/', NameRegistrationView.as_view(), name="rest_name_register")
 
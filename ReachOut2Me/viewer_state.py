@@ -0,0 +1,120 @@
+from django.conf import settings
+
+from .cache import get_or_build, payload_key, following_scope
+from .models import PostLike, CommentLike, CommentReplyLike, Follow
+
+# the largest number of ids that can be looked up for one relation in one request
+MAX_IDS = 200
+# the largest following set kept in the cache; the follows of bigger accounts are looked up in the table
+FOLLOWING_SET_CACHE_MAX_SIZE = getattr(settings, 'FOLLOWING_SET_CACHE_MAX_SIZE', 5000)
+
+
+def liked_post_ids(user, post_ids):
+    """
+    Return the subset of `post_ids` liked by the user, with one query on the like table.
+    """
+    return set(
+        PostLike.objects.filter(user=user, post_id__in=post_ids).values_list('post_id', flat=True)
+    )
+
+
+def liked_comment_ids(user, comment_ids):
+    return set(
+        CommentLike.objects.filter(user=user, comment_id__in=comment_ids)
+        .values_list('comment_id', flat=True)
+    )
+
+
+def liked_reply_ids(user, reply_ids):
+    return set(
+        CommentReplyLike.objects.filter(user=user, comment_reply_id__in=reply_ids)
+        .values_list('comment_reply_id', flat=True)
+    )
+
+
+def cached_following_ids(user_id):
+    """
+    Return the ids of every user the user follows from the cache, building it on a miss,
+    or None when the `FOLLOWING_SET_CACHE` setting is off or the user follows too many users.
+    """
+    if not getattr(settings, 'FOLLOWING_SET_CACHE', False):
+        return None
+
+    def build():
+        ids = list(
+            Follow.objects.filter(follower_id=user_id)
+            .values_list('following_id', flat=True)[:FOLLOWING_SET_CACHE_MAX_SIZE + 1]
+        )
+        # a set too large to cache is remembered as None, so it is not read again on every request
+        return ids if len(ids) <= FOLLOWING_SET_CACHE_MAX_SIZE else None
+
+    ids = get_or_build('following', payload_key(following_scope(user_id)), build)
+    return set(ids) if ids is not None else None
+
+
+def followed_user_ids(user, user_ids):
+    """
+    Return the subset of `user_ids` followed by the user, from the cached following set
+    or with one query on the follow table.
+    """
+    following = cached_following_ids(user.pk)
+    if following is not None:
+        return following.intersection(user_ids)
+    return set(
+        Follow.objects.filter(follower=user, following_id__in=user_ids)
+        .values_list('following_id', flat=True)
+    )
+
+
+def follower_user_ids(user, user_ids):
+    """
+    Return the subset of `user_ids` following the user, with one query on the (following, follower) index.
+    """
+    return set(
+        Follow.objects.filter(following=user, follower_id__in=user_ids)
+        .values_list('follower_id', flat=True)
+    )
+
+
+def relationships(user, user_ids):
+    """
+    Return the relationship of the user to each of `user_ids`, in the given order,
+    with one set-based query for each direction of the follows.
+    """
+    following = followed_user_ids(user, user_ids)
+    followers = follower_user_ids(user, user_ids)
+    return [
+        {
+            'id': user_id,
+            'you_follow': user_id in following,
+            'follows_you': user_id in followers,
+            'mutual': user_id in following and user_id in followers,
+        }
+        for user_id in user_ids
+    ]
+
+
+def viewer_state_requested(request):
+    return request.query_params.get('viewer_state', '').lower() in ('1', 'true', 'yes')
+
+
+def viewer_state_context(request, posts=(), comments=(), replies=()):
+    """
+    Build the serializer context holding the viewer's like and follow flags for one page of objects.
+    Nothing is queried unless the client asked for it with `?viewer_state=1`, and each relation
+    costs a single query whatever the size of the page.
+    """
+    if not viewer_state_requested(request) or not request.user.is_authenticated:
+        return {}
+    user = request.user
+    context = {}
+    if posts:
+        context['liked_post_ids'] = liked_post_ids(user, [post.pk for post in posts])
+    if comments:
+        context['liked_comment_ids'] = liked_comment_ids(user, [comment.pk for comment in comments])
+    if replies:
+        context['liked_reply_ids'] = liked_reply_ids(user, [reply.pk for reply in replies])
+    authors = {obj.user_id for obj in [*posts, *comments, *replies]}
+    if authors:
+        context['following_ids'] = followed_user_ids(user, authors)
+    return context
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 import django_heroku
 import dj_database_url
+import django_cache_url
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -76,8 +77,13 @@ REST_FRAMEWORK = {
         # other permission classes go here, if needed
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_PAGINATION_CLASS': 'ReachOut2Me.pagination.KeysetPagination',
+    'PAGE_SIZE': 20,
 }
 
+# the largest page size clients can request from the list endpoints
+PAGINATION_MAX_PAGE_SIZE = 100
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'ReachOut2Me Social Media API',
     'DESCRIPTION': 'This is a web application built with Django Restframework that enables users to sign up, log in, and create, edit, and delete posts with customized text, pictures, and links. Users can also like, comment/reply, and save posts, search for other users by username, follow and unfollow users to view their posts, and receive notifications. The application also includes message functionality',
@@ -172,6 +178,21 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# configured from the CACHE_URL environment variable, e.g. redis://localhost:6379/0,
+# and falling back to the in-process memory cache
+
+CACHES = {
+    'default': django_cache_url.config(default='locmem://'),
+}
+
+# how long serialized post and comment payloads stay cached when nothing invalidates them first
+PAYLOAD_CACHE_SECONDS = 300
+# cache the ids each user follows for the follow flags and relationship badges; the set is dropped
+# on every follow and unfollow of the user
+FOLLOWING_SET_CACHE = False
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -216,3 +237,26 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media/'
+
+# uploads are stored once per distinct content under their sha256, see ReachOut2Me/storage.py
+DEFAULT_FILE_STORAGE = 'ReachOut2Me.storage.ContentAddressedStorage'
+
+# the number of worker processes rendering the resized variants of uploaded images
+IMAGE_PROCESSING_WORKERS = 2
+# render the variants in the request instead of the worker processes, for tests
+IMAGE_PROCESSING_EAGER = False
+
+# how media files are sent: 'django' streams them with FileResponse, 'x-accel-redirect' (nginx)
+# and 'x-sendfile' (Apache, lighttpd) let the front proxy send them
+MEDIA_SERVE_MODE = 'django'
+# the internal nginx location mapped to MEDIA_ROOT, for the x-accel-redirect mode
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# the directory of the follow graph snapshot built by the build_follow_graph command and memory-mapped
+# by every worker, or None to build the graph from the Follow table in each worker; that build runs
+# on the first request using the graph and blocks it, so set a snapshot up on large deployments
+FOLLOW_GRAPH_SNAPSHOT_DIR = None
+# how often each worker replays the follows and unfollows made since its graph was loaded, in seconds
+FOLLOW_GRAPH_REFRESH_SECONDS = 5
+# how many already replayed follow events are replayed again, for the ones committed out of id order
+FOLLOW_GRAPH_REPLAY_LAG = 1000
@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
+from ReachOut2Me.endpoints.media import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -13,4 +15,6 @@ urlpatterns = [
     # path('api/schema/swagger-ui/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path('', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path('redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
+    # uploaded images and their variants
+    path(settings.MEDIA_URL.lstrip('/') + '<path:path>', serve_media, name='media'),
 ]